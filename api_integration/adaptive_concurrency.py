@@ -0,0 +1,208 @@
+#api_integration/adaptive_concurrency.py
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+# Limits of the in-flight LLM calls, override them with CV_AGENT_LLM_CONCURRENCY_INITIAL / _MIN / _MAX
+DEFAULT_INITIAL_LIMIT = 2
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 16
+# Successful calls slower than this (seconds) don't raise the limit, override it with CV_AGENT_LLM_LATENCY_TARGET
+DEFAULT_LATENCY_TARGET = 30.0
+# Consecutive failures that open the circuit and seconds it stays open
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+def is_rate_limit_error(error):
+    """True for the quota errors of the Gemini API (HTTP 429 / ResourceExhausted)"""
+    message = str(error)
+    return "429" in message or "Resource has been exhausted" in message or type(error).__name__ == "ResourceExhausted"
+
+def is_overload_error(error):
+    """Errors that mean the API is saturated or down: quota errors, timeouts and 5xx"""
+    message = str(error)
+    return (is_rate_limit_error(error) or isinstance(error, TimeoutError)
+            or any(code in message for code in ("500", "503", "504")))
+
+class CircuitBreaker:
+    """Stops dispatching LLM calls after failure_threshold consecutive overload errors.
+    While open every call waits; after reset_timeout a single probe call is let through (half open),
+    and the circuit closes again when it succeeds."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def wait_time(self):
+        """Seconds a new call has to wait (0 lets it through). Called with the controller lock held."""
+        if self.state == "closed":
+            return 0.0
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            self.state = "half_open"
+        if self.probe_in_flight:
+            return 0.5
+        self.probe_in_flight = True
+        return 0.0
+
+    def record(self, overloaded):
+        if overloaded:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"LLM circuit breaker open after {self.failures} consecutive failures, pausing calls for {self.reset_timeout}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+        else:
+            self.failures = 0
+            self.state = "closed"
+        self.probe_in_flight = False
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit of the LLM calls in flight, shared by every GeminiAPI instance.
+    Each healthy success raises the limit additively (about +1 per limit calls), a quota error
+    cuts it multiplicatively (at most once per cooldown, so a burst of 429s counts as one signal).
+    Combined with the circuit breaker, a batch settles at the highest throughput the key's quota allows."""
+
+    def __init__(self, initial=DEFAULT_INITIAL_LIMIT, min_limit=DEFAULT_MIN_LIMIT, max_limit=DEFAULT_MAX_LIMIT,
+                 decrease_factor=0.5, latency_target=DEFAULT_LATENCY_TARGET, cooldown=2.0, breaker=None):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.breaker = breaker or CircuitBreaker()
+        self.in_flight = 0
+        self.abandoned = 0  # Calls given up on (timed out, losing hedges) whose request is still running
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _try_acquire(self):
+        """Returns the seconds to wait before retrying, or 0 once a slot was taken. Called with the lock held."""
+        wait = self.breaker.wait_time()
+        if wait > 0:
+            return wait
+        if self.in_flight >= int(self.limit):
+            if self.breaker.state == "half_open":
+                self.breaker.probe_in_flight = False
+            return None
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        with self._released:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0.0:
+                    return
+                self._released.wait(timeout=wait)
+
+    async def aacquire(self):
+        while True:
+            with self._lock:
+                wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            await asyncio.sleep(min(wait, 0.5) if wait is not None else 0.05)
+
+    def release(self, latency=None, error=None):
+        """Frees a slot and adapts the limit to the outcome of the call"""
+        with self._released:
+            self.in_flight -= 1
+            if error is not None and is_rate_limit_error(error):
+                now = time.monotonic()
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+                    self.decreases += 1
+            elif error is None and (latency is None or latency <= self.latency_target):
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(1.0, self.limit))
+            self.breaker.record(overloaded=error is not None and is_overload_error(error))
+            self._released.notify_all()
+
+    def hold(self, future):
+        """Keeps an abandoned attempt counted as in flight until its Future is done, so the requests really
+        running against the API never exceed the limit (e.g. the ones left behind by timeouts during an outage)"""
+        with self._lock:
+            self.in_flight += 1
+            self.abandoned += 1
+        future.add_done_callback(self._unhold)
+
+    def _unhold(self, future):
+        with self._released:
+            self.in_flight -= 1
+            self.abandoned -= 1
+            self._released.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Holds a slot for one call: with limiter.slot(): ..."""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(error=e)
+            raise
+        self.release(latency=time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(error=e)
+            raise
+        self.release(latency=time.monotonic() - started)
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (full-jitter exponential, 1s to 30s)"""
+        return random.uniform(1.0, min(30.0, 2.0 ** attempt))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'abandoned': self.abandoned,
+                'decreases': self.decreases,
+                'circuit': self.breaker.state,
+                'circuit_opened': self.breaker.times_opened,
+            }
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_concurrency_limiter():
+    """Returns the process-wide limiter, configured with CV_AGENT_LLM_CONCURRENCY_INITIAL, CV_AGENT_LLM_CONCURRENCY_MIN,
+    CV_AGENT_LLM_CONCURRENCY_MAX, CV_AGENT_LLM_LATENCY_TARGET, CV_AGENT_LLM_BREAKER_THRESHOLD and CV_AGENT_LLM_BREAKER_RESET"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveConcurrencyLimiter(
+                initial=int(os.environ.get("CV_AGENT_LLM_CONCURRENCY_INITIAL", DEFAULT_INITIAL_LIMIT)),
+                min_limit=int(os.environ.get("CV_AGENT_LLM_CONCURRENCY_MIN", DEFAULT_MIN_LIMIT)),
+                max_limit=int(os.environ.get("CV_AGENT_LLM_CONCURRENCY_MAX", DEFAULT_MAX_LIMIT)),
+                latency_target=float(os.environ.get("CV_AGENT_LLM_LATENCY_TARGET", DEFAULT_LATENCY_TARGET)),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.environ.get("CV_AGENT_LLM_BREAKER_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+                    reset_timeout=float(os.environ.get("CV_AGENT_LLM_BREAKER_RESET", DEFAULT_RESET_TIMEOUT)),
+                ),
+            )
+        return _limiter
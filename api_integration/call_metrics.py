@@ -0,0 +1,146 @@
+#api_integration/call_metrics.py
+import os
+import csv
+import json
+import threading
+from datetime import datetime
+from api_integration.token_budget import current_resume, get_budget
+from api_integration.adaptive_concurrency import is_rate_limit_error
+
+CALL_METRICS_CSV = "data/logs/llm_calls.csv"
+CALL_METRICS_JSON = "data/logs/llm_calls_summary.json"
+# Upper bounds (seconds) of the latency histogram buckets, slower calls fall in the last "+inf" bucket
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+def call_outcome(text=None, error=None, cached=False):
+    """Classifies a finished call: cached, ok, empty, timeout, rate_limited or error"""
+    if error is not None:
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        return "rate_limited" if is_rate_limit_error(error) else "error"
+    if not text:
+        return "empty"
+    return "cached" if cached else "ok"
+
+def _bucket(seconds):
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            return f"<={bound}s"
+    return f">{LATENCY_BUCKETS[-1]}s"
+
+def _percentile(samples, p):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))], 3)
+
+class CallMetrics:
+    """One record per GeminiAPI call (stage, prompt version, latency, tokens against the stage budget, retries, outcome),
+    kept in memory and dumped at the end of a run, so the stage that dominates the wall time and the spend can be found"""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, prompt_ref, latency, prompt_tokens, response_tokens, retries=0, outcome="ok", resume=None):
+        with self._lock:
+            self.records.append({
+                'timestamp': datetime.now().isoformat(),
+                'resume': resume if resume is not None else current_resume.get(),
+                'stage': stage or "unknown",
+                'prompt': prompt_ref or "unknown",
+                'latency': round(latency, 3),
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens,
+                'budget': get_budget(stage) if stage else None,
+                'retries': retries,
+                'outcome': outcome,
+            })
+
+    def spend_by_resume(self):
+        """Tokens sent to the API per resume (cached calls cost nothing)"""
+        totals = {}
+        with self._lock:
+            for record in self.records:
+                if record['outcome'] == "cached":
+                    continue
+                total = totals.setdefault(record['resume'], {'prompt_tokens': 0, 'response_tokens': 0, 'calls': 0})
+                total['prompt_tokens'] += record['prompt_tokens']
+                total['response_tokens'] += record['response_tokens']
+                total['calls'] += 1
+        return totals
+
+    def summary(self):
+        """Aggregates the records by stage and prompt version"""
+        with self._lock:
+            records = list(self.records)
+        groups = {}
+        for record in records:
+            groups.setdefault((record['stage'], record['prompt']), []).append(record)
+
+        summary = []
+        for (stage, prompt_ref), group in groups.items():
+            # Cache hits answer in microseconds, they would hide the latency of the real calls
+            latencies = [r['latency'] for r in group if r['outcome'] != "cached"]
+            outcomes, histogram = {}, {}
+            for r in group:
+                outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+            for seconds in latencies:
+                histogram[_bucket(seconds)] = histogram.get(_bucket(seconds), 0) + 1
+            summary.append({
+                'stage': stage,
+                'prompt': prompt_ref,
+                'calls': len(group),
+                'outcomes': outcomes,
+                'retries': sum(r['retries'] for r in group),
+                'total_seconds': round(sum(latencies), 3),
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'max': round(max(latencies), 3) if latencies else None,
+                'latency_histogram': histogram,
+                'prompt_tokens': sum(r['prompt_tokens'] for r in group if r['outcome'] != "cached"),
+                'response_tokens': sum(r['response_tokens'] for r in group if r['outcome'] != "cached"),
+                'over_budget': sum(1 for r in group if r['budget'] is not None and r['prompt_tokens'] > r['budget']),
+            })
+        return sorted(summary, key=lambda s: s['total_seconds'], reverse=True)
+
+    def report(self):
+        """Prints the per-stage summary, slowest stage first"""
+        for s in self.summary():
+            latency = f"{s['total_seconds']}s total (p50 {s['p50']}s, p95 {s['p95']}s)" if s['p50'] is not None else "no API calls"
+            print(f"- {s['stage']} ({s['prompt']}): {s['calls']} calls {s['outcomes']}, {s['retries']} retries, {latency}, "
+                  f"{s['prompt_tokens']} prompt + {s['response_tokens']} response tokens")
+
+    def finish_run(self):
+        """Prints the per-stage summary and dumps the records, called once at the end of every run (email, Drive or backfill)"""
+        if self.records:
+            print("LLM calls by stage (slowest first):")
+            self.report()
+        self.dump()
+
+    def dump(self, csv_path=CALL_METRICS_CSV, json_path=CALL_METRICS_JSON):
+        """Appends the records to a CSV file, writes the summary of this run as JSON and clears the records"""
+        summary = self.summary()
+        with self._lock:
+            records, self.records = self.records, []
+        if not records:
+            return
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        fieldnames = list(records[0].keys())
+        if os.path.exists(csv_path):
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), None)
+            if header != fieldnames:
+                # Written by a version with other columns, it is kept aside instead of mixing both layouts
+                os.replace(csv_path, f"{csv_path}.{datetime.now():%Y%m%d%H%M%S}")
+        write_header = not os.path.exists(csv_path)
+        with open(csv_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(records)
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'stages': summary}, f, ensure_ascii=False, indent=2)
+
+call_metrics = CallMetrics()
@@ -0,0 +1,276 @@
+#api_integration/call_policy.py
+import os
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+# Deadline of one LLM call in seconds, override it with CV_AGENT_LLM_TIMEOUT (0 disables it)
+DEFAULT_TIMEOUT = 120.0
+# Successful calls needed before the p95 is trusted to trigger hedged requests
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+# Threads running the blocking LLM calls, override it with CV_AGENT_LLM_THREADS
+DEFAULT_MAX_THREADS = 32
+
+class LLMTimeoutError(TimeoutError):
+    """The LLM call did not answer before its deadline"""
+    pass
+
+class LatencyTracker:
+    """Latencies of the last successful LLM calls, used for the hedging delay and the p50/p95/p99 report"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_hedge(self, won):
+        """Counts a hedged call, won is True when the duplicate answered first"""
+        with self._lock:
+            self.hedges += 1
+            self.hedge_wins += int(won)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+    def stats(self):
+        with self._lock:
+            count, timeouts, hedges, hedge_wins = len(self.samples), self.timeouts, self.hedges, self.hedge_wins
+        p50, p95, p99 = (self.percentile(p) for p in (50, 95, 99))
+        return {
+            'count': count,
+            'p50': round(p50, 3) if p50 is not None else None,
+            'p95': round(p95, 3) if p95 is not None else None,
+            'p99': round(p99, 3) if p99 is not None else None,
+            'timeouts': timeouts,
+            'hedges': hedges,
+            'hedge_wins': hedge_wins,
+        }
+
+class AttemptPool:
+    """Bounded pool of daemon threads running the blocking LLM attempts. A call stuck past its deadline keeps
+    its thread until it answers, but being daemons they never block the interpreter from exiting."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_THREADS):
+        self.max_workers = max(1, max_workers)
+        self._tasks = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads = 0
+        self._idle = 0
+
+    def submit(self, fn):
+        """Runs fn() in a pool thread and returns its Future, it waits in the queue while every thread is busy"""
+        future = Future()
+        self._tasks.put((future, fn))
+        with self._lock:
+            if self._idle:
+                self._idle -= 1
+            elif self._threads < self.max_workers:
+                self._threads += 1
+                threading.Thread(target=self._work, daemon=True).start()
+        return future
+
+    def _work(self):
+        while True:
+            future, fn = self._tasks.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                self._idle += 1
+
+class CallPolicy:
+    """Deadline and hedging policy shared by every GeminiAPI call.
+    When hedging is on and a call has not answered after the observed p95 latency, a duplicate
+    request is sent and whichever answers first wins.
+    The attempts run in a bounded pool of threads; one that is still running when the call returns (it timed out
+    or lost the hedge) is handed to on_abandon, so the caller can keep counting it until it really finishes."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, hedge=False, hedge_min_samples=DEFAULT_HEDGE_MIN_SAMPLES, tracker=None,
+                 max_threads=DEFAULT_MAX_THREADS):
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.tracker = tracker or LatencyTracker()
+        self.pool = AttemptPool(max_threads)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging (None when hedging is off or there are not enough samples yet)"""
+        if not self.hedge or len(self.tracker.samples) < self.hedge_min_samples:
+            return None
+        delay = self.tracker.percentile(95)
+        if self.timeout is not None and delay >= self.timeout:
+            return None
+        return delay
+
+    def _track(self, future, started):
+        def done(f):
+            if not f.cancelled() and f.exception() is None:
+                self.tracker.record(time.monotonic() - started)
+        future.add_done_callback(done)
+        return future
+
+    def _timed_out(self):
+        self.tracker.record_timeout()
+        return LLMTimeoutError(f"LLM call timed out after {self.timeout} seconds")
+
+    @staticmethod
+    def _abandon(futures, on_abandon):
+        """Cancels the attempts that have not started yet and hands the running ones to on_abandon"""
+        for future in futures:
+            if not future.done() and not future.cancel() and on_abandon:
+                on_abandon(future)
+
+    def call(self, fn, before_hedge=None, on_abandon=None):
+        """Runs fn() under the deadline, hedging it once if it is slower than the p95.
+        Args:
+            fn: The blocking call, e.g. lambda: backend.generate(prompt).
+            before_hedge: Called before sending the duplicate request (e.g. to take a rate limiter slot).
+            on_abandon: Called with the Future of each attempt still running when the call returns or fails.
+        Raises: LLMTimeoutError when no attempt answers in time, or the error of the last failed attempt."""
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout is not None else None
+        attempts = [self._track(self.pool.submit(fn), started)]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and not wait(attempts, timeout=delay).done:
+                if before_hedge:
+                    before_hedge()
+                # before_hedge may wait for the rate limiter, the first attempt could have answered meanwhile
+                if not attempts[0].done():
+                    attempts.append(self._track(self.pool.submit(fn), time.monotonic()))
+
+            pending, error = set(attempts), None
+            while pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if len(attempts) > 1:
+                            self.tracker.record_hedge(won=future is not attempts[0])
+                        return future.result()
+                    error = future.exception()
+            if error is not None and not pending:
+                raise error
+            raise self._timed_out()
+        finally:
+            self._abandon(attempts, on_abandon)
+
+    async def acall(self, coro_fn, before_hedge=None):
+        """Asyncio version of call: coro_fn() returns the coroutine of one attempt, before_hedge is a coroutine function"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout if self.timeout is not None else None
+        attempts = {asyncio.ensure_future(coro_fn()): started}
+        first = next(iter(attempts))
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and not (await asyncio.wait({first}, timeout=delay))[0]:
+                if before_hedge:
+                    await before_hedge()
+                if not first.done():
+                    attempts[asyncio.ensure_future(coro_fn())] = loop.time()
+
+            pending, error = set(attempts), None
+            while pending:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.tracker.record(loop.time() - attempts[task])
+                        if len(attempts) > 1:
+                            self.tracker.record_hedge(won=task is not first)
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not pending:
+                raise error
+            raise self._timed_out()
+        finally:
+            # The losing (or timed out) attempts are cancelled, unlike threads a coroutine can be stopped
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def stream(self, chunks_fn, on_abandon=None):
+        """Yields the chunks of chunks_fn() under the call deadline. One pool thread reads the stream into a queue;
+        when the deadline passes or the consumer stops early, that thread is handed to on_abandon.
+        Streams are not hedged (chunks already yielded can't be taken back) and don't feed the latency stats."""
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def read():
+            try:
+                for chunk in chunks_fn():
+                    if stop.is_set():
+                        return
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(_StreamError(e))
+            else:
+                chunks.put(_END_OF_STREAM)
+
+        reader = self.pool.submit(read)
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    chunk = chunks.get(timeout=remaining)
+                except queue.Empty:
+                    raise self._timed_out() from None
+                if chunk is _END_OF_STREAM:
+                    return
+                if isinstance(chunk, _StreamError):
+                    raise chunk.error
+                yield chunk
+        finally:
+            stop.set()
+            self._abandon([reader], on_abandon)
+
+class _StreamError:
+    """An error of the stream reader, passed through the chunk queue"""
+
+    def __init__(self, error):
+        self.error = error
+
+_END_OF_STREAM = object()
+
+_call_policy = None
+_call_policy_lock = threading.Lock()
+
+def get_call_policy():
+    """Returns the process-wide policy, configured with CV_AGENT_LLM_TIMEOUT, CV_AGENT_LLM_HEDGE (1 enables hedging),
+    CV_AGENT_LLM_HEDGE_MIN_SAMPLES and CV_AGENT_LLM_THREADS"""
+    global _call_policy
+    with _call_policy_lock:
+        if _call_policy is None:
+            _call_policy = CallPolicy(
+                timeout=float(os.environ.get("CV_AGENT_LLM_TIMEOUT", DEFAULT_TIMEOUT)),
+                hedge=os.environ.get("CV_AGENT_LLM_HEDGE", "0") == "1",
+                hedge_min_samples=int(os.environ.get("CV_AGENT_LLM_HEDGE_MIN_SAMPLES", DEFAULT_HEDGE_MIN_SAMPLES)),
+                max_threads=int(os.environ.get("CV_AGENT_LLM_THREADS", DEFAULT_MAX_THREADS)),
+            )
+        return _call_policy
@@ -1,29 +1,11 @@
 #api_integration/drive_api.py
-import io
-import os.path
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from api_integration.google_auth import get_credential_provider
 
-SCOPES = [
-    'https://www.googleapis.com/auth/gmail.readonly',
-    'https://www.googleapis.com/auth/gmail.compose',
-    'https://www.googleapis.com/auth/drive.readonly'
-    ]
+def get_drive_service():
+    """Returns the Drive service of the calling thread (services are not thread-safe), built with the
+    OAuth credentials shared with Gmail and authenticated on first use"""
+    return get_credential_provider().service('drive', 'v3')
 
 def authenticate_drive_api():
     """Authenticates the user for Google Drive API access and returns the service object."""
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port = 0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    return build('drive', 'v3', credentials = creds)
\ No newline at end of file
+    return get_drive_service()
@@ -1,25 +1,231 @@
 #api_integration/gemini_api.py
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+import json
+import time
+import asyncio
+import threading
+from api_integration.rate_limiter import get_rate_limiter
+from api_integration.token_budget import estimate_tokens
+from api_integration.response_cache import get_response_cache, make_cache_key
+from api_integration.llm_backend import get_llm_backend, recording_key
+from api_integration.call_policy import get_call_policy
+from api_integration.adaptive_concurrency import get_concurrency_limiter, is_rate_limit_error
+from api_integration.call_metrics import call_metrics, call_outcome
 
 class GeminiAPI:
-    def __init__(self):
+    def __init__(self, backend=None):
+        from dotenv import load_dotenv
+
         load_dotenv()
-        self.api_key = os.environ.get("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set.")
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')  # Or your preferred model
+        # The live Gemini API unless CV_AGENT_LLM_BACKEND selects another backend (e.g. "replay" for offline runs)
+        self.backend = backend or get_llm_backend()
+        self.model_name = self.backend.model_name
+        # Shared RPM/TPM limiter, every call waits here instead of sleeping a fixed time between files
+        self.rate_limiter = get_rate_limiter()
+        # Shared deadline/hedging policy, a stuck call fails after CV_AGENT_LLM_TIMEOUT instead of stalling the batch
+        self.call_policy = get_call_policy()
+        # Shared AIMD limit of the calls in flight with a circuit breaker, it adapts to the 429s of our quota
+        self.concurrency = get_concurrency_limiter()
+        # On-disk cache of responses, an unchanged prompt never goes to the network twice
+        self.cache = get_response_cache()
+        # Responses can be recorded (keyed by prompt hash, no resume text is stored) to replay them offline
+        self.record_path = os.environ.get("CV_AGENT_LLM_RECORD")
+        self._record_lock = threading.Lock()
+
+    @staticmethod
+    def _valid(text, validate):
+        """Whether a response can be cached: not empty and accepted by the caller's validate callback, if any"""
+        if not text:
+            return False
+        if validate is None:
+            return True
+        try:
+            return bool(validate(text))
+        except Exception:
+            return False
+
+    def _cached(self, prompt, generation_config, validate=None, use_cache=True):
+        """Returns (cache key, cached text or None). use_cache=False only computes the key, so a retry reaches the
+        backend; a cached response the validator rejects (cached by an older version) is dropped."""
+        if self.cache is None:
+            return None, None
+        key = make_cache_key(self.model_name, prompt, generation_config)
+        if not use_cache:
+            return key, None
+        text = self.cache.get_text(key)
+        if text is not None and not self._valid(text, validate):
+            print("Dropping a cached response that does not parse")
+            self.cache.delete(key)
+            return key, None
+        return key, text
+
+    def _store(self, key, text, prompt, generation_config, validate=None):
+        # Only the responses the caller can parse are cached, a malformed one would be replayed on every run
+        if self.cache is not None and key and self._valid(text, validate):
+            self.cache.set_text(key, text)
+        if self.record_path and text:
+            with self._record_lock, open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({'key': recording_key(prompt, generation_config), 'response': text}, ensure_ascii=False) + "\n")
+
+    def _measure(self, stage, prompt_ref, started, prompt_tokens, text=None, error=None, cached=False, retries=0):
+        call_metrics.record(stage, prompt_ref, time.monotonic() - started, prompt_tokens,
+                            estimate_tokens(text) if text else 0, retries, call_outcome(text, error, cached))
 
-    def generate_content(self, prompt):
+    def _generate(self, prompt, generation_config, prompt_tokens, validate=None, use_cache=True):
+        """One call to the backend (or the cache), raising on failure. Returns (text, whether it was cached)"""
+        key, cached = self._cached(prompt, generation_config, validate, use_cache)
+        if cached is not None:
+            return cached, True
+        # The quota is waited for before taking a slot, a slot is never held idle and its latency is only the call's
+        self.rate_limiter.acquire(prompt_tokens)
+        with self.concurrency.slot():
+            text = self.call_policy.call(
+                lambda: self.backend.generate(prompt, generation_config),
+                before_hedge=lambda: self.rate_limiter.acquire(prompt_tokens),
+                on_abandon=self.concurrency.hold,
+            )
+        self._store(key, text, prompt, generation_config, validate)
+        return text, False
+
+    def generate_content(self, prompt, generation_config=None, stage=None, prompt_ref=None, validate=None):
         """Generates content using the Gemini API based on the given prompt.
         Args:
             prompt: The text prompt to send to the Gemini API.
+            generation_config: Optional generation config (also part of the cache key).
+            stage: Pipeline stage of the prompt ("extraction", "feedback"...), used in the token accounting and call metrics.
+            prompt_ref: Registry reference of the prompt template (e.g. "entire_resume_analyzer@v7"), used in the call metrics.
+            validate: Optional callback returning whether the caller can parse a response (e.g. is_json_response),
+                the responses it rejects are not cached.
             Returns: The generated text response from the Gemini API."""
+        started, prompt_tokens = time.monotonic(), estimate_tokens(prompt)
+        try:
+            text, cached = self._generate(prompt, generation_config, prompt_tokens, validate)
+        except Exception as e:
+            print(f"Error generating content: {e}")  # Log the error
+            self._measure(stage, prompt_ref, started, prompt_tokens, error=e)
+            return None
+        self._measure(stage, prompt_ref, started, prompt_tokens, text=text, cached=cached)
+        return text
+
+    def generate_content_with_retry(self, prompt, generation_config=None, stage=None, attempts=3, prompt_ref=None, validate=None):
+        """generate_content retried on errors, empty responses and responses validate rejects, with jittered
+        exponential backoff. Quota errors also shrink the shared concurrency limit, so retries don't hammer the API.
+        The retries skip the response cache, they always reach the backend.
+            Returns: The generated text (the last one if none was valid), or None if every attempt failed."""
+        started, prompt_tokens = time.monotonic(), estimate_tokens(prompt)
+        text, cached, error = None, False, None
+        for attempt in range(1, attempts + 1):
+            try:
+                text, cached = self._generate(prompt, generation_config, prompt_tokens, validate, use_cache=attempt == 1)
+                error = None
+                if self._valid(text, validate):
+                    break
+                print("Empty response from Gemini API" if not text else "Gemini API response does not parse")
+            except Exception as e:
+                error = e
+                if is_rate_limit_error(e):
+                    print("Rate limit hit, waiting before retry...")
+                else:
+                    print(f"Error generating content: {e}")  # Log the error
+            if attempt < attempts:
+                time.sleep(self.concurrency.backoff(attempt))
+        self._measure(stage, prompt_ref, started, prompt_tokens, text=text, error=error, cached=cached, retries=attempt - 1)
+        return text or None
+
+    async def _agenerate(self, prompt, generation_config, prompt_tokens, validate=None, use_cache=True):
+        """Asyncio version of _generate, raising on failure. Returns (text, whether it was cached)"""
+        key, cached = self._cached(prompt, generation_config, validate, use_cache)
+        if cached is not None:
+            return cached, True
+        await self.rate_limiter.aacquire(prompt_tokens)
+        async with self.concurrency.aslot():
+            text = await self.call_policy.acall(
+                lambda: self.backend.agenerate(prompt, generation_config),
+                before_hedge=lambda: self.rate_limiter.aacquire(prompt_tokens),
+            )
+        self._store(key, text, prompt, generation_config, validate)
+        return text, False
+
+    async def agenerate_content(self, prompt, generation_config=None, stage=None, prompt_ref=None, validate=None):
+        """Asyncio version of generate_content, so several prompts can be in flight at once.
+        Args:
+            prompt: The text prompt to send to the Gemini API.
+            generation_config: Optional generation config (also part of the cache key).
+            stage: Pipeline stage of the prompt ("extraction", "feedback"...), used in the token accounting and call metrics.
+            prompt_ref: Registry reference of the prompt template, used in the call metrics.
+            validate: Optional callback returning whether the caller can parse a response, see generate_content.
+            Returns: The generated text response from the Gemini API (or None if the call failed)."""
+        started, prompt_tokens = time.monotonic(), estimate_tokens(prompt)
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            text, cached = await self._agenerate(prompt, generation_config, prompt_tokens, validate)
         except Exception as e:
             print(f"Error generating content: {e}")  # Log the error
+            self._measure(stage, prompt_ref, started, prompt_tokens, error=e)
             return None
+        self._measure(stage, prompt_ref, started, prompt_tokens, text=text, cached=cached)
+        return text
+
+    async def agenerate_content_with_retry(self, prompt, generation_config=None, stage=None, attempts=3, prompt_ref=None, validate=None):
+        """Asyncio version of generate_content_with_retry, with the same retry policy (errors, empty and invalid
+        responses, jittered exponential backoff) and without blocking the event loop while it waits.
+            Returns: The generated text (the last one if none was valid), or None if every attempt failed."""
+        started, prompt_tokens = time.monotonic(), estimate_tokens(prompt)
+        text, cached, error = None, False, None
+        for attempt in range(1, attempts + 1):
+            try:
+                text, cached = await self._agenerate(prompt, generation_config, prompt_tokens, validate, use_cache=attempt == 1)
+                error = None
+                if self._valid(text, validate):
+                    break
+                print("Empty response from Gemini API" if not text else "Gemini API response does not parse")
+            except Exception as e:
+                error = e
+                if is_rate_limit_error(e):
+                    print("Rate limit hit, waiting before retry...")
+                else:
+                    print(f"Error generating content: {e}")  # Log the error
+            if attempt < attempts:
+                await asyncio.sleep(self.concurrency.backoff(attempt))
+        self._measure(stage, prompt_ref, started, prompt_tokens, text=text, error=error, cached=cached, retries=attempt - 1)
+        return text or None
+
+    def generate_content_stream(self, prompt, generation_config=None, stage=None, prompt_ref=None, validate=None):
+        """Streams the response of the Gemini API chunk by chunk.
+        Args:
+            prompt: The text prompt to send to the Gemini API.
+            generation_config: Optional generation config (also part of the cache key).
+            stage: Pipeline stage of the prompt ("extraction", "feedback"...), used in the token accounting and call metrics.
+            prompt_ref: Registry reference of the prompt template, used in the call metrics.
+            validate: Optional callback returning whether the caller can parse the full response, see generate_content.
+            Yields: The text of each chunk as soon as it arrives. A cached response is yielded as a single chunk."""
+        started, prompt_tokens = time.monotonic(), estimate_tokens(prompt)
+        try:
+            key, cached = self._cached(prompt, generation_config, validate)
+            if cached is not None:
+                self._measure(stage, prompt_ref, started, prompt_tokens, text=cached, cached=True)
+                yield cached
+                return
+            chunks = []
+            self.rate_limiter.acquire(prompt_tokens)
+            with self.concurrency.slot():
+                for chunk in self.call_policy.stream(lambda: self.backend.stream(prompt, generation_config),
+                                                     on_abandon=self.concurrency.hold):
+                    chunks.append(chunk)
+                    yield chunk
+            self._store(key, "".join(chunks), prompt, generation_config, validate)
+            self._measure(stage, prompt_ref, started, prompt_tokens, text="".join(chunks))
+        except Exception as e:
+            print(f"Error streaming content: {e}")  # Log the error
+            self._measure(stage, prompt_ref, started, prompt_tokens, error=e)
+
+_gemini_api = None
+_gemini_api_lock = threading.Lock()
+
+def get_gemini_api():
+    """Returns the process-wide GeminiAPI, built on the first call so importing a module doesn't load
+    the .env file or configure the SDK"""
+    global _gemini_api
+    with _gemini_api_lock:
+        if _gemini_api is None:
+            _gemini_api = GeminiAPI()
+        return _gemini_api
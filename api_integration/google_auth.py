@@ -0,0 +1,155 @@
+#api_integration/google_auth.py
+import os
+import logging
+import threading
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Drive and Gmail share one token, if modifying these scopes delete the file token.json
+SCOPES = [
+    'https://www.googleapis.com/auth/gmail.readonly',
+    'https://www.googleapis.com/auth/gmail.compose',
+    'https://www.googleapis.com/auth/drive.readonly'
+    ]
+TOKEN_FILE = "token.json"
+CREDENTIALS_FILE = "credentials.json"
+# Credentials are refreshed this many seconds before they expire, override it with CV_AGENT_OAUTH_REFRESH_MARGIN
+DEFAULT_REFRESH_MARGIN = 300
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path + ".lock", shared with the other processes using the same token"""
+    with open(path + ".lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class CredentialProvider:
+    """OAuth credentials shared by the Drive and Gmail clients.
+    The credentials are kept in memory and refreshed refresh_margin seconds before they expire, by one
+    thread at a time; token.json is re-read, refreshed and rewritten (atomically) under a file lock, so
+    concurrent workers and processes never refresh twice or leave a half-written token.
+    googleapiclient services are not thread-safe, service() builds one per thread and API."""
+
+    def __init__(self, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE, scopes=SCOPES,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._creds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _fresh(self, creds):
+        """True if creds can be used without refreshing for at least refresh_margin"""
+        if not creds or not creds.valid:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        return creds.expiry is None or creds.expiry - datetime.utcnow() > self.refresh_margin
+
+    def _load(self):
+        from google.oauth2.credentials import Credentials
+
+        if not os.path.exists(self.token_file):
+            return None
+        try:
+            return Credentials.from_authorized_user_file(self.token_file, self.scopes)
+        except Exception as e:
+            logger.error(f"Error loading credentials from {self.token_file}: {e}")
+            return None
+
+    def _save(self, creds):
+        """Writes the token to a temporary file and renames it, readers never see a partial file"""
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as token:
+                token.write(creds.to_json())
+            os.replace(tmp_path, self.token_file)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def _authorize(self):
+        """Returns refreshed or new credentials, called with both locks held"""
+        from google.auth.transport.requests import Request
+        from google.auth.exceptions import RefreshError
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        # Another process may have refreshed the token while we waited for the lock
+        creds = self._load()
+        if self._fresh(creds):
+            return creds
+        if creds and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                self._save(creds)
+                return creds
+            except RefreshError:
+                logger.info("Token refresh failed, initiating new authentication flow")
+            except Exception as e:
+                logger.error(f"Error refreshing credentials: {e}")
+
+        if not os.path.exists(self.credentials_file):
+            raise FileNotFoundError(
+                f"{self.credentials_file} not found. Please download if from Google Cloud Console "
+                "and place it in the root directory of your project."
+            )
+        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.scopes)
+        creds = flow.run_local_server(port = 0)
+        self._save(creds)
+        logger.info("New credentials saved successfully")
+        return creds
+
+    def credentials(self):
+        """Returns valid credentials, refreshing them first if they are about to expire"""
+        with self._lock:
+            if not self._fresh(self._creds):
+                with _file_lock(self.token_file):
+                    self._creds = self._authorize()
+            return self._creds
+
+    def service(self, api, version):
+        """Returns this thread's service object for the API (e.g. "drive", "v3"), built with the shared credentials"""
+        from googleapiclient.discovery import build
+
+        creds = self.credentials()
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        cached = services.get((api, version))
+        # A service keeps the credentials it was built with, it is rebuilt when they are replaced
+        if cached is None or cached[1] is not creds:
+            cached = services[(api, version)] = (build(api, version, credentials = creds, cache_discovery=False), creds)
+        return cached[0]
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_credential_provider():
+    """Returns the process-wide provider, CV_AGENT_OAUTH_REFRESH_MARGIN sets the refresh margin in seconds"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CredentialProvider(
+                refresh_margin=int(os.environ.get("CV_AGENT_OAUTH_REFRESH_MARGIN", DEFAULT_REFRESH_MARGIN)))
+        return _provider
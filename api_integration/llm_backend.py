@@ -0,0 +1,163 @@
+#api_integration/llm_backend.py
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from api_integration.response_cache import make_cache_key
+
+class LLMBackend:
+    """Interface of the LLM backends behind GeminiAPI.
+    Backends only talk to the model and raise on failure; caching, rate limiting and
+    error handling stay in GeminiAPI so every backend gets them."""
+    model_name = "unknown"
+
+    def generate(self, prompt, generation_config=None):
+        """Returns the text generated for the prompt"""
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, generation_config=None):
+        """Asyncio version of generate, backends without a native async client run generate in a thread"""
+        return await asyncio.to_thread(self.generate, prompt, generation_config)
+
+    def stream(self, prompt, generation_config=None):
+        """Yields the response text in chunks, by default as a single chunk"""
+        yield self.generate(prompt, generation_config)
+
+class GeminiBackend(LLMBackend):
+    """The live Gemini API"""
+
+    def __init__(self, model_name='gemini-2.0-flash-exp'):  # Or your preferred model
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        self.api_key = os.environ.get("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        genai.configure(api_key=self.api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, generation_config=None):
+        return self.model.generate_content(prompt, generation_config=generation_config).text
+
+    async def agenerate(self, prompt, generation_config=None):
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        return response.text
+
+    def stream(self, prompt, generation_config=None):
+        for chunk in self.model.generate_content(prompt, generation_config=generation_config, stream=True):
+            yield chunk.text
+
+class ReplayRateLimitError(Exception):
+    """Injected quota error, worded like the real one so the retry logic treats it the same way"""
+    pass
+
+def recording_key(prompt, generation_config=None):
+    """Key of a recorded response, independent of the model that produced it"""
+    return make_cache_key(None, prompt, generation_config)
+
+def synthetic_response(prompt):
+    """Plausible fake response for the prompts in prompts/, used when there is no recording for a prompt"""
+    sections = {
+        "user_info": {"first_name": "ana", "last_name": "lopez", "email": "ana.lopez@example.com",
+                      "phone_number": "+52 55 1234 5678", "linkedin_profile": "", "address": "", "summary": ""},
+        "summary": "Analista de datos con 5 años de experiencia.",
+        "skills": {"soft_skills": ["Comunicación"], "hard_skills": ["Python", "SQL"]},
+        "relevant_work_experience": [{"title": "Analista de datos", "company": "Empresa", "start_date": "Jan 2020",
+                                      "end_date": "", "description": "Reportes semanales", "location": "CDMX"}],
+        "education": [{"title": "Licenciatura en Economía", "institution": "UNAM", "type": "degree",
+                       "start_date": "2014", "end_date": "2018", "notes": ""}],
+        "languages": [{"language": "Inglés", "level": "fluent", "notes": ""}],
+    }
+    feedback = {"feedback": "Retroalimentación de ejemplo.", "example": "Ejemplo mejorado."}
+
+    if "<<<RESUME id=" in prompt:
+        count = prompt.count("<<<END RESUME id=")
+        return json.dumps([{"resume_id": str(i), "extracted_sections": sections} for i in range(count)], ensure_ascii=False)
+    if '"extracted_sections"' in prompt and '"general_feedback"' in prompt:
+        sections_feedback = {name: feedback for name in
+                             ["summary", "hard_skills", "soft_skills", "work_experience", "education", "languages"]}
+        return json.dumps({"extracted_sections": sections, "general_feedback": {"sections": sections_feedback}},
+                          ensure_ascii=False)
+    if "data extraction specialist" in prompt and '"user_info"' in prompt:
+        return json.dumps(sections, ensure_ascii=False)
+    if "asking_complementary_info" in prompt:
+        questions = {"questions": ["Pregunta 1"], "notes": "Nota"}
+        return json.dumps({"asking_complementary_info": {name: questions for name in
+                           ["summary", "skills", "work_experience", "education", "languages"]}}, ensure_ascii=False)
+    if '"sections"' in prompt:
+        return json.dumps({"sections": {name: feedback for name in
+                           ["summary", "hard_skills", "soft_skills", "work_experience", "education", "languages"]}},
+                          ensure_ascii=False)
+    if '"feedback"' in prompt and '"example"' in prompt:
+        return json.dumps(feedback, ensure_ascii=False)
+    return "Respuesta de ejemplo."
+
+class ReplayBackend(LLMBackend):
+    """Offline backend for benchmarks and tests. Serves responses recorded with CV_AGENT_LLM_RECORD
+    (or synthetic ones) and injects latency, jitter and 429 errors. With a seed it is deterministic."""
+
+    def __init__(self, recordings_path=None, responder=synthetic_response, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=None, model_name="replay"):
+        self.model_name = model_name
+        self.responder = responder
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.recordings = {}
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record["key"]] = record["response"]
+
+    def _draw(self):
+        """Returns (delay in seconds, whether this call fails with a 429)"""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+    def _respond(self, prompt, generation_config, fail):
+        if fail:
+            raise ReplayRateLimitError("429 Resource has been exhausted (e.g. check quota). Injected by ReplayBackend")
+        key = recording_key(prompt, generation_config)
+        if key in self.recordings:
+            return self.recordings[key]
+        if self.responder is None:
+            raise KeyError(f"No recorded response for prompt {key[:12]}")
+        return self.responder(prompt)
+
+    def generate(self, prompt, generation_config=None):
+        delay, fail = self._draw()
+        time.sleep(delay)
+        return self._respond(prompt, generation_config, fail)
+
+    async def agenerate(self, prompt, generation_config=None):
+        delay, fail = self._draw()
+        await asyncio.sleep(delay)
+        return self._respond(prompt, generation_config, fail)
+
+def get_llm_backend():
+    """Builds the backend selected with CV_AGENT_LLM_BACKEND ("gemini" by default, or "replay").
+    The replay backend reads CV_AGENT_REPLAY_FILE, CV_AGENT_REPLAY_LATENCY, CV_AGENT_REPLAY_JITTER,
+    CV_AGENT_REPLAY_ERROR_RATE and CV_AGENT_REPLAY_SEED."""
+    backend = os.environ.get("CV_AGENT_LLM_BACKEND", "gemini").lower()
+    if backend == "replay":
+        seed = os.environ.get("CV_AGENT_REPLAY_SEED")
+        return ReplayBackend(
+            recordings_path=os.environ.get("CV_AGENT_REPLAY_FILE"),
+            latency=float(os.environ.get("CV_AGENT_REPLAY_LATENCY", 0.0)),
+            jitter=float(os.environ.get("CV_AGENT_REPLAY_JITTER", 0.0)),
+            error_rate=float(os.environ.get("CV_AGENT_REPLAY_ERROR_RATE", 0.0)),
+            seed=int(seed) if seed is not None else None,
+        )
+    if backend == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown CV_AGENT_LLM_BACKEND: {backend}")
@@ -0,0 +1,113 @@
+#api_integration/rate_limiter.py
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+
+# Gemini quotas for our key, override them with GEMINI_RPM / GEMINI_TPM
+DEFAULT_RPM = 10
+DEFAULT_TPM = 1000000
+DEFAULT_DB_PATH = "data/rate_limiter.sqlite"
+
+class TokenBucketRateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute.
+    The bucket levels live in a small SQLite file, so every worker thread and process
+    that points at the same file shares the same quota."""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, db_path=DEFAULT_DB_PATH):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.db_path = db_path
+        self._local_lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated_at REAL)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _refill(self, conn, name, capacity, now):
+        row = conn.execute("SELECT level, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return float(capacity)
+        level, updated_at = row
+        # Each bucket refills its full capacity once per minute
+        return min(float(capacity), level + max(0.0, now - updated_at) * capacity / 60.0)
+
+    def _try_acquire(self, tokens):
+        """Takes one request and `tokens` tokens if both buckets allow it.
+        Returns: 0 when granted, otherwise the seconds to wait before trying again."""
+        # A single prompt bigger than the whole TPM quota could never be granted, cap it
+        tokens = min(tokens, self.tpm)
+        with self._local_lock:
+            conn = self._connect()
+            try:
+                # BEGIN IMMEDIATE takes the write lock, so the read-modify-write is atomic across processes
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                requests_level = self._refill(conn, "requests", self.rpm, now)
+                tokens_level = self._refill(conn, "tokens", self.tpm, now)
+
+                if requests_level >= 1 and tokens_level >= tokens:
+                    requests_level -= 1
+                    tokens_level -= tokens
+                    wait = 0.0
+                else:
+                    wait = max(
+                        (1 - requests_level) * 60.0 / self.rpm,
+                        (tokens - tokens_level) * 60.0 / self.tpm,
+                    )
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                    [("requests", requests_level, now), ("tokens", tokens_level, now)],
+                )
+                conn.execute("COMMIT")
+                return wait
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def acquire(self, tokens=0):
+        """Blocks until there is quota for one request of `tokens` tokens. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def aacquire(self, tokens=0):
+        """Asyncio version of acquire, it does not block the event loop while waiting"""
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Returns the process-wide limiter configured from GEMINI_RPM, GEMINI_TPM and GEMINI_RATE_LIMIT_DB"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucketRateLimiter(
+                rpm=int(os.environ.get("GEMINI_RPM", DEFAULT_RPM)),
+                tpm=int(os.environ.get("GEMINI_TPM", DEFAULT_TPM)),
+                db_path=os.environ.get("GEMINI_RATE_LIMIT_DB", DEFAULT_DB_PATH),
+            )
+        return _rate_limiter
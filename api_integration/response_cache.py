@@ -0,0 +1,135 @@
+#api_integration/response_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = "data/cache/llm_responses.sqlite"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+def make_cache_key(model_name, prompt, generation_config=None):
+    """Content address of an LLM call: sha256 of (model name, prompt text, generation config)"""
+    payload = json.dumps([model_name, prompt, generation_config], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskLRUCache:
+    """Key/value store on local disk (SQLite) bounded by a byte budget.
+    When the budget is exceeded the least recently used entries are evicted."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_access REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key):
+        """Returns the stored bytes for key (or None on a miss) and marks the entry as recently used"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.hits += 1
+                return bytes(row[0])
+            finally:
+                conn.close()
+
+    def set(self, key, value):
+        """Stores bytes under key and evicts least recently used entries while over the byte budget"""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), size, time.time()),
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                while total > self.max_bytes:
+                    oldest = conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC LIMIT 1").fetchone()
+                    if oldest is None:
+                        break
+                    conn.execute("DELETE FROM entries WHERE key = ?", (oldest[0],))
+                    total -= oldest[1]
+                    self.evictions += 1
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def delete(self, key):
+        """Removes an entry, e.g. a cached response its caller could not parse"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            finally:
+                conn.close()
+
+    def get_text(self, key):
+        value = self.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set_text(self, key, text):
+        self.set(key, text.encode("utf-8"))
+
+    def total_bytes(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Hit/miss counters of this process plus the current size on disk"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes,
+        }
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Returns the process-wide LLM response cache, or None when GEMINI_CACHE_ENABLED=0.
+    Configured with GEMINI_CACHE_PATH and GEMINI_CACHE_MAX_BYTES."""
+    global _response_cache
+    if os.environ.get("GEMINI_CACHE_ENABLED", "1") == "0":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = DiskLRUCache(
+                path=os.environ.get("GEMINI_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=int(os.environ.get("GEMINI_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _response_cache
@@ -0,0 +1,140 @@
+#api_integration/structured_output.py
+import os
+import json
+import threading
+import dataclasses
+import typing
+
+# Python type -> Gemini schema type
+_SCHEMA_TYPES = {str: "STRING", int: "INTEGER", float: "NUMBER", bool: "BOOLEAN"}
+
+_decoder = json.JSONDecoder()
+
+def structured_output_enabled():
+    """JSON mode is on unless CV_AGENT_STRUCTURED_OUTPUT=0"""
+    return os.environ.get("CV_AGENT_STRUCTURED_OUTPUT", "1") != "0"
+
+def string_schema(nullable=False):
+    schema = {"type": "STRING"}
+    if nullable:
+        schema["nullable"] = True
+    return schema
+
+def array_schema(items, nullable=False):
+    schema = {"type": "ARRAY", "items": items}
+    if nullable:
+        schema["nullable"] = True
+    return schema
+
+def object_schema(properties, required=None, nullable=False):
+    schema = {"type": "OBJECT", "properties": properties, "required": list(properties) if required is None else required}
+    if nullable:
+        schema["nullable"] = True
+    return schema
+
+def schema_from_dataclass(cls):
+    """Gemini response schema of a dataclass: Optional fields are nullable and not required"""
+    hints = typing.get_type_hints(cls)
+    properties = {}
+    required = []
+    for field in dataclasses.fields(cls):
+        field_type = hints[field.name]
+        args = typing.get_args(field_type)
+        nullable = type(None) in args
+        if nullable:
+            field_type = next(arg for arg in args if arg is not type(None))
+        properties[field.name] = {"type": _SCHEMA_TYPES.get(field_type, "STRING")}
+        if nullable:
+            properties[field.name]["nullable"] = True
+        else:
+            required.append(field.name)
+    return object_schema(properties, required)
+
+def json_generation_config(schema=None):
+    """Generation config asking Gemini for a JSON response (that follows schema, if given).
+    Returns None when structured output is disabled, which keeps the free-text behaviour."""
+    if not structured_output_enabled():
+        return None
+    config = {"response_mime_type": "application/json"}
+    if schema is not None:
+        config["response_schema"] = schema
+    return config
+
+class ParseStats:
+    """Counts the JSON responses per stage: parsed directly, parsed after removing a wrapper, or failed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def record(self, stage, outcome):
+        with self._lock:
+            counts = self.counts.setdefault(stage or "unknown", {'parsed': 0, 'repaired': 0, 'failed': 0})
+            counts[outcome] += 1
+
+    def failure_rate(self, stage=None):
+        with self._lock:
+            stages = [self.counts[stage]] if stage else list(self.counts.values())
+            total = sum(sum(counts.values()) for counts in stages)
+            failed = sum(counts['failed'] for counts in stages)
+        return failed / total if total else 0.0
+
+    def summary(self):
+        with self._lock:
+            return {stage: dict(counts, failure_rate=round(counts['failed'] / max(1, sum(counts.values())), 4))
+                    for stage, counts in self.counts.items()}
+
+parse_stats = ParseStats()
+
+def _unwrap(text):
+    """Parses the first JSON value of a response with extra text around it (markdown fences, quotes, comments)"""
+    if "```" in text:
+        fenced = text.split("```")[1]
+        text = fenced[4:] if fenced.startswith("json") else fenced
+    starts = [position for position in (text.find("{"), text.find("[")) if position != -1]
+    if not starts:
+        raise json.JSONDecodeError("No JSON object found in the response", text, 0)
+    value, _ = _decoder.raw_decode(text, min(starts))
+    return value
+
+def load_json_response(response):
+    """Parses a JSON response like parse_json_response without counting it in parse_stats.
+    Raises: json.JSONDecodeError when the response holds no valid JSON."""
+    text = str(response).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return _unwrap(text)
+
+def is_json_response(response):
+    """Validator of the JSON prompts, only the responses that parse are cached (see GeminiAPI)"""
+    if not response:
+        return False
+    try:
+        load_json_response(response)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+def parse_json_response(response, stage=None):
+    """Shared parser of the LLM JSON responses.
+    A structured-output response is parsed in one json.loads; free-text responses are unwrapped
+    as a fallback. Every outcome is counted in parse_stats.
+    Raises: json.JSONDecodeError when the response holds no valid JSON."""
+    if response is None:
+        parse_stats.record(stage, 'failed')
+        raise json.JSONDecodeError("Empty response", "", 0)
+    text = str(response).strip()
+    try:
+        value = json.loads(text)
+        parse_stats.record(stage, 'parsed')
+        return value
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = _unwrap(text)
+    except json.JSONDecodeError:
+        parse_stats.record(stage, 'failed')
+        raise
+    parse_stats.record(stage, 'repaired')
+    return value
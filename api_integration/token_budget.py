@@ -0,0 +1,104 @@
+#api_integration/token_budget.py
+import os
+import re
+import contextvars
+
+# Prompt budgets in (estimated) tokens per stage, override them with CV_AGENT_TOKEN_BUDGET_<STAGE>
+DEFAULT_BUDGETS = {
+    "extraction": 12000,
+    "feedback": 8000,
+    "questions": 8000,
+    "email_format": 6000,
+}
+PAGE_BREAK = "\f"
+
+_word_pattern = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_spaces_pattern = re.compile(r"[ \t\u00a0]+")
+_blank_lines_pattern = re.compile(r"\n\s*\n\s*\n+")
+
+# Name of the resume being processed, set by the batch runner so every LLM call can be attributed to it
+current_resume = contextvars.ContextVar("current_resume", default=None)
+
+def estimate_tokens(text):
+    """Local, deterministic token estimate: one token per short word or punctuation mark,
+    long words count one extra token every 5 characters (close to SentencePiece on Spanish/English text)"""
+    if not text:
+        return 0
+    return sum(1 + len(piece) // 5 for piece in _word_pattern.findall(str(text)))
+
+def get_budget(stage):
+    """Token budget for a stage (None means unlimited)"""
+    name = f"CV_AGENT_TOKEN_BUDGET_{stage.upper()}"
+    value = os.environ.get(name)
+    if value is None:
+        return DEFAULT_BUDGETS.get(stage)
+    try:
+        value = int(value)
+    except ValueError:
+        print(f"Invalid {name} value, using the default")
+        return DEFAULT_BUDGETS.get(stage)
+    return value if value > 0 else None
+
+def collapse_whitespace(text):
+    """Collapses runs of spaces and blank lines, page breaks are kept"""
+    pages = [_blank_lines_pattern.sub("\n\n", _spaces_pattern.sub(" ", page)).strip() for page in text.split(PAGE_BREAK)]
+    return PAGE_BREAK.join(pages)
+
+def drop_trailing_pages(text, max_tokens):
+    """Drops pages from the end until the text fits, the first page is always kept"""
+    pages = text.split(PAGE_BREAK)
+    while len(pages) > 1 and estimate_tokens(PAGE_BREAK.join(pages)) > max_tokens:
+        pages.pop()
+    return PAGE_BREAK.join(pages)
+
+def truncate_to_tokens(text, max_tokens):
+    """Hard cap: keeps the words that fit in max_tokens"""
+    used = 0
+    for match in _word_pattern.finditer(text):
+        used += 1 + len(match.group(0)) // 5
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+def fit_text_to_budget(text, stage, overhead_tokens=0, budget=None):
+    """Trims a prompt input so that overhead + text fits the stage budget (or the given budget).
+    Strategies are applied in order and only while still over budget: collapse whitespace,
+    drop trailing pages, truncate. The text is returned untouched when it already fits.
+    Returns: (text, list of applied strategies)"""
+    if budget is None:
+        budget = get_budget(stage)
+    if budget is None or not text:
+        return text, []
+    available = max(1, budget - overhead_tokens)
+    applied = []
+    for name, strategy in (
+        ("collapse_whitespace", lambda t: collapse_whitespace(t)),
+        ("drop_trailing_pages", lambda t: drop_trailing_pages(t, available)),
+        ("truncate", lambda t: truncate_to_tokens(t, available)),
+    ):
+        if estimate_tokens(text) <= available:
+            break
+        text = strategy(text)
+        applied.append(name)
+    if applied:
+        print(f"Prompt input for {stage} trimmed to the {budget} token budget ({', '.join(applied)})")
+    return text, applied
+
+def cap_sections(fields, stage, overhead_tokens=0):
+    """Caps the resume sections formatted into a prompt (summary, skills, experience...).
+    When the sections do not fit the budget, each one is limited to an equal share of it.
+    Returns: the fields dictionary (the same object when nothing had to be trimmed)"""
+    budget = get_budget(stage)
+    if budget is None:
+        return fields
+    available = max(1, budget - overhead_tokens)
+    sizes = {name: estimate_tokens(value) for name, value in fields.items()}
+    if sum(sizes.values()) <= available:
+        return fields
+
+    share = available // max(1, len(fields))
+    capped = {}
+    for name, value in fields.items():
+        capped[name] = value if sizes[name] <= share else truncate_to_tokens(collapse_whitespace(str(value)), share)
+    print(f"Prompt sections for {stage} capped to {share} tokens each to fit the {budget} token budget")
+    return capped
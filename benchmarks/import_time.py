@@ -0,0 +1,67 @@
+#benchmarks/import_time.py
+"""Import time of the CLI entry points and core modules, each measured in a fresh interpreter.
+Run it from the project root, no network or credentials needed (importing must not authenticate):
+    python -m benchmarks.import_time --repeat 5
+    python -m benchmarks.import_time --modules main core.handle_resume_from_drive --top 15
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+DEFAULT_MODULES = [
+    "main",
+    "main2",
+    "core.handle_resume_from_drive",
+    "core.handle_resume_from_email",
+    "core.information_extractor",
+    "core.general_feedback",
+    "temporal.temporal",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports (cumulative) listed per module, 0 disables them")
+    return parser.parse_args()
+
+def import_once(module):
+    """Imports module in a new interpreter with -X importtime.
+    Returns (seconds, [(cumulative microseconds, imported module)]) or raises RuntimeError with the import error."""
+    env = dict(os.environ, CV_AGENT_LLM_BACKEND="replay")  # Even a module that builds its client eagerly stays offline
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+
+    imports = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.rstrip()))
+    return float(completed.stdout.strip().splitlines()[-1]), imports
+
+def main():
+    args = parse_args()
+    print(f"--- Import time ({args.repeat} fresh interpreters per module, median) ---")
+    for module in args.modules:
+        try:
+            runs = [import_once(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module}: failed ({e})")
+            continue
+        print(f"{module}: {statistics.median(seconds for seconds, _ in runs) * 1000:.1f} ms")
+        if args.top:
+            # Root packages only (pandas, fitz, googleapiclient...), the imports a deferred import would save
+            packages = [(us, name.strip()) for us, name in runs[-1][1]
+                        if "." not in name.strip() and name.strip() != module.split(".")[0]]
+            for us, name in sorted(packages, reverse=True)[:args.top]:
+                print(f"    {us / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
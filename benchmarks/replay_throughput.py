@@ -0,0 +1,96 @@
+#benchmarks/replay_throughput.py
+"""End-to-end throughput of the review pipeline (extraction + feedback) against the offline replay backend.
+Run it from the project root, no network or API key needed:
+    python -m benchmarks.replay_throughput --resumes 200 --concurrency 8 --latency 1.5 --jitter 0.5 --error-rate 0.02
+Use --mode both to compare the two-call path with the single-pass extract + review call.
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+SAMPLE_RESUME = """Ana López
+ana.lopez@example.com | +52 55 1234 5678
+Perfil
+Analista de datos con 5 años de experiencia en reportes y automatización.
+Experiencia laboral
+Analista de datos, Empresa, CDMX, enero 2020 - actual
+- Automaticé reportes semanales con Python y SQL.
+Educación
+Licenciatura en Economía, UNAM, 2014 - 2018
+Idiomas
+Inglés avanzado
+"""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=50, help="Number of synthetic resumes to process")
+    parser.add_argument("--concurrency", type=int, default=4, help="Resumes processed at the same time")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean latency of each replayed LLM call, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Uniform jitter added to the latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail with an injected 429")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed of the replay backend")
+    parser.add_argument("--recordings", default=None, help="JSONL file recorded with CV_AGENT_LLM_RECORD")
+    parser.add_argument("--mode", choices=["two-call", "single-pass", "both"], default="two-call",
+                        help="Review path to measure: extraction then feedback, or the combined single-pass call")
+    return parser.parse_args()
+
+def configure_environment(args, work_dir):
+    """Points every LLM call at the replay backend, with the cache off and a quota that never throttles"""
+    os.environ.update({
+        "CV_AGENT_LLM_BACKEND": "replay",
+        "CV_AGENT_REPLAY_LATENCY": str(args.latency),
+        "CV_AGENT_REPLAY_JITTER": str(args.jitter),
+        "CV_AGENT_REPLAY_ERROR_RATE": str(args.error_rate),
+        "CV_AGENT_REPLAY_SEED": str(args.seed),
+        "GEMINI_CACHE_ENABLED": "0",
+        "GEMINI_RPM": "1000000",
+        "GEMINI_TPM": "1000000000",
+        "GEMINI_RATE_LIMIT_DB": os.path.join(work_dir, "rate_limiter.sqlite"),
+    })
+    if args.recordings:
+        os.environ["CV_AGENT_REPLAY_FILE"] = args.recordings
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(args, work_dir)
+
+        # Imported after the environment is set, the shared LLM clients read it when they are first built
+        from core.information_extractor import extract_information
+        from core.general_feedback import general_analyzer
+        from core.single_pass import extract_and_review
+        from core.batch_runner import run_batch
+
+        def two_call(index):
+            resume_array = {}
+            start = time.perf_counter()
+            extract_information(resume_array, f"{SAMPLE_RESUME}\nID {index}", "extracted_sections", "user_extract_all_sections")
+            if resume_array.get("extracted_sections"):
+                general_analyzer(resume_array["extracted_sections"])
+            return time.perf_counter() - start
+
+        def single_pass(index):
+            start = time.perf_counter()
+            extract_and_review(f"{SAMPLE_RESUME}\nID {index}")
+            return time.perf_counter() - start
+
+        modes = {"two-call": two_call, "single-pass": single_pass}
+        for mode in (modes if args.mode == "both" else [args.mode]):
+            start = time.perf_counter()
+            results = run_batch(list(range(args.resumes)), modes[mode], max_concurrency=args.concurrency)
+            report(mode, args, results, time.perf_counter() - start)
+
+def report(mode, args, results, elapsed):
+    latencies = sorted(r.result for r in results if r.result is not None)
+    failed = sum(1 for r in results if r.error)
+    print(f"\n--- Replay throughput ({mode}) ---")
+    print(f"Resumes: {args.resumes}, concurrency: {args.concurrency}, failed: {failed}")
+    print(f"Wall time: {elapsed:.2f}s, throughput: {args.resumes / elapsed:.2f} resumes/s")
+    if latencies:
+        print(f"Per-resume latency p50: {statistics.median(latencies):.2f}s, "
+              f"p95: {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s, max: {latencies[-1]:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 # core/asking_questions.py
 
-from api_integration.gemini_api import GeminiAPI
+from api_integration.gemini_api import get_gemini_api
+from api_integration.token_budget import estimate_tokens, cap_sections
+from api_integration.structured_output import object_schema, array_schema, string_schema, json_generation_config, parse_json_response, is_json_response
 from data.data_handler import load_prompt, save_data
 import json
 from datetime import datetime
 
-gemini_api = GeminiAPI()
+QUESTIONS_PROMPT = "q_for_users@v1"
+
+# Response schema of QUESTIONS_PROMPT
+QUESTIONS_SCHEMA = object_schema({
+    "email_asking questions_intro": string_schema(),
+    "asking_complementary_info": object_schema({
+        name: object_schema({"questions": array_schema(string_schema()), "notes": string_schema()})
+        for name in ["summary", "skills", "work_experience", "education", "languages"]
+    }),
+    "email_asking_questions_closing": string_schema(),
+})
 
 def complementary_questions(resume_content, file_name):
     """Analyzes resume sections and ask clarifying questions in order to build an enhanced resume version
@@ -24,17 +36,19 @@ def complementary_questions(resume_content, file_name):
     try:
 
         # Structure the prompt to request a structured JSON response
-        prompt_content = load_prompt("q_for_users_v1.txt")
+        prompt_content = load_prompt(QUESTIONS_PROMPT)
+
+        # Sections are capped only when the prompt would go over the questions token budget
+        sections = cap_sections({
+            'Summary': resume_content["extracted_sections"]["summary"],
+            'Skills': resume_content["extracted_sections"]["skills"],
+            'Work_Experience': resume_content["extracted_sections"]["relevant_work_experience"],
+            'Education': resume_content["extracted_sections"]["education"],
+            'Languages': resume_content["extracted_sections"]["languages"],
+        }, "questions", estimate_tokens(prompt_content))
 
         # Format the prompt with the user's data
-        formatted_prompt = prompt_content.format(
-            first_name = first_name.title(),
-            Summary = resume_content["extracted_sections"]["summary"],
-            Skills = resume_content["extracted_sections"]["skills"],
-            Work_Experience = resume_content["extracted_sections"]["relevant_work_experience"],
-            Education = resume_content["extracted_sections"]["education"],
-            Languages = resume_content["extracted_sections"]["languages"],
-        )
+        formatted_prompt = prompt_content.format(first_name = first_name.title(), **sections)
     except Exception as e:
         print(f"Error formatting the prompt: {e}")
         return {
@@ -43,20 +57,14 @@ def complementary_questions(resume_content, file_name):
         }
     try:
         # Get clarifying questions from Gemini - the response will be in JSON format
-        questions_response = gemini_api.generate_content(formatted_prompt)
+        questions_response = get_gemini_api().generate_content(formatted_prompt, json_generation_config(QUESTIONS_SCHEMA), stage="questions", prompt_ref=QUESTIONS_PROMPT,
+                                                                   validate=is_json_response)
     except Exception as e:
         print(f"Error generating complementary questions: {e}")
 
     try:
-        # Clean the response text and ensure it's proper JSON
-        response_text = str(questions_response).strip()
-        # Remove markdown code blocks if present
-        response_text = response_text.strip("```json").strip("```")
-        # Remove any leading/trailing whitespace and quotes
-        response_text = response_text.strip('"\' \n\t')
-        
         # Parse the JSON response
-        questions_dict = json.loads(response_text)
+        questions_dict = parse_json_response(questions_response, "questions")
 
         # Create the timestamp for the questions
         questions_time = {
@@ -74,11 +82,11 @@ def complementary_questions(resume_content, file_name):
     
     except json.JSONDecodeError as json_err:
         print(f"JSON parsing error: {json_err}")
-        print(f"Attempted to parse: {response_text}")
+        print(f"Attempted to parse: {questions_response}")
         return {
             'error_message': f"Failed to parse Gemini response as JSON: {str(json_err)}",
             'error_type': 'JSONDecodeError',
-            'raw_response': response_text,
+            'raw_response': str(questions_response),
             'analysis_timestamp': datetime.now().isoformat()
         }
     
\ No newline at end of file
@@ -0,0 +1,114 @@
+#core/batch_runner.py
+import os
+import asyncio
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+from api_integration.response_cache import get_response_cache
+from api_integration.token_budget import current_resume
+from api_integration.call_metrics import call_metrics
+from api_integration.structured_output import parse_stats
+from api_integration.call_policy import get_call_policy
+from api_integration.adaptive_concurrency import get_concurrency_limiter
+
+# Number of files processed at the same time, override it with CV_AGENT_MAX_CONCURRENCY
+DEFAULT_MAX_CONCURRENCY = 4
+
+@dataclass
+class BatchResult:
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[str] = None
+
+def get_max_concurrency():
+    """Reads the concurrency limit from the environment, falling back to DEFAULT_MAX_CONCURRENCY"""
+    try:
+        value = int(os.environ.get("CV_AGENT_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    except ValueError:
+        print("Invalid CV_AGENT_MAX_CONCURRENCY value, using the default")
+        value = DEFAULT_MAX_CONCURRENCY
+    return max(1, value)
+
+async def run_bounded(items: Iterable[Any], worker: Callable, max_concurrency: Optional[int] = None, label: Callable = str) -> List[BatchResult]:
+    """Runs worker(item) for every item keeping at most max_concurrency of them in flight.
+    Args:
+        items: The items to process (e.g. the Drive file objects). A generator is consumed lazily in a worker thread,
+            so the items still being produced (downloaded, read...) overlap with the ones being processed.
+        worker: A coroutine function or a regular function; regular functions run in a worker thread.
+        max_concurrency: Maximum number of items processed at once (None reads CV_AGENT_MAX_CONCURRENCY).
+        label: Function used to name an item in the progress messages.
+    Returns: A list of BatchResult in the same order as items. A failing item never stops the batch,
+        its traceback is stored in BatchResult.error."""
+    if max_concurrency is None:
+        max_concurrency = get_max_concurrency()
+    total = f" of {len(items)}" if isinstance(items, (list, tuple)) else ""
+    iterator = iter(items)
+    next_lock = asyncio.Lock()  # A generator can't be advanced from two threads at once
+    results = []
+    done = object()
+
+    async def run_one(index, item):
+        print(f"\nProcessing file {index + 1}{total}: {label(item)}")
+        # Every LLM call made for this item is attributed to it in the call metrics (to_thread copies the context)
+        current_resume.set(label(item))
+        try:
+            if asyncio.iscoroutinefunction(worker):
+                result = await worker(item)
+            else:
+                result = await asyncio.to_thread(worker, item)
+            return BatchResult(index=index, item=item, result=result)
+        except Exception as e:
+            print(f"An error occurred when processing {label(item)}: {e}")
+            return BatchResult(index=index, item=item, error=traceback.format_exc())
+
+    async def consume():
+        while True:
+            async with next_lock:
+                item = await asyncio.to_thread(next, iterator, done)
+                if item is done:
+                    return
+                index = len(results)
+                results.append(None)
+            results[index] = await run_one(index, item)
+
+    await asyncio.gather(*(consume() for _ in range(max_concurrency)))
+    # The results are stored by index, they keep the input order no matter which item finishes first
+    return results
+
+def run_batch(items: Iterable[Any], worker: Callable, max_concurrency: Optional[int] = None, label: Callable = str) -> List[BatchResult]:
+    """Synchronous entry point for run_bounded, used by the CLI loops"""
+    return asyncio.run(run_bounded(items, worker, max_concurrency, label))
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Groups items in lists of size, each one is yielded as soon as it is full (the last one may be shorter)"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def report_batch(results: List[BatchResult], label: Callable = str):
+    """Prints a per-file summary of a batch, in the original file order"""
+    failed = [r for r in results if r.error]
+    skipped = [r for r in results if not r.error and r.result is None]
+    print(f"\nBatch finished: {len(results) - len(failed) - len(skipped)} processed, {len(skipped)} skipped, {len(failed)} failed")
+    for r in failed:
+        print(f"- {label(r.item)} failed:\n{r.error}")
+    cache = get_response_cache()
+    if cache is not None:
+        print(f"LLM response cache: {cache.stats()}")
+    latency = get_call_policy().tracker.stats()
+    if latency['count'] or latency['timeouts']:
+        print(f"LLM call latency (seconds): {latency}")
+        print(f"LLM concurrency: {get_concurrency_limiter().stats()}")
+    if parse_stats.counts:
+        print(f"LLM JSON responses: {parse_stats.summary()} (failure rate {parse_stats.failure_rate():.2%})")
+    spend = call_metrics.spend_by_resume()
+    if spend:
+        print("Estimated tokens sent to the LLM per resume:")
+        for resume, total in spend.items():
+            print(f"- {resume}: {total['prompt_tokens']} prompt + {total['response_tokens']} response tokens in {total['calls']} calls")
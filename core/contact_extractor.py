@@ -0,0 +1,158 @@
+#core/contact_extractor.py
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+
+EMAIL_PATTERN = re.compile(r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}(?![\w-])", re.IGNORECASE)
+LINKEDIN_PATTERN = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/(?P<slug>[\w%-]+)/?", re.IGNORECASE)
+PHONE_PATTERN = re.compile(r"(?<![\w/])\+?\d[\d\s().-]{7,}\d(?![\w/])")
+# A year, optionally after its month and day ("2018", "01/2019", "15.03.2020")
+DATE_PATTERN = re.compile(r"(?<!\d)(?:\d{1,2}[/.]){0,2}(?:19|20)\d\d(?!\d)")
+# Fewer digits (as written, before adding the country code) are usually years or date ranges ("2014 - 2018")
+MIN_PHONE_DIGITS = 9
+MAX_PHONE_DIGITS = 15  # E.164
+# Country code added to numbers written without one, override it with CV_AGENT_DEFAULT_COUNTRY_CODE
+DEFAULT_COUNTRY_CODE = "52"
+# Providers that ignore dots and "+tag" in the local part, both spellings reach the same inbox
+DOT_INSENSITIVE_DOMAINS = {"gmail.com": "gmail.com", "googlemail.com": "gmail.com"}
+
+@dataclass
+class ContactInfo:
+    """The candidate's own contact details, the first of each kind found in the header or contact block"""
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    linkedin_profile: Optional[str] = None
+
+    def keys(self):
+        """Canonical identity keys of the candidate, used to match resumes of the same person"""
+        return contact_keys(self.email, self.phone_number, self.linkedin_profile)
+
+def contact_keys(email=None, phone_number=None, linkedin_profile=None):
+    """Identity keys of stored contact fields ("email:...", "phone:...", "linkedin:..."), empty values are ignored"""
+    keys = set()
+    for prefix, value in (("email", canonical_email(email)), ("phone", normalize_phone(phone_number)),
+                          ("linkedin", normalize_linkedin(linkedin_profile))):
+        if value:
+            keys.add(f"{prefix}:{value}")
+    return keys
+
+def skip_known_candidates():
+    """CV_AGENT_KNOWN_CANDIDATES=skip: a new PDF of a candidate already stored (same email, phone or LinkedIn)
+    keeps the stored extraction and is not sent to the LLM; the default "extract" extracts it under the known candidate id"""
+    return os.environ.get("CV_AGENT_KNOWN_CANDIDATES", "extract").lower() == "skip"
+
+def get_default_country_code():
+    return os.environ.get("CV_AGENT_DEFAULT_COUNTRY_CODE", DEFAULT_COUNTRY_CODE).lstrip("+")
+
+def canonical_email(email):
+    """Lowercased address, without dots and +tag in the local part for Gmail (ana.lopez+cv@gmail.com -> analopez@gmail.com)"""
+    if not email or "@" not in str(email):
+        return None
+    local, _, domain = str(email).strip().strip(".,;:<>()[]").lower().rpartition("@")
+    if domain in DOT_INSENSITIVE_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = DOT_INSENSITIVE_DOMAINS[domain]
+    return f"{local}@{domain}"
+
+def normalize_phone(phone, country_code=None):
+    """E.164-like form of a phone number (+5255...), None if it does not look like one.
+    Numbers without an international prefix get the default country code (CV_AGENT_DEFAULT_COUNTRY_CODE)."""
+    if phone is None:
+        return None
+    if isinstance(phone, float):  # Phone columns read back from a CSV become floats (NaN when empty)
+        if phone != phone:
+            return None
+        phone = int(phone)
+    phone = str(phone).strip()
+    digits = re.sub(r"\D", "", phone)
+    if len(digits) < MIN_PHONE_DIGITS or only_years(phone):
+        return None
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        country_code = country_code or get_default_country_code()
+        # Local prefixes of the old Mexican dialing plan (044/045 for mobiles, 01 for long distance)
+        if country_code == "52" and len(digits) in (12, 13) and digits[:3] in ("044", "045"):
+            digits = digits[3:]
+        elif country_code == "52" and len(digits) == 12 and digits.startswith("01"):
+            digits = digits[2:]
+        if not digits.startswith(country_code) or len(digits) <= 10:
+            digits = country_code + digits
+    # Mexican mobiles were dialed with a 1 after the country code until 2019: +52 1 55... is +52 55...
+    if digits.startswith("521") and len(digits) == 13:
+        digits = "52" + digits[3:]
+    if not MIN_PHONE_DIGITS <= len(digits) <= MAX_PHONE_DIGITS:
+        return None
+    return f"+{digits}"
+
+def normalize_linkedin(url):
+    """https://www.linkedin.com/in/<profile>, whatever the subdomain, scheme or trailing slash"""
+    match = LINKEDIN_PATTERN.search(str(url or ""))
+    if not match:
+        return None
+    return f"https://www.linkedin.com/in/{match.group('slug').lower()}"
+
+def only_years(candidate):
+    """True for date ranges like "2018 - 2020", "01/2019 - 12/2020" or "2019 2020 2021", every number is part of a date"""
+    candidate = str(candidate)
+    return bool(re.search(r"\d", candidate)) and not re.search(r"\d", DATE_PATTERN.sub(" ", candidate))
+
+def is_phone_number(candidate):
+    return MIN_PHONE_DIGITS <= sum(char.isdigit() for char in candidate) <= MAX_PHONE_DIGITS and not only_years(candidate)
+
+def is_contact_line(line):
+    """True if the line holds an email, a LinkedIn URL or a phone number"""
+    if EMAIL_PATTERN.search(line) or LINKEDIN_PATTERN.search(line):
+        return True
+    return any(is_phone_number(match) for match in PHONE_PATTERN.findall(line))
+
+def extract_contacts(resume_text):
+    """The candidate's own email, phone and LinkedIn profile, without an LLM call.
+    Only the header and contact block (see core/section_segmenter) are searched and only the first value of each
+    kind is kept, the emails and phones of references or employers further down never identify the candidate.
+    Emails are kept as written (lowercased), phones are normalized with normalize_phone."""
+    # Imported here because the segmenter imports this module
+    from core.section_segmenter import segment_resume
+
+    contacts = ContactInfo()
+    text = segment_resume(resume_text).get("contact", "")
+    email = EMAIL_PATTERN.search(text)
+    if email:
+        contacts.email = email.group(0).strip(".").lower()
+    linkedin = LINKEDIN_PATTERN.search(text)
+    if linkedin:
+        contacts.linkedin_profile = normalize_linkedin(linkedin.group(0))
+    # Emails and LinkedIn URLs are removed first, their digits would look like phone numbers
+    text = LINKEDIN_PATTERN.sub(" ", EMAIL_PATTERN.sub(" ", text))
+    for match in PHONE_PATTERN.finditer(text):
+        phone = normalize_phone(match.group(0)) if is_phone_number(match.group(0)) else None
+        if phone:
+            contacts.phone_number = phone
+            break
+    return contacts
+
+def _name_tokens(name):
+    if not isinstance(name, str):  # NaN in the CSV columns
+        return []
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.findall(r"[a-z]+", name.lower())
+
+def same_person_name(first_name, last_name, other_first_name, other_last_name):
+    """False only when both names are known and disagree (first given name or every surname differs),
+    a contact detail shared by two different people must not merge them"""
+    first, other_first = _name_tokens(first_name), _name_tokens(other_first_name)
+    if first and other_first and first[0] != other_first[0]:
+        return False
+    last, other_last = set(_name_tokens(last_name)), set(_name_tokens(other_last_name))
+    return not (last and other_last and not last & other_last)
+
+def merge_contacts(user_info, contacts):
+    """Fills the contact fields the LLM left empty in user_info with the locally extracted ones"""
+    for key in ("email", "phone_number", "linkedin_profile"):
+        if not user_info.get(key) and getattr(contacts, key):
+            user_info[key] = getattr(contacts, key)
+    return user_info
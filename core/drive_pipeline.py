@@ -0,0 +1,97 @@
+#core/drive_pipeline.py
+from core.information_extractor import get_extraction_batch_size
+from core.handle_resume_from_email import questions_email_draft
+from core.handle_resume_from_drive import process_resume_from_drive, process_and_review_resume_from_drive, analyze_resume, email_body_creation, email_body_creation_asking_questions, analyze_resume_with_df, process_resume_from_drive_with_df, process_and_review_resume_from_drive_with_df, email_body_creation_with_df, select_files_to_sync, record_synced_files
+from core.single_pass import single_pass_enabled
+from core.asking_questions import complementary_questions
+from core.batch_runner import run_batch, report_batch
+
+def extracted_label(result):
+    """Names an item returned by the batched Drive extraction in the progress messages"""
+    return result[2] if result else "skipped file"
+
+def review_resume(result):
+    """Feedback and email draft for a resume already extracted from Drive"""
+    if result is None:
+        return None
+    resume_array, file_id, file_name = result
+    feedback_result = analyze_resume(resume_array, file_name)
+    return email_body_creation(resume_array, feedback_result)
+
+def review_drive_file(file):
+    """Runs the review pipeline (extraction, feedback and email draft) for one Drive file"""
+    if single_pass_enabled():
+        # Extraction and feedback in one LLM call (CV_AGENT_SINGLE_PASS=1)
+        reviewed = process_and_review_resume_from_drive(file["name"], file["id"], file.get("md5Checksum"))
+        if reviewed is None:
+            print(f"Skipping file {file['name']} (not a PDF or processing error)")
+            return None
+        resume_array, feedback_result = reviewed
+        return email_body_creation(resume_array, feedback_result)
+
+    result = process_resume_from_drive(file["name"], file["id"], file.get("md5Checksum"))
+    if result is None:
+        print(f"Skipping file {file['name']} (not a PDF or processing error)")
+        return None
+    return review_resume(result)
+
+def review_resume_with_df(result):
+    """Feedback and email draft for a resume already extracted into the dataframes"""
+    if result is None:
+        return None
+    candidate_id, file_id, file_name = result
+    feedback_result = analyze_resume_with_df(candidate_id, file_name)
+    return email_body_creation_with_df(candidate_id)
+
+def review_drive_file_with_df(file):
+    """Runs the dataframe review pipeline (extraction, feedback and email draft) for one Drive file"""
+    if single_pass_enabled():
+        # Extraction and feedback in one LLM call (CV_AGENT_SINGLE_PASS=1)
+        reviewed = process_and_review_resume_from_drive_with_df(file["name"], file["id"], md5_checksum=file.get("md5Checksum"))
+        if reviewed is None:
+            print(f"Skipping file {file['name']} (not a PDF or processing error)")
+            return None
+        candidate_id, feedback_result = reviewed
+        return email_body_creation_with_df(candidate_id)
+
+    result = process_resume_from_drive_with_df(file["name"], file["id"], md5_checksum=file.get("md5Checksum"))
+    if result is None:
+        print(f"Skipping file {file['name']} (not a PDF or processing error)")
+        return None
+    return review_resume_with_df(result)
+
+def questions_resume(results):
+    """Complementary questions and email draft for a resume already extracted from Drive"""
+    if results is None:
+        return None
+    resume_array, file_id, file_name = results
+    questions = complementary_questions(resume_array, file_name)
+    email_body, user_name, recipient_email = email_body_creation_asking_questions(resume_array, questions)
+
+    questions_email_draft(recipient_email, user_name, email_body)
+    return email_body
+
+def questions_drive_file(file):
+    """Runs the new version pipeline (extraction, complementary questions and email draft) for one Drive file"""
+    results = process_resume_from_drive(file["name"], file["id"], file.get("md5Checksum"))
+    if results is None:
+        print(f"Skipping file {file['name']} (not a PDF or processing error)")
+        return None
+    return questions_resume(results)
+
+def run_drive_pipeline(folder_id, pipeline, files, per_file, batch_extract, per_extracted_resume):
+    """Runs a Drive pipeline over the files, with the opt-in batched extraction when CV_AGENT_EXTRACTION_BATCH_SIZE > 1.
+    With CV_AGENT_DRIVE_INCREMENTAL=1 only the files new or modified since the last run of the pipeline on the folder are processed.
+    Args: folder_id: The ID of the Drive folder, pipeline: Name of the pipeline in the sync state (e.g. "review"),
+        per_file: Callback run for each file, batch_extract: Extraction of many files at once (e.g. process_resumes_from_drive_batch),
+        per_extracted_resume: Callback run for each item batch_extract yields."""
+    files = select_files_to_sync(folder_id, pipeline, files)
+    if get_extraction_batch_size() > 1:
+        extracted = batch_extract(files)
+        results = run_batch(extracted, per_extracted_resume, label=extracted_label)
+        report_batch(results, label=extracted_label)
+    else:
+        results = run_batch(files, per_file, label=lambda file: file['name'])
+        report_batch(results, label=lambda file: file['name'])
+    record_synced_files(folder_id, pipeline, files, results)
+    return results
@@ -1,13 +1,29 @@
 #core/general_feedback.py
 
-from api_integration.gemini_api import GeminiAPI
+from api_integration.gemini_api import get_gemini_api
+from api_integration.token_budget import estimate_tokens, cap_sections, fit_text_to_budget
+from api_integration.structured_output import object_schema, string_schema, json_generation_config, parse_json_response, is_json_response
 from data.data_handler import load_prompt
 from datetime import datetime
+import os
 import re
+import asyncio
 import unicodedata
 import json
 
-gemini_api = GeminiAPI()
+# Prompts of general_analyzer, general_analyzer_df and the per-section fan-out
+FEEDBACK_PROMPT = "entire_resume_analyzer@v6"
+FEEDBACK_DF_PROMPT = "entire_resume_analyzer@v7"
+SECTION_FEEDBACK_PROMPT = "section_analyzer@v1"
+
+def feedback_schema(section_names):
+    """Response schema of the feedback prompts: {"sections": {name: {"feedback": ..., "example": ...}}}"""
+    section = object_schema({"feedback": string_schema(), "example": string_schema()})
+    return object_schema({"sections": object_schema({name: section for name in section_names})})
+
+# Sections of FEEDBACK_PROMPT (general_analyzer) and FEEDBACK_DF_PROMPT (general_analyzer_df)
+FEEDBACK_SCHEMA = feedback_schema(["summary", "skills", "work_experience", "education", "languages"])
+FEEDBACK_DF_SCHEMA = feedback_schema(["summary", "hard_skills", "soft_skills", "work_experience", "education", "languages"])
 
 def normalize_text(text):
     """Remove accents and convert to lowercase"""
@@ -81,43 +97,58 @@ def parse_sections(feedback_text):
     
     return sections
 
-def general_analyzer(resume_dict):
-    try:
-        # Extract relevant sections from the dictionary
-        first_name = resume_dict["user_info"]["first_name"]
-        
-        # Convert to string if it's not already a string
-        first_name = str(first_name) if not isinstance(first_name, str) else first_name
+# Section of the local segmentation (core/section_segmenter.py) behind each field of FEEDBACK_PROMPT
+SEGMENT_OF_FIELD = {
+    'Summary': "summary",
+    'Skills': "skills",
+    'Work_Experience': "work_experience",
+    'Education': "education",
+    'Languages': "languages",
+}
 
-        # Structure the prompt to request a structured JSON response
-        prompt_content = load_prompt("entire_resume_analyzer_prompt_v6.txt")
-        
-        # Format the prompt with the user's data
-        formatted_prompt = prompt_content.format(
-            first_name=first_name.title(),
-            Summary=resume_dict["summary"],
-            Skills=resume_dict["skills"],
-            Work_Experience=json.dumps(resume_dict["relevant_work_experience"]),  # Properly serialize to JSON
-            Education=resume_dict["education"],
-            Languages=resume_dict["languages"],
-        )
+def build_general_analyzer_prompt(resume_dict, resume_sections=None):
+    """Formats the feedback prompt for the extracted sections of a resume.
+    resume_sections is the local segmentation of the resume text (resume_array["resume_sections"]), the
+    sections the extraction left empty are filled with the text under the matching heading."""
+    # Extract relevant sections from the dictionary
+    first_name = resume_dict["user_info"]["first_name"]
+    
+    # Convert to string if it's not already a string
+    first_name = str(first_name) if not isinstance(first_name, str) else first_name
+
+    # Structure the prompt to request a structured JSON response
+    prompt_content = load_prompt(FEEDBACK_PROMPT)
+    
+    fields = {
+        'Summary': resume_dict.get("summary") or resume_dict["user_info"].get("summary"),
+        'Skills': resume_dict.get("skills"),
+        'Work_Experience': resume_dict.get("relevant_work_experience"),
+        'Education': resume_dict.get("education"),
+        'Languages': resume_dict.get("languages"),
+    }
+    for field, value in fields.items():
+        if not value and resume_sections and resume_sections.get(SEGMENT_OF_FIELD[field]):
+            fields[field] = resume_sections[SEGMENT_OF_FIELD[field]]
+    if not isinstance(fields['Work_Experience'], str):
+        fields['Work_Experience'] = json.dumps(fields['Work_Experience'])  # Properly serialize to JSON
+
+    # Sections are capped only when the prompt would go over the feedback token budget
+    sections = cap_sections(fields, "feedback", estimate_tokens(prompt_content))
+
+    # Format the prompt with the user's data
+    return prompt_content.format(first_name=first_name.title(), **sections)
+
+def general_analyzer(resume_dict, resume_sections=None):
+    try:
+        formatted_prompt = build_general_analyzer_prompt(resume_dict, resume_sections)
         
         # Get feedback from Gemini
-        feedback_response = gemini_api.generate_content(formatted_prompt)
+        feedback_response = get_gemini_api().generate_content_with_retry(formatted_prompt, json_generation_config(FEEDBACK_SCHEMA), stage="feedback",
+                                                                         prompt_ref=FEEDBACK_PROMPT, validate=is_json_response)
 
         try:
-            # Clean the response text
-            response_text = str(feedback_response).strip()
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "", 1)
-            if response_text.endswith("```"):
-                response_text = response_text.rsplit("```", 1)[0]
-            
-            # Remove any leading/trailing whitespace and quotes
-            response_text = response_text.strip('"\' \n\t')
-            
             # Parse the JSON response
-            feedback_dict = json.loads(response_text)
+            feedback_dict = parse_json_response(feedback_response, "feedback")
             
             # Create the structure for the dictionary
             structured_feedback = {
@@ -133,7 +164,7 @@ def general_analyzer(resume_dict):
             
         except json.JSONDecodeError as json_err:
             print(f"JSON parsing error: {json_err}")
-            print(f"Attempted to parse: {response_text}")
+            print(f"Attempted to parse: {feedback_response}")
             return {
                 'error': f"Failed to parse Gemini response as JSON: {str(json_err)}",
                 'raw_response': str(feedback_response),
@@ -146,6 +177,77 @@ def general_analyzer(resume_dict):
             'analysis_timestamp': datetime.now().isoformat()
         }
     
+def df_section_contents(candidate_data, skills, experience, education, languages):
+    """Formats each section of the candidate's dataframes as it goes into the feedback prompts.
+    Returns: {"Summary": ..., "Hard_Skills": ..., "Soft_Skills": ..., "Work_Experience": ..., "Education": ..., "Languages": ...}"""
+    # Format skills as separate lists for hard and soft skills
+    hard_skills_list = skills['hard_skills'].tolist() if 'hard_skills' in skills.columns and not skills.empty else []
+    soft_skills_list = skills['soft_skills'].tolist() if 'soft_skills' in skills.columns and not skills.empty else []
+    
+    # Format work experience as a list of dictionaries
+    work_experience = []
+    if not experience.empty:
+        # Sort by start_date in descending order
+        experience_sorted = experience.sort_values('start_date', ascending=False)
+        
+        for _, row in experience_sorted.iterrows():
+            exp = {
+                'job_title': row['title'],
+                'company': row['company'],
+                'start_date': row['start_date'],
+                'end_date': row['end_date'],
+                'description': row['description'],
+                'location': row['location']
+            }
+            work_experience.append(exp)
+    
+    # Format education as a list of dictionaries
+    education_list = []
+    if not education.empty:
+        # Sort by graduation_date in descending order
+        education_sorted = education.sort_values('start_date', ascending=False)
+        
+        for _, row in education_sorted.iterrows():
+            edu = {
+                'title': row['title'],
+                'institution': row['institution'],
+                'type': row['type'],
+                'start_date': row['start_date'],
+                'end_date': row['end_date'],
+                'notes': row['notes'],
+            }
+            education_list.append(edu)
+    
+    # Format languages as a list
+    languages_list = languages['language'].tolist() if not languages.empty else []
+    
+    # Get summary if available
+    summary = candidate_data['summary'].iloc[0] if 'summary' in candidate_data.columns else ""
+
+    return {
+        'Summary': summary,
+        'Hard_Skills': json.dumps(hard_skills_list),
+        'Soft_Skills': json.dumps(soft_skills_list),
+        'Work_Experience': json.dumps(work_experience),
+        'Education': json.dumps(education_list),
+        'Languages': ", ".join(languages_list),
+    }
+
+def build_general_analyzer_df_prompt(first_name, candidate_data, skills, experience, education, languages):
+    """Formats the feedback prompt from the candidate's dataframes (same arguments as general_analyzer_df)"""
+    # Structure the prompt to request a structured JSON response
+    prompt_content = load_prompt(FEEDBACK_DF_PROMPT)
+
+    # Convert to string if it's not already a string
+    first_name = str(first_name) if not isinstance(first_name, str) else first_name
+    
+    # Sections are capped only when the prompt would go over the feedback token budget
+    sections = cap_sections(df_section_contents(candidate_data, skills, experience, education, languages),
+                            "feedback", estimate_tokens(prompt_content))
+
+    # Format the prompt with the user's data
+    return prompt_content.format(first_name=first_name.title(), **sections)
+
 def general_analyzer_df(first_name, candidate_data, skills, experience, education, languages):
     """Analyze resume data from dataframes and generate feedback
     
@@ -161,83 +263,15 @@ def general_analyzer_df(first_name, candidate_data, skills, experience, educatio
         dict: Structured feedback for the candidate
     """
     try:
-        # Format skills as separate lists for hard and soft skills
-        hard_skills_list = skills['hard_skills'].tolist() if 'hard_skills' in skills.columns and not skills.empty else []
-        soft_skills_list = skills['soft_skills'].tolist() if 'soft_skills' in skills.columns and not skills.empty else []
-        
-        # Format work experience as a list of dictionaries
-        work_experience = []
-        if not experience.empty:
-            # Sort by start_date in descending order
-            experience_sorted = experience.sort_values('start_date', ascending=False)
-            
-            for _, row in experience_sorted.iterrows():
-                exp = {
-                    'job_title': row['title'],
-                    'company': row['company'],
-                    'start_date': row['start_date'],
-                    'end_date': row['end_date'],
-                    'description': row['description'],
-                    'location': row['location']
-                }
-                work_experience.append(exp)
-        
-        # Format education as a list of dictionaries
-        education_list = []
-        if not education.empty:
-            # Sort by graduation_date in descending order
-            education_sorted = education.sort_values('start_date', ascending=False)
-            
-            for _, row in education_sorted.iterrows():
-                edu = {
-                    'title': row['title'],
-                    'institution': row['institution'],
-                    'type': row['type'],
-                    'start_date': row['start_date'],
-                    'end_date': row['end_date'],
-                    'notes': row['notes'],
-                }
-                education_list.append(edu)
-        
-        # Format languages as a list
-        languages_list = languages['language'].tolist() if not languages.empty else []
-        
-        # Get summary if available
-        summary = candidate_data['summary'].iloc[0] if 'summary' in candidate_data.columns else ""
-        
-        # Structure the prompt to request a structured JSON response
-        prompt_content = load_prompt("entire_resume_analyzer_prompt_v7.txt")
+        formatted_prompt = build_general_analyzer_df_prompt(first_name, candidate_data, skills, experience, education, languages)
 
-        # Convert to string if it's not already a string
-        first_name = str(first_name) if not isinstance(first_name, str) else first_name
-        
-        # Format the prompt with the user's data
-        formatted_prompt = prompt_content.format(
-            first_name=first_name.title(),
-            Summary=summary,
-            Hard_Skills=json.dumps(hard_skills_list),
-            Soft_Skills=json.dumps(soft_skills_list),
-            Work_Experience=json.dumps(work_experience),
-            Education=json.dumps(education_list),
-            Languages=", ".join(languages_list),
-        )
-        
         # Get feedback from Gemini
-        feedback_response = gemini_api.generate_content(formatted_prompt)
+        feedback_response = get_gemini_api().generate_content_with_retry(formatted_prompt, json_generation_config(FEEDBACK_DF_SCHEMA), stage="feedback",
+                                                                         prompt_ref=FEEDBACK_DF_PROMPT, validate=is_json_response)
 
         try:
-            # Clean the response text
-            response_text = str(feedback_response).strip()
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "", 1)
-            if response_text.endswith("```"):
-                response_text = response_text.rsplit("```", 1)[0]
-            
-            # Remove any leading/trailing whitespace and quotes
-            response_text = response_text.strip('"\' \n\t')
-            
             # Parse the JSON response
-            feedback_dict = json.loads(response_text)
+            feedback_dict = parse_json_response(feedback_response, "feedback")
             
             # Create the structure for the dictionary
             structured_feedback = {
@@ -250,7 +284,7 @@ def general_analyzer_df(first_name, candidate_data, skills, experience, educatio
             
         except json.JSONDecodeError as json_err:
             print(f"JSON parsing error: {json_err}")
-            print(f"Attempted to parse: {response_text}")
+            print(f"Attempted to parse: {feedback_response}")
             return {
                 'error': f"Failed to parse Gemini response as JSON: {str(json_err)}",
                 'raw_response': str(feedback_response),
@@ -261,4 +295,223 @@ def general_analyzer_df(first_name, candidate_data, skills, experience, educatio
         return {
             'error': str(e),
             'analysis_timestamp': datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+# Sections of the per-section fan-out (the same keys as entire_resume_analyzer@v7) and what each prompt asks for:
+# (title, key in df_section_contents, analyze instructions, enhance instructions, example hint)
+FEEDBACK_SECTION_GUIDES = {
+    "summary": ("Summary", "Summary",
+                "Evaluate the summary based on its structure (Job Title & Experience, Core Skills, Achievements, Overall Strengths), clarity, conciseness, and alignment with the user's career goals.",
+                "Demonstrate how to structure the summary effectively.",
+                "Your enhanced summary example here"),
+    "hard_skills": ("Hard Skills", "Hard_Skills",
+                    "Assess the relevance of listed hard skills to the user's target roles and industry.",
+                    "Demonstrate how to present hard skills in a clear and concise manner.",
+                    "Your enhanced skills section example here"),
+    "soft_skills": ("Soft Skills", "Soft_Skills",
+                    "Assess the relevance of listed soft skills to the user's target roles and industry.",
+                    "Demonstrate how to present soft skills in a clear and concise manner.",
+                    "Your enhanced skills section example here"),
+    "work_experience": ("Work Experience", "Work_Experience",
+                        "Analyze the presentation of each role (Job Title, Company, Location, Dates), the use of action verbs and quantifiable achievements in each bullet point, and the overall impact conveyed. "
+                        "Assess each bullet point: 35% Hard & Soft Skills, 15% Measurable Metrics, 15% Action Words, 35% Common Words, 12-20 Words in Length.",
+                        "Use strong action verbs and quantifiable achievements ONLY for one role, each bullet starts with an action verb, includes measurable metrics, mentions relevant skills and has 12-20 words. "
+                        "Use the structure [[title] | [company] | [location] | [start date] - [end date]],[description: bulleted list structure as described above]",
+                        "Your enhanced work experience example for ONLY one role here."),
+    "education": ("Education", "Education",
+                  "Evaluate the completeness and accuracy of degree information (Degree, Institution, Location, Graduation Date), the inclusion of relevant honors and awards, and the presentation of certifications.",
+                  "Highlight relevant education details and certifications.",
+                  "Your enhanced education section example here"),
+    "languages": ("Languages", "Languages",
+                  "Assess the clarity and accuracy of language proficiency levels (Fluent, Proficient, Conversant, Basic).",
+                  "Accurately represent language proficiency levels as basic, fluent, native.",
+                  "Your enhanced languages section example here"),
+}
+SECTION_FEEDBACK_SCHEMA = object_schema({"feedback": string_schema(), "example": string_schema()})
+
+def feedback_fanout_enabled():
+    """Per-section feedback is opt-in, enable it with CV_AGENT_FEEDBACK_FANOUT=1"""
+    return os.environ.get("CV_AGENT_FEEDBACK_FANOUT", "0") == "1"
+
+def get_feedback_sections():
+    """Sections to review, CV_AGENT_FEEDBACK_SECTIONS="summary,work_experience" limits them (default all)"""
+    value = os.environ.get("CV_AGENT_FEEDBACK_SECTIONS")
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def build_section_prompt(section_name, first_name, contents):
+    """Formats the prompt of one section, contents comes from df_section_contents"""
+    title, content_key, analyze, enhance, example_hint = FEEDBACK_SECTION_GUIDES[section_name]
+    prompt_content = load_prompt(SECTION_FEEDBACK_PROMPT)
+    section_content, _ = fit_text_to_budget(str(contents[content_key]), "feedback", estimate_tokens(prompt_content))
+    return prompt_content.format(
+        first_name=str(first_name).title(),
+        section_title=title,
+        section_content=section_content,
+        analyze_instructions=analyze,
+        enhance_instructions=enhance,
+        example_hint=example_hint,
+    )
+
+async def _section_feedback(section_name, formatted_prompt):
+    # Retried like the other feedback calls, a 429 on one section must not drop it from the feedback
+    response = await get_gemini_api().agenerate_content_with_retry(formatted_prompt, json_generation_config(SECTION_FEEDBACK_SCHEMA),
+                                                           stage="feedback_section", prompt_ref=SECTION_FEEDBACK_PROMPT, validate=is_json_response)
+    try:
+        section = parse_json_response(response, "feedback_section")
+    except json.JSONDecodeError as json_err:
+        print(f"JSON parsing error in the {section_name} feedback: {json_err}")
+        return section_name, None
+    return section_name, section if isinstance(section, dict) else None
+
+async def _fan_out(prompts):
+    return await asyncio.gather(*(_section_feedback(name, formatted_prompt) for name, formatted_prompt in prompts.items()))
+
+def general_analyzer_df_sections(first_name, candidate_data, skills, experience, education, languages, sections=None):
+    """Per-section version of general_analyzer_df: one small prompt per section, all of them in flight at once,
+    so the latency is the one of the slowest section instead of one long generation.
+    Args: the same as general_analyzer_df, plus
+        sections: The sections to review (default get_feedback_sections(), or all of them), e.g. ["summary", "work_experience"].
+    Returns: dict with the same 'general_feedback': {'sections': ...} structure save_feedback_to_csv flattens."""
+    try:
+        sections = sections or get_feedback_sections() or list(FEEDBACK_SECTION_GUIDES)
+        unknown = [name for name in sections if name not in FEEDBACK_SECTION_GUIDES]
+        if unknown:
+            raise ValueError(f"Unknown feedback sections: {unknown}")
+        contents = df_section_contents(candidate_data, skills, experience, education, languages)
+        prompts = {name: build_section_prompt(name, first_name, contents) for name in sections}
+
+        # Called from the batch worker threads, each of them runs its own event loop
+        results = asyncio.run(_fan_out(prompts))
+    except Exception as e:
+        print(f"Error in general analyzer: {e}")
+        return {
+            'error': str(e),
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+
+    feedback_sections = {name: section for name, section in results if section is not None}
+    failed = [name for name, section in results if section is None]
+    if failed:
+        print(f"No feedback received for sections: {', '.join(failed)}")
+    if not feedback_sections:
+        return {
+            'error': "No feedback sections were generated",
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+
+    print("Generated feedback successfully.\n")
+    return {
+        'general_feedback': {'sections': feedback_sections},
+        'feedback_made_timestamp': datetime.now().isoformat()
+    }
+
+class SectionStreamParser:
+    """Parses the "sections" object of a feedback JSON incrementally, while the response is still streaming.
+    feed() returns the (section_name, section_feedback) pairs that were completed by the new chunk."""
+
+    _sections_start = re.compile(r'"sections"\s*:\s*\{')
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None  # Where the next section key starts inside the buffer
+        self.finished = False
+        self.decoder = json.JSONDecoder()
+
+    def _skip(self, characters):
+        while self.position < len(self.buffer) and self.buffer[self.position] in characters:
+            self.position += 1
+
+    def feed(self, chunk):
+        completed = []
+        if self.finished or not chunk:
+            return completed
+        self.buffer += chunk
+
+        if self.position is None:
+            match = self._sections_start.search(self.buffer)
+            if not match:
+                return completed
+            self.position = match.end()
+
+        while True:
+            self._skip(" \t\r\n,")
+            if self.position >= len(self.buffer):
+                break
+            if self.buffer[self.position] == "}":
+                self.finished = True
+                break
+            try:
+                # An incomplete key or value raises, we just wait for the next chunk
+                name, key_end = self.decoder.raw_decode(self.buffer, self.position)
+                colon = self.buffer.index(":", key_end)
+                value_start = colon + 1
+                while value_start < len(self.buffer) and self.buffer[value_start] in " \t\r\n":
+                    value_start += 1
+                section, value_end = self.decoder.raw_decode(self.buffer, value_start)
+            except (json.JSONDecodeError, ValueError):
+                break
+            completed.append((name, section))
+            self.position = value_end
+        return completed
+
+def stream_sections(formatted_prompt, on_section=None, schema=None, prompt_ref=None):
+    """Streams a feedback prompt and yields (section_name, section_feedback) as soon as each section is complete.
+    Returns (as the generator's return value) the full response text."""
+    parser = SectionStreamParser()
+    chunks = []
+    for chunk in get_gemini_api().generate_content_stream(formatted_prompt, json_generation_config(schema), stage="feedback", prompt_ref=prompt_ref,
+                                                             validate=is_json_response):
+        chunks.append(chunk)
+        for name, section in parser.feed(chunk):
+            if on_section:
+                on_section(name, section)
+            yield name, section
+    return "".join(chunks)
+
+def collect_streamed_feedback(section_stream):
+    """Consumes a streaming analyzer and returns the same structure as general_analyzer_df"""
+    sections = dict(section_stream)
+    if not sections:
+        return {
+            'error': "No feedback sections were received from the stream",
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+    return {
+        'general_feedback': {'sections': sections},
+        'feedback_made_timestamp': datetime.now().isoformat()
+    }
+
+def general_analyzer_stream(resume_dict, on_section=None):
+    """Streaming version of general_analyzer.
+    Yields (section_name, section_feedback) while the feedback is generated and calls on_section for each one,
+    so an email or UI can start rendering before the whole response is done. When the stream ends,
+    resume_dict is updated with the same 'general_feedback' structure general_analyzer adds."""
+    try:
+        formatted_prompt = build_general_analyzer_prompt(resume_dict)
+    except Exception as e:
+        print(f"Error in general analyzer: {e}")
+        return
+
+    sections = {}
+    for name, section in stream_sections(formatted_prompt, on_section, FEEDBACK_SCHEMA, FEEDBACK_PROMPT):
+        sections[name] = section
+        yield name, section
+
+    if sections:
+        resume_dict.update({
+            'general_feedback': {'sections': sections},
+            'feedback_made_timestamp': datetime.now().isoformat()
+        })
+        print("Added feedback to resume data.\n")
+
+def general_analyzer_df_stream(first_name, candidate_data, skills, experience, education, languages, on_section=None):
+    """Streaming version of general_analyzer_df, yields (section_name, section_feedback) as each section completes.
+    Use collect_streamed_feedback() to get the dictionary save_feedback_to_csv expects."""
+    try:
+        formatted_prompt = build_general_analyzer_df_prompt(first_name, candidate_data, skills, experience, education, languages)
+    except Exception as e:
+        print(f"Error in general analyzer: {e}")
+        return
+
+    yield from stream_sections(formatted_prompt, on_section, FEEDBACK_DF_SCHEMA, FEEDBACK_DF_PROMPT)
@@ -1,43 +1,40 @@
 #core/handle_resume_from_drive.py
 import os.path
 import uuid
-import time
 import io
 import json
 import traceback
-import pandas as pd
-from api_integration.gemini_api import GeminiAPI
-
-import traceback
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
-from api_integration.drive_api import authenticate_drive_api
-from data.data_handler import load_data, save_data, format_work_experience, get_candidate_feedback
-from core.information_extractor import get_resume_text_from_pdf, extract_information
+from api_integration.drive_api import get_drive_service
+from data.data_handler import load_data, save_data, format_work_experience, get_candidate_feedback, CSV_LOCK
+from data.pdf_index import get_pdf_index, lookup_processed, md5_of_bytes
+from data.pdf_archive import archive_pdf
+from data.drive_sync import incremental_sync_enabled, get_drive_sync_state
+from api_integration.call_metrics import call_metrics
+from core.information_extractor import get_resume_text_from_pdf, extract_information, extract_information_batch, get_extraction_batch_size
+from core.batch_runner import run_batch, iter_chunks, get_max_concurrency
 from core.handle_resume_from_email import send_feedback_email_2
-from core.general_feedback import general_analyzer, general_analyzer_df
+from core.general_feedback import general_analyzer, general_analyzer_df, general_analyzer_df_sections, feedback_fanout_enabled
 from core.asking_questions import complementary_questions
+from core.single_pass import extract_and_review
 from temporal.temporal import ResumeProcessor
 
-gemini_api = GeminiAPI()
-
-service = authenticate_drive_api()
-
 def get_folder_id(folder_path):
     """Gets the ID of a folder by its full path in Google Drive.
         Args: Folder_path: The path to the folder (e.g., "Parent Folder/Subfolder/Target Folder").
         Returns: The ID of the target folder (or None if not found).
     """
+    from googleapiclient.errors import HttpError
+
     parent_id = 'root'  # Start at the root of the Drive
     folder_names = folder_path.split('/')
 
     for folder_name in folder_names:
         try:
             query = f"name='{folder_name}' and '{parent_id}' in parents and mimeType='application/vnd.google-apps.folder'"
-            results = service.files().list(
+            results = get_drive_service().files().list(
                 q=query,
                 fields="files(id)"
             ).execute()
@@ -52,21 +49,52 @@ def get_folder_id(folder_path):
 
     return parent_id  # This is the ID of the final folder in the path
     
-def list_files_in_folder(folder_id):
-    """Lists the files in a given folder.
-    Args: Folder_id: The ID of the folder.
-    Returns: A list of file objects (or [] if an error occurs).
+# Metadata requested for every listed file, md5Checksum and modifiedTime let the processed files be skipped before downloading them
+DRIVE_FILE_FIELDS = "id, name, mimeType, md5Checksum, modifiedTime, size"
+# Files per files().list request, 1000 is the maximum Drive accepts
+DRIVE_PAGE_SIZE = 1000
+
+def iter_files_in_folder(folder_id, pdf_only=True, page_size=DRIVE_PAGE_SIZE):
+    """Yields the files of a folder page by page, the first ones can be processed while the next pages are requested.
+    Args: folder_id: The ID of the folder.
+        pdf_only: Only PDFs, filtered by Drive (mimeType in the query) instead of by name after listing.
+        page_size: Files per request.
+    Yields: File objects with the DRIVE_FILE_FIELDS metadata. Raises the HttpError of a failed request, on any page,
+        so a partial listing is never taken for the whole folder.
+    """
+    from googleapiclient.errors import HttpError
+
+    query = f"'{folder_id}' in parents and trashed = false"
+    if pdf_only:
+        query += " and mimeType = 'application/pdf'"
+    page_token = None
+    while True:
+        try:
+            results = get_drive_service().files().list(
+                q = query,
+                pageSize = page_size,
+                pageToken = page_token,
+                fields = f"nextPageToken, files({DRIVE_FILE_FIELDS})"
+            ).execute()
+        except HttpError as e:
+            print(f"An error in listing the files in folder ocurred: {e}")
+            raise
+        yield from results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+
+def list_files_in_folder(folder_id, pdf_only=True):
+    """Lists the files in a given folder, every page of it.
+    Args: Folder_id: The ID of the folder, pdf_only: Only the PDFs (filtered by Drive).
+    Returns: A list of file objects, or None if any page could not be listed.
     """
+    from googleapiclient.errors import HttpError
+
     try:
-        results = service.files().list(
-            q = f"'{folder_id}' in parents",
-            fields = "files(id, name)"
-        ).execute()
-        items = results.get('files', [])
-        return items
-    except HttpError as e:
-        print(f"An error in listing the files in folder ocurred: {e}")
-        return []
+        return list(iter_files_in_folder(folder_id, pdf_only))
+    except HttpError:
+        return None
 
 def download_file(file_id, file_name, download_dir = "data/user_resumes_drive"):
     """Downloads a file from Google Drive.
@@ -74,28 +102,74 @@ def download_file(file_id, file_name, download_dir = "data/user_resumes_drive"):
         file_id: The ID of the file to download.
         file_name: The name of the file.
         download_dir: The directory to save the file to.
+    Returns: The path of the downloaded file, prefixed with the file id so two files named CV.pdf don't overwrite
+        each other, or None if the download failed.
     """
-    try:
-        if not os.path.exists(download_dir):
-            os.makedirs(download_dir)
-        request = service.files().get_media(fileId = file_id)
-        file_path = os.path.join(download_dir, file_name)
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseDownload
 
-        with io.FileIO(file_path, 'wb') as fh:
+    if not os.path.exists(download_dir):
+        os.makedirs(download_dir)
+    file_path = os.path.join(download_dir, f"{file_id}_{os.path.basename(file_name) or 'resume.pdf'}")
+    try:
+        # Written under a temporary name, a failed download never leaves a partial PDF behind
+        with io.FileIO(file_path + ".part", 'wb') as fh:
+            request = get_drive_service().files().get_media(fileId = file_id)
             downloader = MediaIoBaseDownload(fh, request)
             done = False
             while done is False:
                 status, done = downloader.next_chunk()
             print(f"Download {int(status.progress() * 100)}%.")
+        os.replace(file_path + ".part", file_path)
         print(f"file '{file_name}' downloaded to '{file_path}'")
+        return file_path
     except HttpError as e:
         print(f"An error occurren while downloading the file {file_name}: {e}")
+        if os.path.exists(file_path + ".part"):
+            os.remove(file_path + ".part")
+        return None
+
+def download_file_bytes(file_id, file_name):
+    """Downloads a file from Google Drive into memory.
+    Args:
+        file_id: The ID of the file to download.
+        file_name: The name of the file.
+    Returns: The content of the file, or None if the download failed.
+    """
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseDownload
+
+    try:
+        fh = io.BytesIO()
+        request = get_drive_service().files().get_media(fileId = file_id)
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while done is False:
+            status, done = downloader.next_chunk()
+        print(f"file '{file_name}' downloaded ({fh.tell()} bytes)")
+        return fh.getvalue()
+    except HttpError as e:
+        print(f"An error occurren while downloading the file {file_name}: {e}")
+        return None
+
+def download_resume(file_id, file_name, download_dir="data/user_resumes_drive", pdf_md5=None):
+    """Downloads a resume into memory, the PDF is only written to download_dir when CV_AGENT_ARCHIVE_PDFS=1.
+    Returns: (pdf_bytes, file_path) where file_path is the archived copy or a drive:<file_id> reference, or None if the download failed."""
+    print(f"Downloading file: {file_name} (ID: {file_id})")
+    pdf_bytes = download_file_bytes(file_id, file_name)
+    if pdf_bytes is None:
+        return None
+    file_path = archive_pdf(pdf_bytes, file_name, download_dir, pdf_md5) or f"drive:{file_id}"
+    return pdf_bytes, file_path
 
 def number_files_in_drive(drive_folder_id):
+    """Returns the PDFs of the folder and their number, or None if the folder could not be listed"""
     try:
         files = list_files_in_folder(drive_folder_id)
+        if files is None:
+            return None
         if not files:
-            print("No files found in the Google Drive folder.")
+            print("No PDF files found in the Google Drive folder.")
 
         total_files = len(files)
         return files, total_files
@@ -104,60 +178,198 @@ def number_files_in_drive(drive_folder_id):
             print(f"An error occurred when processing de number of files at folder id: {drive_folder_id} from Drive: {str(e)}")
             return None
 
-def process_resume_from_drive(file_name, file_id):
-    """Processes resumes from a Google Drive folder.
+def select_files_to_sync(folder_id, pipeline, files):
+    """With CV_AGENT_DRIVE_INCREMENTAL=1 keeps only the files that are new or modified since the pipeline last processed the folder.
+    Args: folder_id: The ID of the Drive folder, pipeline: Name of the pipeline (e.g. "review"), files: The listed file objects.
+    """
+    if not incremental_sync_enabled():
+        return files
+    changed = get_drive_sync_state().changed_files(folder_id, pipeline, files)
+    print(f"Incremental sync: {len(changed)} of {len(files)} files are new or modified since the last run")
+    return changed
+
+def record_synced_files(folder_id, pipeline, files, results):
+    """Records the files the pipeline processed successfully, results are the BatchResults aligned with files.
+    Skipped or failed files are not recorded, the next incremental run tries them again."""
+    if not incremental_sync_enabled():
+        return
+    processed = [file for file, result in zip(files, results) if not result.error and result.result is not None]
+    get_drive_sync_state().mark_synced(folder_id, pipeline, processed)
+
+def resume_array_from_index(entry):
+    """Rebuilds the resume_array of an already processed PDF from its index entry"""
+    resume_array = load_data()
+    resume_array["CandidateID"] = entry["candidate_id"]
+    resume_array["file_path"] = entry["file_path"]
+    resume_array["extracted_sections"] = entry["extracted_sections"]
+    return resume_array
+
+def prepare_resume_from_drive(file_name, file_id, md5_checksum=None):
+    """Downloads a resume from Drive and extracts its text, everything process_resume_from_drive does before the LLM call.
     Args: file_id: The ID of the file being processed.
         file_name: The name of the file being processed.
+        md5_checksum: Drive's md5Checksum of the file, when known a processed file is skipped before downloading it.
+    Returns: (resume_array, pdf_md5, already_processed) or None if the file is skipped or fails.
     """
     # check if the file is a pdf 
-    if file_name.lower().endswith(".pdf"):
-        print(f"Processing PDF file {file_name}")
-        # Initialize fresh resume_array for each file
-        resume_array = load_data()
-        print(f"Downloading file: {file_name} (ID: {file_id})")
-        download_file(file_id, file_name, download_dir="data/user_resumes_drive")
-        resume_path = os.path.join("data/user_resumes_drive", file_name)    
+    if not file_name.lower().endswith(".pdf"):
+        print(f"Skipping non-PDF file {file_name}")
+        return None
 
-        try:
-            resume_text = get_resume_text_from_pdf(resume_path)
-            if resume_text:
-                # Generate a new UUID for CandidateID
-                candidate_id = str(uuid.uuid4())
-                resume_array["CandidateID"] = candidate_id
-                resume_array["file_path"] = resume_path
-                resume_array["resume_text"] = resume_text
-
-                #Extract information from resume in one API call
-                extract_information(resume_array, resume_text, "extracted_sections","user_extract_all_sections")
-                
-                print(f"Successfully extracted information from {file_name}\n\n")
-                return resume_array, file_id, file_name
-            else:
-                print(f"No text extracted from {file_name}")
-                return None
-        except Exception as e:
-            print(f"An error occurred when processing {file_name} from Drive: {str(e)}")
+    print(f"Processing PDF file {file_name}")
+    # Byte-identical PDFs already processed skip the download and the LLM extraction
+    entry = lookup_processed(md5_checksum, "json", file_name)
+    if entry:
+        return resume_array_from_index(entry), md5_checksum, True
+
+    # Initialize fresh resume_array for each file
+    resume_array = load_data()
+    downloaded = download_resume(file_id, file_name, pdf_md5=md5_checksum)
+    if downloaded is None:
+        return None
+    pdf_bytes, resume_path = downloaded
+
+    try:
+        pdf_md5 = md5_checksum or md5_of_bytes(pdf_bytes)
+        if not md5_checksum:
+            entry = lookup_processed(pdf_md5, "json", file_name)
+            if entry:
+                return resume_array_from_index(entry), pdf_md5, True
+
+        resume_text = get_resume_text_from_pdf(resume_path, pdf_bytes, pdf_md5)
+        if not resume_text:
+            print(f"No text extracted from {file_name}")
             return None
-    else:
-        print(f"Skipping non-PDF file {file_name}")
+
+        # Generate a new UUID for CandidateID
+        candidate_id = str(uuid.uuid4())
+        resume_array["CandidateID"] = candidate_id
+        resume_array["file_path"] = resume_path
+        resume_array["resume_text"] = resume_text
+        return resume_array, pdf_md5, False
+    except Exception as e:
+        print(f"An error occurred when processing {file_name} from Drive: {str(e)}")
+        return None
+
+def record_extraction(resume_array, pdf_md5, file_name):
+    """Adds a successful extraction to the processed PDF index"""
+    if resume_array.get("extracted_sections"):
+        get_pdf_index().record(pdf_md5, "json", resume_array["CandidateID"], file_name, resume_array["file_path"], resume_array["extracted_sections"])
+
+def process_resume_from_drive(file_name, file_id, md5_checksum=None):
+    """Processes resumes from a Google Drive folder.
+    Args: file_id: The ID of the file being processed.
+        file_name: The name of the file being processed.
+        md5_checksum: Drive's md5Checksum of the file, when known a processed file is skipped before downloading it.
+    """
+    prepared = prepare_resume_from_drive(file_name, file_id, md5_checksum)
+    if prepared is None:
+        return None
+    resume_array, pdf_md5, already_processed = prepared
+    if already_processed:
+        return resume_array, file_id, file_name
+
+    try:
+        #Extract information from resume in one API call
+        extract_information(resume_array, resume_array["resume_text"], "extracted_sections","user_extract_all_sections")
+        record_extraction(resume_array, pdf_md5, file_name)
+
+        print(f"Successfully extracted information from {file_name}\n\n")
+        return resume_array, file_id, file_name
+    except Exception as e:
+        print(f"An error occurred when processing {file_name} from Drive: {str(e)}")
         return None
 
+def process_and_review_resume_from_drive(file_name, file_id, md5_checksum=None):
+    """Single-pass version of process_resume_from_drive + analyze_resume: one LLM call returns both the
+    extracted sections and the feedback, which are stored exactly like the two separate calls store them.
+    Already processed PDFs, and resumes whose combined call fails, go through the two-call path.
+    Returns: (resume_array, feedback_result) or None if the file is skipped or fails."""
+    prepared = prepare_resume_from_drive(file_name, file_id, md5_checksum)
+    if prepared is None:
+        return None
+    resume_array, pdf_md5, already_processed = prepared
+
+    combined = None if already_processed else extract_and_review(resume_array["resume_text"], layout="json")
+    if combined is None:
+        if not already_processed:
+            extract_information(resume_array, resume_array["resume_text"], "extracted_sections","user_extract_all_sections")
+            record_extraction(resume_array, pdf_md5, file_name)
+        return resume_array, analyze_resume(resume_array, file_name)
+
+    extracted_sections, feedback_result = combined
+    resume_array["extracted_sections"] = extracted_sections
+    record_extraction(resume_array, pdf_md5, file_name)
+    # general_analyzer adds the feedback to the extracted sections, keep the same layout
+    extracted_sections.update(feedback_result)
+    save_data(resume_array, file_name)
+    print(f"Successfully extracted and reviewed {file_name} in one call\n\n")
+    return resume_array, feedback_result
+
+def iter_downloads(files, download):
+    """Runs download(file) for the files in worker threads (CV_AGENT_MAX_CONCURRENCY at once) and yields
+    (position, file, result) in the order of files, each one as soon as it and the ones before it are done"""
+    with ThreadPoolExecutor(max_workers=get_max_concurrency()) as executor:
+        for position, (file, result) in enumerate(zip(files, executor.map(download, files))):
+            yield position, file, result
+
+def process_resumes_from_drive_batch(files, batch_size=None):
+    """Batched version of process_resume_from_drive, packing batch_size resumes in each LLM request.
+    The files are downloaded concurrently and each extraction request is sent through run_batch as soon as
+    batch_size resumes are ready, while the rest are still being downloaded.
+    Args: files: Drive file objects (id, name and optionally md5Checksum).
+        batch_size: Resumes per extraction request (None reads CV_AGENT_EXTRACTION_BATCH_SIZE).
+    Returns: A list aligned with files holding the same (resume_array, file_id, file_name) tuples as process_resume_from_drive, or None for skipped files.
+    """
+    batch_size = batch_size or get_extraction_batch_size()
+    results = [None] * len(files)
+
+    def pending_resumes():
+        downloads = iter_downloads(files, lambda file: prepare_resume_from_drive(file["name"], file["id"], file.get("md5Checksum")))
+        for position, file, prepared in downloads:
+            if prepared is None:
+                continue
+            resume_array, pdf_md5, already_processed = prepared
+            results[position] = (resume_array, file["id"], file["name"])
+            if not already_processed:
+                yield resume_array, pdf_md5, file["name"]
+
+    def extract_chunk(pending):
+        extract_information_batch(
+            [(resume_array, resume_array["resume_text"]) for resume_array, _, _ in pending],
+            "extracted_sections", "user_extract_all_sections_batch", batch_size
+        )
+        for resume_array, pdf_md5, file_name in pending:
+            record_extraction(resume_array, pdf_md5, file_name)
+        return len(pending)
+
+    batches = run_batch(iter_chunks(pending_resumes(), batch_size), extract_chunk,
+                        label=lambda pending: ", ".join(file_name for _, _, file_name in pending))
+    print(f"Extracted {sum(batch.result or 0 for batch in batches)} resumes in batches\n")
+    return results
+
 # Function to integrate with your existing code for processing resumes from Google Drive
-def process_resume_from_drive_with_df(file_name, file_id, download_dir="data/user_resumes_drive"):
-    """ Process a resume from Google Drive using the DataFrame approach. Args: file_name: Name of the file in Google Drive, file_id: Google Drive file ID, download_dir: Directory to download the file to
+def process_resume_from_drive_with_df(file_name, file_id, download_dir="data/user_resumes_drive", md5_checksum=None):
+    """ Process a resume from Google Drive using the DataFrame approach. Args: file_name: Name of the file in Google Drive, file_id: Google Drive file ID, download_dir: Directory to download the file to, md5_checksum: Drive's md5Checksum of the file
         Returns:tuple: (candidate_id, file_id, file_name) if successful, None otherwise"""
     if file_name.lower().endswith(".pdf"):
         print(f"Processing PDF file {file_name}")
+
+        # Byte-identical PDFs already processed skip the download and the LLM extraction
+        entry = lookup_processed(md5_checksum, "dataframe", file_name)
+        if entry:
+            return entry['candidate_id'], file_id, file_name
         
         # Download file from Google Drive
-        print(f"Downloading file: {file_name} (ID: {file_id})")
-        download_file(file_id, file_name, download_dir=download_dir)
-        resume_path = os.path.join(download_dir, file_name)
+        downloaded = download_resume(file_id, file_name, download_dir, md5_checksum)
+        if downloaded is None:
+            return None
+        pdf_bytes, resume_path = downloaded
         
         try:
             # Create a ResumeProcessor instance and process the resume
             processor = ResumeProcessor()
-            candidate_id = processor.process_resume(resume_path)
+            candidate_id = processor.process_resume(resume_path, pdf_bytes)
             
             if candidate_id:
                 print(f"Successfully extracted candidate ID: {candidate_id}\n")
@@ -178,12 +390,111 @@ def process_resume_from_drive_with_df(file_name, file_id, download_dir="data/use
         print(f"Skipping non-PDF file {file_name}")
         return None
 
+def process_and_review_resume_from_drive_with_df(file_name, file_id, download_dir="data/user_resumes_drive", md5_checksum=None):
+    """Single-pass version of process_resume_from_drive_with_df + analyze_resume_with_df, the feedback is saved to
+    feedback.csv like analyze_resume_with_df does. Returns: (candidate_id, feedback_result) or None"""
+    if not file_name.lower().endswith(".pdf"):
+        print(f"Skipping non-PDF file {file_name}")
+        return None
+    print(f"Processing PDF file {file_name}")
+
+    # Byte-identical PDFs already processed skip the download and the LLM extraction
+    entry = lookup_processed(md5_checksum, "dataframe", file_name)
+    if entry:
+        return entry['candidate_id'], analyze_resume_with_df(entry['candidate_id'], file_name)
+
+    downloaded = download_resume(file_id, file_name, download_dir, md5_checksum)
+    if downloaded is None:
+        return None
+    pdf_bytes, resume_path = downloaded
+
+    try:
+        processor = ResumeProcessor()
+        candidate_id, feedback_result = processor.process_resume_and_review(resume_path, pdf_bytes)
+        if not candidate_id:
+            print(f"Failed to process resume {file_name}")
+            return None
+        processor.save_to_csv("data/processed_resumes")
+
+        if feedback_result:
+            save_feedback_to_csv(candidate_id, feedback_result, file_name)
+        else:
+            feedback_result = analyze_resume_with_df(candidate_id, file_name)
+        return candidate_id, feedback_result
+    except Exception as e:
+        print(f"An error occurred when processing {file_name} from Drive: {str(e)}")
+        print(traceback.format_exc())
+        return None
+
+def process_resumes_from_drive_with_df_batch(files, download_dir="data/user_resumes_drive", batch_size=None):
+    """Batched version of process_resume_from_drive_with_df, several resumes go in each extraction request.
+    Args: files: Drive file objects (id, name and optionally md5Checksum), download_dir: Directory to download the files to, batch_size: Resumes per extraction request
+    Returns: A list aligned with files holding (candidate_id, file_id, file_name) tuples, or None for skipped files.
+    The files are downloaded concurrently and streamed into process_resumes, the first PDFs are read and extracted
+    while the rest are still being downloaded."""
+    results = [None] * len(files)
+
+    def download(file):
+        file_name, file_id = file["name"], file["id"]
+        if not file_name.lower().endswith(".pdf"):
+            print(f"Skipping non-PDF file {file_name}")
+            return None
+
+        # Byte-identical PDFs already processed skip the download and the LLM extraction
+        entry = lookup_processed(file.get("md5Checksum"), "dataframe", file_name)
+        if entry:
+            return entry
+
+        # The PDFs are read by worker processes, this path keeps downloading them to disk
+        print(f"Downloading file: {file_name} (ID: {file_id})")
+        return download_file(file_id, file_name, download_dir=download_dir)
+
+    def resume_paths():
+        """Yields the path of every file (None for the skipped ones) so the candidate ids stay aligned with files"""
+        for position, file, downloaded in iter_downloads(files, download):
+            if isinstance(downloaded, dict):
+                results[position] = (downloaded['candidate_id'], file["id"], file["name"])
+                downloaded = None
+            yield downloaded
+
+    try:
+        processor = ResumeProcessor()
+        candidate_ids = processor.process_resumes(resume_paths(), batch_size)
+        processor.save_to_csv("data/processed_resumes")
+    except Exception as e:
+        print(f"An error occurred when processing the batch from Drive: {str(e)}")
+        print(traceback.format_exc())
+        return results
+
+    for position, (file, candidate_id) in enumerate(zip(files, candidate_ids)):
+        if candidate_id:
+            results[position] = (candidate_id, file["id"], file["name"])
+        elif results[position] is None and file["name"].lower().endswith(".pdf"):
+            print(f"Failed to process resume {file['name']}")
+    return results
+
+def process_downloaded_resumes_with_df(download_dir="data/user_resumes_drive", batch_size=None, pdf_workers=None):
+    """Backfill of the PDFs already downloaded to download_dir: their text is read in a process pool and
+    the extraction requests start as soon as the first texts are ready.
+    Args: download_dir: Directory with the PDFs, batch_size: Resumes per extraction request, pdf_workers: PDF reader processes (default CV_AGENT_PDF_WORKERS)
+    Returns: A list of (candidate_id, pdf_path) tuples, candidate_id is None for the resumes that failed."""
+    pdf_paths = sorted(os.path.join(download_dir, name) for name in os.listdir(download_dir) if name.lower().endswith(".pdf"))
+    print(f"Processing {len(pdf_paths)} PDFs from {download_dir}")
+    processor = ResumeProcessor()
+    try:
+        candidate_ids = processor.process_resumes(pdf_paths, batch_size, pdf_workers)
+    finally:
+        processor.save_to_csv("data/processed_resumes")
+        # The backfill is a run of its own, it writes its LLM call metrics like the CLI runs do
+        call_metrics.finish_run()
+    return list(zip(candidate_ids, pdf_paths))
+
 def analyze_resume(resume_array, file_name):
     """Use an LLM to analyze the resume and procide feedbqck
     Args:
     """
     try:
-        feedback_result = general_analyzer(resume_array["extracted_sections"])
+        feedback_result = general_analyzer(resume_array["extracted_sections"], resume_array.get("resume_sections"))
 
         if feedback_result:
         #    resume_array["general_feedback"] = feedback_result
@@ -198,16 +509,19 @@ def analyze_resume(resume_array, file_name):
             print(f"An error occurred when generating feedback for {file_name} from Drive: {str(e)}")
             return None
 
-def analyze_resume_with_df(candidate_id, file_name):
-    """Analyze a resume using the processed dataframes. Args:candidate_id (str): The ID of the candidate whose resume is being analyzed, file_name (str): The original filename for saving results
+def analyze_resume_with_df(candidate_id, file_name, sections=None):
+    """Analyze a resume using the processed dataframes. Args:candidate_id (str): The ID of the candidate whose resume is being analyzed, file_name (str): The original filename for saving results,
+        sections (list): Sections to review with one concurrent prompt each (CV_AGENT_FEEDBACK_FANOUT=1 does it for every section), None uses the single prompt
         Returns: dict: The feedback results or error information."""
+    import pandas as pd
     try:
         # Load the processed dataframes
-        candidates_df = pd.read_csv("data/processed_resumes/candidates.csv")
-        skills_df = pd.read_csv("data/processed_resumes/skills.csv")
-        experience_df = pd.read_csv("data/processed_resumes/experience.csv")
-        education_df = pd.read_csv("data/processed_resumes/education.csv")
-        languages_df = pd.read_csv("data/processed_resumes/languages.csv")
+        with CSV_LOCK:
+            candidates_df = pd.read_csv("data/processed_resumes/candidates.csv")
+            skills_df = pd.read_csv("data/processed_resumes/skills.csv")
+            experience_df = pd.read_csv("data/processed_resumes/experience.csv")
+            education_df = pd.read_csv("data/processed_resumes/education.csv")
+            languages_df = pd.read_csv("data/processed_resumes/languages.csv")
         
         # Filter for this candidate
         candidate_data = candidates_df[candidates_df['candidate_id'] == candidate_id]
@@ -225,8 +539,8 @@ def analyze_resume_with_df(candidate_id, file_name):
         # Get candidate's name
         first_name = candidate_data['first_name'].iloc[0]
         
-        # Generate feedback based on the dataframes
-        feedback_result = general_analyzer_df(
+        # Generate feedback based on the dataframes, one prompt per section when the fan-out is on
+        analyzer_args = dict(
             first_name=first_name,
             candidate_data=candidate_data,
             skills=candidate_skills,
@@ -234,6 +548,10 @@ def analyze_resume_with_df(candidate_id, file_name):
             education=candidate_education,
             languages=candidate_languages
         )
+        if sections or feedback_fanout_enabled():
+            feedback_result = general_analyzer_df_sections(**analyzer_args, sections=sections)
+        else:
+            feedback_result = general_analyzer_df(**analyzer_args)
         
         if feedback_result:
             # Save the feedback
@@ -247,80 +565,82 @@ def analyze_resume_with_df(candidate_id, file_name):
 
 def save_feedback_to_csv(candidate_id, feedback_result, file_name):
     """Save feedback to a CSV file with flattened structure - no nested JSON. Args: candidate_id (str): The ID of the candidate, feedback_result (dict): The feedback to save, file_name (str): The original file name (for reference)"""
-    try:
-        # Create a feedback dataframe if it doesn't exist
+    import pandas as pd
+    with CSV_LOCK:
         try:
-            feedback_df = pd.read_csv("data/processed_resumes/feedback.csv")
-        except FileNotFoundError:
-            # Create a dataframe with all the flattened columns we need
-            columns = [
-                'candidate_id',
-                'file_name',
-                'timestamp',
-                'summary_feedback',
-                'summary_example',
-                'hard_skills_feedback',
-                'hard_skills_example',
-                'soft_skills_feedback',
-                'soft_skills_example',
-                'work_experience_feedback',
-                'work_experience_example',
-                'education_feedback',
-                'education_example',
-                'languages_feedback',
-                'languages_example'
-            ]
-            feedback_df = pd.DataFrame(columns=columns)
-        
-        # Prepare new row with flattened structure
-        new_row = {
-            'candidate_id': candidate_id,
-            'file_name': file_name,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        # Extract and flatten the nested feedback structure
-        if 'general_feedback' in feedback_result:
-            sections = feedback_result['general_feedback'].get('sections', {})
-
-            # Add summary section feedback and example if available
-            if 'summary' in sections:
-                new_row['summary_feedback'] = sections['summary'].get('feedback', '')
-                new_row['summary_example'] = sections['summary'].get('example', '')
+            # Create a feedback dataframe if it doesn't exist
+            try:
+                feedback_df = pd.read_csv("data/processed_resumes/feedback.csv")
+            except FileNotFoundError:
+                # Create a dataframe with all the flattened columns we need
+                columns = [
+                    'candidate_id',
+                    'file_name',
+                    'timestamp',
+                    'summary_feedback',
+                    'summary_example',
+                    'hard_skills_feedback',
+                    'hard_skills_example',
+                    'soft_skills_feedback',
+                    'soft_skills_example',
+                    'work_experience_feedback',
+                    'work_experience_example',
+                    'education_feedback',
+                    'education_example',
+                    'languages_feedback',
+                    'languages_example'
+                ]
+                feedback_df = pd.DataFrame(columns=columns)
+        
+            # Prepare new row with flattened structure
+            new_row = {
+                'candidate_id': candidate_id,
+                'file_name': file_name,
+                'timestamp': datetime.now().isoformat()
+            }
+        
+            # Extract and flatten the nested feedback structure
+            if 'general_feedback' in feedback_result:
+                sections = feedback_result['general_feedback'].get('sections', {})
+
+                # Add summary section feedback and example if available
+                if 'summary' in sections:
+                    new_row['summary_feedback'] = sections['summary'].get('feedback', '')
+                    new_row['summary_example'] = sections['summary'].get('example', '')
             
-            # Add split skills sections (hard and soft) if available
-            if 'skills' in sections:
-                skills_section = sections['skills']
+                # Add split skills sections (hard and soft) if available
+                if 'skills' in sections:
+                    skills_section = sections['skills']
                 
-                # Check if skills are already split in the response
-                if 'hard_skills' in skills_section:
-                    new_row['hard_skills_feedback'] = skills_section['hard_skills'].get('feedback', '')
-                    new_row['hard_skills_example'] = skills_section['hard_skills'].get('example', '')
-                    new_row['soft_skills_feedback'] = skills_section['soft_skills'].get('feedback', '')
-                    new_row['soft_skills_example'] = skills_section['soft_skills'].get('example', '')
-                else:
-                    # If not split, use the general skills feedback for both (not ideal but prevents data loss)
-                    new_row['hard_skills_feedback'] = skills_section.get('feedback', '')
-                    new_row['hard_skills_example'] = skills_section.get('example', '')
-                    new_row['soft_skills_feedback'] = skills_section.get('feedback', '')
-                    new_row['soft_skills_example'] = skills_section.get('example', '')
+                    # Check if skills are already split in the response
+                    if 'hard_skills' in skills_section:
+                        new_row['hard_skills_feedback'] = skills_section['hard_skills'].get('feedback', '')
+                        new_row['hard_skills_example'] = skills_section['hard_skills'].get('example', '')
+                        new_row['soft_skills_feedback'] = skills_section['soft_skills'].get('feedback', '')
+                        new_row['soft_skills_example'] = skills_section['soft_skills'].get('example', '')
+                    else:
+                        # If not split, use the general skills feedback for both (not ideal but prevents data loss)
+                        new_row['hard_skills_feedback'] = skills_section.get('feedback', '')
+                        new_row['hard_skills_example'] = skills_section.get('example', '')
+                        new_row['soft_skills_feedback'] = skills_section.get('feedback', '')
+                        new_row['soft_skills_example'] = skills_section.get('example', '')
             
-            # Add other sections' feedback and example
-            for section_name, section_data in sections.items():
-                if section_name not in ['summary', 'skills']:
-                    new_row[f'{section_name}_feedback'] = section_data.get('feedback', '')
-                    new_row[f'{section_name}_example'] = section_data.get('example', '')
+                # Add other sections' feedback and example
+                for section_name, section_data in sections.items():
+                    if section_name not in ['summary', 'skills']:
+                        new_row[f'{section_name}_feedback'] = section_data.get('feedback', '')
+                        new_row[f'{section_name}_example'] = section_data.get('example', '')
         
-        # Add row to dataframe
-        feedback_df = pd.concat([feedback_df, pd.DataFrame([new_row])], ignore_index=True)
+            # Add row to dataframe
+            feedback_df = pd.concat([feedback_df, pd.DataFrame([new_row])], ignore_index=True)
         
-        # Save dataframe
-        feedback_df.to_csv("data/processed_resumes/feedback.csv", index=False)
+            # Save dataframe
+            feedback_df.to_csv("data/processed_resumes/feedback.csv", index=False)
         
-        print(f"Saved flattened feedback for candidate {candidate_id}")
+            print(f"Saved flattened feedback for candidate {candidate_id}")
         
-    except Exception as e:
-        print(f"Error saving feedback: {e}")
+        except Exception as e:
+            print(f"Error saving feedback: {e}")
 
 def email_body_creation(resume_array, resume_feedback):
     try:
@@ -384,6 +704,7 @@ def email_body_creation(resume_array, resume_feedback):
 
 def email_body_creation_with_df(candidate_id):
     """ Create email body using candidate data from dataframes and feedback results. Args: candidate_id (str): The ID of the candidate, Returns: str: Formatted email body or None if an error occurs"""
+    import pandas as pd
     try:
         # Get the candidate feedback using the new function
         feedback_result = get_candidate_feedback(candidate_id)
@@ -530,44 +851,40 @@ def log_email_sent(candidate_id, email, email_body, draft_id, draft_message_id,
         email (str): The email address
         email_body (str): The email body content
     """
-    try:
-        # Create or load email logs dataframe
+    import pandas as pd
+    with CSV_LOCK:
         try:
-            email_logs_df = pd.read_csv("data/logs/email_logs.csv")
-        except FileNotFoundError:
-            email_logs_df = pd.DataFrame(columns=[
-                'candidate_id', 'email', 'timestamp', 'draft_created', 'email_body', 'draft_id', 'draft_message_id', 'draft_message_thread_id', 'draft_message_label_id'
-            ])
-        
-        # Add new log entry
-        new_row = {
-            'candidate_id': candidate_id,
-            'email': email,
-            'timestamp': pd.Timestamp.now().isoformat(),
-            'draft_created': True,
-            'email_body':email_body,
-            'draft_id':draft_id,
-            'draft_message_id':draft_message_id,
-            'draft_message_thread_id':draft_message_thread_id,
-            'draft_message_label_id':draft_message_label_id
-        }
-        
-        # Add row to dataframe
-        email_logs_df = pd.concat([email_logs_df, pd.DataFrame([new_row])], ignore_index=True)
-        
-        # Save dataframe
-        email_logs_df.to_csv("data/logs/email_logs.csv", index=False)
-        
-        print(f"Logged email sent to {email}")
+            # Create or load email logs dataframe
+            try:
+                email_logs_df = pd.read_csv("data/logs/email_logs.csv")
+            except FileNotFoundError:
+                email_logs_df = pd.DataFrame(columns=[
+                    'candidate_id', 'email', 'timestamp', 'draft_created', 'email_body', 'draft_id', 'draft_message_id', 'draft_message_thread_id', 'draft_message_label_id'
+                ])
+        
+            # Add new log entry
+            new_row = {
+                'candidate_id': candidate_id,
+                'email': email,
+                'timestamp': pd.Timestamp.now().isoformat(),
+                'draft_created': True,
+                'email_body':email_body,
+                'draft_id':draft_id,
+                'draft_message_id':draft_message_id,
+                'draft_message_thread_id':draft_message_thread_id,
+                'draft_message_label_id':draft_message_label_id
+            }
+        
+            # Add row to dataframe
+            email_logs_df = pd.concat([email_logs_df, pd.DataFrame([new_row])], ignore_index=True)
+        
+            # Save dataframe
+            email_logs_df.to_csv("data/logs/email_logs.csv", index=False)
+        
+            print(f"Logged email sent to {email}")
         
-    except Exception as e:
-        print(f"Error logging email sent: {e}")
-
-def delay(index,total_files):
-    # Add delay before processing next file (if there is a next file)
-        if index < total_files - 1:  # Only wait if there are more files to process
-            print(f"\nWaiting 10 seconds before processing next file to avoid rate limits...")
-            time.sleep(10)
+        except Exception as e:
+            print(f"Error logging email sent: {e}")
 
 def email_body_creation_asking_questions(resume_array, questions):
     """Helper function to create a readable email body.
@@ -4,22 +4,14 @@ import base64
 import os
 from email.message import EmailMessage
 from email.utils import encode_rfc2231
-from googleapiclient.errors import HttpError
 import email
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
-from api_integration.gmail_api import authenticate_gmail_api, verify_credentials
+from api_integration.gmail_api import get_gmail_service
 from data.data_handler import format_feedback_content, format_feedback_content_API_call
 
-try:
-    verify_credentials()  # Check if credentials.json exists
-    service = authenticate_gmail_api()
-    # Use the service object for Gmail API operations
-except Exception as e:
-    print(f"Failed to authenticate: {e}")
-
 def create_draft(user_id, message_body):
     """Creates a draft email in the user's Gmail account.
     Args:service: Authorized Gmail API service instance.
@@ -30,7 +22,7 @@ def create_draft(user_id, message_body):
     """
     try:
         message = {'message': message_body}
-        draft = service.users().drafts().create(userId = user_id, body = message).execute()
+        draft = get_gmail_service().users().drafts().create(userId = user_id, body = message).execute()
 
         draft_id = draft["id"]
         draft_message = draft["message"]
@@ -133,7 +125,7 @@ def update_draft_with_attachment(draft_id, pdf_path):
     Returns:Updated draft object or None if there's an error"""
     try:
         # First, get the existing draft
-        draft = service.users().drafts().get(userId = "me", id = draft_id, format = 'full').execute()
+        draft = get_gmail_service().users().drafts().get(userId = "me", id = draft_id, format = 'full').execute()
         # Create a new message from the existing draft
         message = MIMEMultipart()
 
@@ -182,7 +174,7 @@ def update_draft_with_attachment(draft_id, pdf_path):
         raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('ascii')
         
         # Update the draft
-        updated_draft = service.users().drafts().update(
+        updated_draft = get_gmail_service().users().drafts().update(
             userId = "me",
             id = draft_id,
             body = {'message': {'raw': raw_message}}
@@ -201,7 +193,7 @@ def get_label_id(label_name):
         Returns:The label ID (or None if not found).
     """
     try:
-        results = service.users().labels().list(userId = 'me').execute()
+        results = get_gmail_service().users().labels().list(userId = 'me').execute()
         labels = results.get('labels', [])
 
         for label in labels:
@@ -220,14 +212,14 @@ def search_emails(label_ids = None):
     Returns: A list of email message IDs.
     """
     try:
-        response = service.users().messages().list(userId = 'me', labelIds=label_ids).execute()
+        response = get_gmail_service().users().messages().list(userId = 'me', labelIds=label_ids).execute()
         messages = []
         if 'messages' in response:
             messages.extend(response['messages'])
         
         while 'nextPageToken' in response:
             page_token = response ['nextPageToken']
-            response = service.users().messages().list(userId = 'me', labelIds=label_ids, pageToken = page_token).execute()
+            response = get_gmail_service().users().messages().list(userId = 'me', labelIds=label_ids, pageToken = page_token).execute()
             messages.extend(response['messages'])
 
         return [msg['id'] for msg in messages]
@@ -242,7 +234,7 @@ def get_message(msg_id):
     Returns:The message object (or none if an error ocurrs)"""
     
     try:
-        message = service.users().messages().get(userId = 'me', id = msg_id, format = 'raw').execute()
+        message = get_gmail_service().users().messages().get(userId = 'me', id = msg_id, format = 'raw').execute()
         #Decode the raw message
         msg_raw = base64.urlsafe_b64decode(message['raw'].encode('ASCII'))
         msg_str = email.message_from_bytes(msg_raw, _class = EmailMessage)
@@ -258,7 +250,7 @@ def get_attachments(msg_id, download_dir = "user_resumes"):
         msg_id: The ID of the message containing the attachments.
         download_dir: The directory to save the attachments (default: "user_resumes")."""
     try:
-        message = service.users().messages().get(userId = 'me', id = msg_id).execute()
+        message = get_gmail_service().users().messages().get(userId = 'me', id = msg_id).execute()
         if not os.path.exists(download_dir):
             os.makedirs(download_dir)
 
@@ -268,7 +260,7 @@ def get_attachments(msg_id, download_dir = "user_resumes"):
                     data = part['body']['data']
                 else:
                     att_id = part['body']['attachmentId']
-                    att = service.users().messages().attachments().get(userId = 'me', messageId = msg_id, id = att_id).execute()
+                    att = get_gmail_service().users().messages().attachments().get(userId = 'me', messageId = msg_id, id = att_id).execute()
                     data = att['data']
                 file_data = base64.urlsafe_b64decode(data.encode('UTF-8'))
                 filepath = os.path.join(download_dir, part['filename'])
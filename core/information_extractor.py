@@ -1,61 +1,155 @@
 #core/information_extractor.py
 import os
 import json
-import fitz
 import time
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from api_integration.gemini_api import GeminiAPI
-from data.data_handler import load_prompt
+from api_integration.gemini_api import get_gemini_api
+from api_integration.token_budget import estimate_tokens, fit_text_to_budget, get_budget
+from api_integration.structured_output import json_generation_config, parse_json_response, load_json_response, is_json_response
+from data.prompt_registry import get_prompt_registry
+from core.pdf_extraction import extract_pdf_text
+from core.section_segmenter import segmentation_enabled, segment_resume, is_well_segmented, format_sections
+from core.batch_runner import run_batch, iter_chunks
 
-gemini_api = GeminiAPI()
-    
-PROMPTS = {}
-
-prompt_files = {
-    "user_extract_all_sections": "user_all_sections_extraction_v2.txt"
-}
+# Prompts by task, loaded lazily from the prompt registry
+PROMPTS = get_prompt_registry().bind({
+    "user_extract_all_sections": "user_all_sections_extraction@v2",
+    "user_extract_all_sections_batch": "user_all_sections_extraction_batch@v1",
+    "user_extract_sectioned": "user_sectioned_extraction@v1"
+})
 
-# Load each prompt with error checking
-for key, filename in prompt_files.items():
-    prompt_content = load_prompt(filename)
-    if prompt_content is not None:
-        PROMPTS[key] = prompt_content
-    else:
-        print(f"Warning: Failed to load prompt for {key}")
+# Resumes packed in one extraction request, 1 keeps the one-prompt-per-resume behaviour.
+# Override it with CV_AGENT_EXTRACTION_BATCH_SIZE
+DEFAULT_EXTRACTION_BATCH_SIZE = 1
 
-def get_resume_text_from_pdf(pdf_path): # Extracts text from the specified PDF file. Args: pdf_path: Path to the PDF file. Returns: The extracted text as a single string, or None if an error occurred.
+def get_resume_text_from_pdf(pdf_path, pdf_bytes=None, pdf_md5=None): # Extracts text from the specified PDF file. Args: pdf_path: Path to the PDF file, pdf_bytes: Its content when it is already in memory (the path is not read), pdf_md5: Its content hash when known. Returns: The extracted text as a single string, or None if an error occurred.
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
+        return extract_pdf_text(pdf_bytes if pdf_bytes is not None else pdf_path, pdf_md5=pdf_md5)
     except Exception as e:
         print(f"Error processing PDF: {e}")
         return None
     
 class RateLimitException(Exception):
+    """The LLM call still failed after the retries of GeminiAPI.generate_content_with_retry"""
     pass
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type(RateLimitException)
-)
+def retry_generate_content(prompt, stage="extraction", generation_config=None, prompt_ref=None, validate=is_json_response):
+    """Shared retrying call of the extraction prompts (also used by temporal), only the responses validate accepts are cached"""
+    response = get_gemini_api().generate_content_with_retry(prompt, generation_config, stage=stage, prompt_ref=prompt_ref, validate=validate)
+    if not response:
+        raise RateLimitException("Empty response from Gemini API")
+    return response
+
+def presegment(resume_txt, prompt_key):
+    """With CV_AGENT_PRESEGMENT=1 a resume whose headings are recognized is sent pre-sectioned with the compact
+    extraction prompt instead of the full single-resume prompt.
+    Returns: (prompt_key, resume_txt, sections) where sections is the {section: text} map, or None if it was not used."""
+    if prompt_key != "user_extract_all_sections" or not segmentation_enabled():
+        return prompt_key, resume_txt, None
+    sections = segment_resume(resume_txt)
+    if not is_well_segmented(sections):
+        return prompt_key, resume_txt, None
+    return "user_extract_sectioned", format_sections(sections), sections
 
-def retry_generate_content(prompt):
+def extraction_generation_config(batched=False):
+    """JSON mode config of the extraction prompts, with the response schema derived from the temporal dataclasses"""
+    # Imported here because temporal imports this module
+    from temporal.temporal import RESUME_EXTRACTION_SCHEMA, RESUME_EXTRACTION_BATCH_SCHEMA
+    return json_generation_config(RESUME_EXTRACTION_BATCH_SCHEMA if batched else RESUME_EXTRACTION_SCHEMA)
+
+def get_extraction_batch_size():
+    """Reads the opt-in batch size from CV_AGENT_EXTRACTION_BATCH_SIZE"""
     try:
-        response = gemini_api.generate_content(prompt)
-        if not response:
-            raise RateLimitException("Empty response from Gemini API")
-        return response
-    except Exception as e:
-        if "429" in str(e) or "Resource has been exhausted" in str(e):
-            print("Rate limit hit, waiting before retry...")
-            raise RateLimitException(str(e))
-        raise
-    
+        return max(1, int(os.environ.get("CV_AGENT_EXTRACTION_BATCH_SIZE", DEFAULT_EXTRACTION_BATCH_SIZE)))
+    except ValueError:
+        print("Invalid CV_AGENT_EXTRACTION_BATCH_SIZE value, using the default")
+        return DEFAULT_EXTRACTION_BATCH_SIZE
+
+def pack_resumes(resume_texts):
+    """Joins several resume texts into one prompt input, each one delimited and numbered by its position"""
+    blocks = []
+    for index, resume_txt in enumerate(resume_texts):
+        blocks.append(f"<<<RESUME id={index}>>>\n{resume_txt}\n<<<END RESUME id={index}>>>")
+    return "\n\n".join(blocks)
+
+def parse_batch_response(response, expected):
+    """Splits a batched extraction response into {position: extracted_sections}.
+    Items that are missing or malformed are left out so the caller can fall back to single calls."""
+    try:
+        items = parse_json_response(response, "extraction_batch")
+    except json.JSONDecodeError as json_err:
+        print(f"\nJSON parsing error in batched extraction: {str(json_err)}")
+        return {}
+    return batch_items(items, expected)
+
+def batch_items(items, expected):
+    """{position: extracted_sections} of the parsed items of a batched response"""
+    if isinstance(items, dict):
+        items = items.get("resumes", [items])
+    if not isinstance(items, list):
+        return {}
+
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("extracted_sections"), dict):
+            continue
+        try:
+            position = int(str(item.get("resume_id")).strip())
+        except ValueError:
+            continue
+        if 0 <= position < expected:
+            parsed[position] = item["extracted_sections"]
+    return parsed
+
+def extract_information_batch(resume_items, section_key, prompt_key, batch_size=None, fallback_prompt_key="user_extract_all_sections"):
+    """Extracts several resumes packing batch_size of them in each request.
+    Args:
+        resume_items: List of (resume_data, resume_txt) tuples, resume_data is updated in place like in extract_information.
+        section_key: Key under which the extraction is stored in each resume_data.
+        prompt_key: Key of the batched prompt in PROMPTS.
+        batch_size: Resumes per request (None reads CV_AGENT_EXTRACTION_BATCH_SIZE).
+        fallback_prompt_key: Single-resume prompt used for the items of a batch that fail to parse.
+    Returns: A list with the extracted sections of each resume (or None), in the same order as resume_items."""
+    if batch_size is None:
+        batch_size = get_extraction_batch_size()
+    if prompt_key not in PROMPTS:
+        print(f"Error: {prompt_key} not found in PROMPTS dictionary")
+        return [extract_information(data, txt, section_key, fallback_prompt_key) for data, txt in resume_items]
+
+    def extract_chunk(chunk):
+        parsed = {}
+        if len(chunk) > 1:
+            # Each resume gets an equal share of the extraction budget
+            budget = get_budget("extraction")
+            share = None if budget is None else max(1, (budget - estimate_tokens(PROMPTS[prompt_key])) // len(chunk))
+            texts = [fit_text_to_budget(txt, "extraction", budget=share)[0] for _, txt in chunk]
+            prompt = PROMPTS[prompt_key].format(resumes=pack_resumes(texts))
+            try:
+                # A batch is only cached when every resume of it came back
+                response = retry_generate_content(prompt, generation_config=extraction_generation_config(batched=True), prompt_ref=PROMPTS.ref(prompt_key),
+                                                  validate=lambda text, expected=len(chunk): len(batch_items(load_json_response(text), expected)) == expected)
+                parsed = parse_batch_response(response, len(chunk))
+            except Exception as e:
+                print(f"Batched extraction failed, falling back to one request per resume: {e}")
+
+        results = []
+        for position, (resume_data, resume_txt) in enumerate(chunk):
+            if position in parsed:
+                resume_data[section_key] = parsed[position]
+                results.append(parsed[position])
+            else:
+                # Per-item fallback to the single-resume prompt
+                results.append(extract_information(resume_data, resume_txt, section_key, fallback_prompt_key))
+        return results
+
+    chunks = list(iter_chunks(resume_items, batch_size))
+    if len(chunks) == 1:
+        return extract_chunk(chunks[0])
+    # The requests of the chunks are sent concurrently (at most CV_AGENT_MAX_CONCURRENCY at once)
+    results = []
+    for batch in run_batch(chunks, extract_chunk, label=lambda chunk: f"batch of {len(chunk)} resumes"):
+        results.extend(batch.result if batch.result is not None else [None] * len(batch.item))
+    return results
+
 def extract_information(resume_data, resume_txt, section_key, prompt_key):
     try:
         # Ensure prompt_key exists in PROMPTS dictionary
@@ -64,12 +158,17 @@ def extract_information(resume_data, resume_txt, section_key, prompt_key):
             return None
 
         # Get the prompt template and format it with the resume text
+        prompt_key, resume_txt, resume_sections = presegment(resume_txt, prompt_key)
+        if resume_sections:
+            # Kept for the later stages, e.g. general_analyzer fills the sections the extraction left empty
+            resume_data["resume_sections"] = resume_sections
         prompt_template = PROMPTS[prompt_key]
+        resume_txt, _ = fit_text_to_budget(resume_txt, "extraction", estimate_tokens(prompt_template))
         prompt = prompt_template.format(resume_data=resume_txt)
 
         # Use retry mechanism for API call
         try:
-            response = retry_generate_content(prompt)
+            response = retry_generate_content(prompt, generation_config=extraction_generation_config(), prompt_ref=PROMPTS.ref(prompt_key))
         except RateLimitException as e:
             print(f"Failed to generate content after retries: {e}")
             return None
@@ -77,21 +176,9 @@ def extract_information(resume_data, resume_txt, section_key, prompt_key):
             print(f"Unexpected error during content generation: {e}")
             return None
                 
-        # Convert response to string and clean it
-        response_text = str(response).strip()
-        
         try:
-            # Remove any leading/trailing whitespace and newlines
-            response_text = response_text.strip()
-            
-            # If the response is wrapped in markdown code blocks, extract the JSON
-            if '```json' in response_text:
-                response_text = response_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in response_text:
-                response_text = response_text.split('```')[1].split('```')[0].strip()
-            
             # Parse the JSON
-            parsed_response = json.loads(response_text)
+            parsed_response = parse_json_response(response, "extraction")
             resume_data[section_key] = parsed_response
             
             return parsed_response
@@ -99,7 +186,7 @@ def extract_information(resume_data, resume_txt, section_key, prompt_key):
         except json.JSONDecodeError as json_err:
             print(f"\nJSON parsing error: {str(json_err)}")
             print("Response text that failed to parse:")
-            print(response_text)
+            print(response)
             return None
             
     except Exception as e:
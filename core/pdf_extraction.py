@@ -0,0 +1,229 @@
+#core/pdf_extraction.py
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from api_integration.token_budget import PAGE_BREAK
+from data.pdf_index import md5_of_bytes, md5_of_file
+from data.text_cache import get_text_cache
+
+# Seconds a single PDF may take before it is reported as failed, override it with CV_AGENT_PDF_TIMEOUT (0 disables it)
+DEFAULT_PDF_TIMEOUT = 60.0
+# Only the first pages and characters of a PDF are read, a resume fits in a few pages and the rest would be dropped by
+# the token budget anyway. Override them with CV_AGENT_PDF_MAX_PAGES and CV_AGENT_PDF_MAX_CHARS (0 disables them)
+DEFAULT_PDF_MAX_PAGES = 20
+DEFAULT_PDF_MAX_CHARS = 60000
+
+@dataclass
+class PdfPage:
+    number: int
+    text: str
+    seconds: float
+    skipped: bool = False  # No text layer (scanned or blank page), get_text was not called
+
+@dataclass
+class PdfExtraction:
+    path: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+    pages: int = 0  # Pages of the document
+    page_seconds: List[float] = field(default_factory=list)  # Time spent on each page that was read
+    skipped_pages: int = 0
+    truncated: bool = False  # The page or character cap stopped the extraction early
+    cached: bool = False  # The text came from the extracted text cache, the PDF was not parsed
+
+def _get_limit(name, default):
+    """Positive integer limit from the environment, None when it is 0 (disabled)"""
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        print(f"Invalid {name} value, using the default")
+        value = default
+    return value if value > 0 else None
+
+def get_pdf_max_pages():
+    return _get_limit("CV_AGENT_PDF_MAX_PAGES", DEFAULT_PDF_MAX_PAGES)
+
+def get_pdf_max_chars():
+    return _get_limit("CV_AGENT_PDF_MAX_CHARS", DEFAULT_PDF_MAX_CHARS)
+
+def _open_pdf(source):
+    import fitz  # PyMuPDF, imported on first use because it is slow to load
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def iter_pdf_pages(doc, max_pages=None, max_chars=None) -> Iterator[PdfPage]:
+    """Yields the pages of an open document one at a time, nothing after max_pages pages or max_chars characters is read.
+    Pages without any font have no text layer, they are skipped without running the text extraction."""
+    page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+    chars = 0
+    for number in range(page_count):
+        start = time.perf_counter()
+        page = doc.load_page(number)
+        if doc.is_pdf and not page.get_fonts():
+            yield PdfPage(number + 1, "", time.perf_counter() - start, skipped=True)
+            continue
+        text = page.get_text()
+        if max_chars is not None and chars + len(text) > max_chars:
+            text = text[:max_chars - chars]
+        chars += len(text)
+        yield PdfPage(number + 1, text, time.perf_counter() - start)
+        if max_chars is not None and chars >= max_chars:
+            return
+
+def read_pdf(source, max_pages=None, max_chars=None, pdf_md5=None) -> PdfExtraction:
+    """Reads a PDF page by page within the page and character caps (None reads CV_AGENT_PDF_MAX_PAGES / CV_AGENT_PDF_MAX_CHARS).
+    A PDF already read with the same caps is not parsed again, its text comes from the extracted text cache.
+    Args: source: The path of the PDF or its content as bytes (a downloaded PDF is read without a temporary file).
+        pdf_md5: The content hash of the PDF when the caller already has it.
+    Returns: A PdfExtraction with the text (pages separated with PAGE_BREAK so the token budget can drop trailing
+    pages) and the per-page timings. Raises on unreadable files (the callers decide how to report them)."""
+    max_pages = get_pdf_max_pages() if max_pages is None else max_pages or None
+    max_chars = get_pdf_max_chars() if max_chars is None else max_chars or None
+    start = time.perf_counter()
+    result = PdfExtraction("<bytes>" if isinstance(source, (bytes, bytearray)) else str(source))
+    text_cache = get_text_cache()
+    if text_cache is not None:
+        if pdf_md5 is None:
+            pdf_md5 = md5_of_bytes(source) if isinstance(source, (bytes, bytearray)) else md5_of_file(source)
+        cached_text = text_cache.get(pdf_md5, max_pages, max_chars)
+        if cached_text is not None:
+            result.text, result.cached, result.seconds = cached_text, True, time.perf_counter() - start
+            return result
+
+    texts = []
+    with _open_pdf(source) as doc:
+        result.pages = doc.page_count
+        for page in iter_pdf_pages(doc, max_pages, max_chars):
+            result.page_seconds.append(page.seconds)
+            if page.skipped:
+                result.skipped_pages += 1
+            else:
+                texts.append(page.text)
+        result.truncated = len(result.page_seconds) < result.pages
+    result.text = PAGE_BREAK.join(texts)
+    result.seconds = time.perf_counter() - start
+    if text_cache is not None and result.text:
+        text_cache.set(pdf_md5, result.text, max_pages, max_chars)
+    if result.truncated:
+        print(f"{result.path}: read {len(result.page_seconds)} of {result.pages} pages ({len(result.text)} characters), the rest was skipped")
+    return result
+
+def extract_pdf_text(source, max_pages=None, max_chars=None, pdf_md5=None):
+    """Text of a PDF within the page and character caps, see read_pdf"""
+    return read_pdf(source, max_pages, max_chars, pdf_md5).text
+
+def get_pdf_workers():
+    """Worker processes of the batch extraction, CV_AGENT_PDF_WORKERS (default: one per CPU)"""
+    try:
+        return max(1, int(os.environ.get("CV_AGENT_PDF_WORKERS", os.cpu_count() or 1)))
+    except ValueError:
+        print("Invalid CV_AGENT_PDF_WORKERS value, using one worker per CPU")
+        return os.cpu_count() or 1
+
+def get_pdf_timeout():
+    try:
+        return float(os.environ.get("CV_AGENT_PDF_TIMEOUT", DEFAULT_PDF_TIMEOUT))
+    except ValueError:
+        print("Invalid CV_AGENT_PDF_TIMEOUT value, using the default")
+        return DEFAULT_PDF_TIMEOUT
+
+def _shutdown(executor):
+    """Stops a pool without waiting for its workers, a worker stuck in MuPDF can only be terminated"""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+def iter_pdf_texts(pdf_paths: Iterable[str], max_workers: Optional[int] = None, timeout: Optional[float] = None, reader=read_pdf) -> Iterator[PdfExtraction]:
+    """Extracts the text of many PDFs in a process pool and yields a PdfExtraction for each one as soon as it is
+    done (completion order, not input order), so the LLM calls can start while the rest are still being read.
+    Args:
+        pdf_paths: Paths of the PDFs, consumed lazily (at most max_workers files are in flight).
+        max_workers: Worker processes (None reads CV_AGENT_PDF_WORKERS).
+        timeout: Seconds per file (None reads CV_AGENT_PDF_TIMEOUT, 0 disables it).
+        reader: Function run in the workers for each path, a module-level function so it can be pickled.
+    A file that fails, times out or crashes its worker only produces a PdfExtraction with error set;
+    stuck or crashed workers are replaced and the other files in flight run again."""
+    max_workers = max_workers or get_pdf_workers()
+    timeout = get_pdf_timeout() if timeout is None else timeout
+    timeout = timeout if timeout and timeout > 0 else None
+    paths = iter(pdf_paths)
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    running = {}  # future -> (path, submitted at)
+    # Files that were in flight when a worker crashed, they run alone so the one that crashes it is identified
+    suspects = []
+
+    def submit(path):
+        running[executor.submit(reader, path)] = (path, time.monotonic())
+
+    try:
+        while True:
+            if suspects:
+                if not running:
+                    submit(suspects.pop(0))
+            else:
+                while len(running) < max_workers:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    submit(path)
+            if not running:
+                return
+
+            wait_for = None
+            if timeout is not None:
+                pending = [submitted for future, (_, submitted) in running.items() if not future.done()]
+                wait_for = max(0.0, min(pending) + timeout - time.monotonic()) if pending else 0.0
+            solo = len(running) == 1
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            crashed, restart = False, False
+            for future in done:
+                path, submitted = running.pop(future)
+                seconds = time.monotonic() - submitted
+                try:
+                    extraction = future.result()
+                except BrokenProcessPool:
+                    crashed = restart = True
+                    if solo:
+                        yield PdfExtraction(path, error="the PDF crashed the extraction worker", seconds=seconds)
+                    else:
+                        suspects.append(path)
+                except Exception as e:
+                    yield PdfExtraction(path, error=f"{type(e).__name__}: {e}", seconds=seconds)
+                else:
+                    extraction.path, extraction.seconds = path, seconds
+                    yield extraction
+
+            if timeout is not None:
+                now = time.monotonic()
+                for future, (path, submitted) in list(running.items()):
+                    # A file that finished while the consumer was busy is collected by the next wait, not timed out
+                    if not future.done() and now - submitted >= timeout:
+                        del running[future]
+                        restart = True
+                        yield PdfExtraction(path, error=f"timed out after {timeout}s", seconds=now - submitted)
+
+            if restart:
+                # A stuck or crashed worker can't be cancelled, the pool is replaced and the files in flight run again.
+                # Files already finished keep their result, only the unfinished ones are resubmitted
+                _shutdown(executor)
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+                in_flight = []
+                for future, (path, _) in list(running.items()):
+                    if not future.done() or isinstance(future.exception(), BrokenProcessPool):
+                        del running[future]
+                        in_flight.append(path)
+                if crashed:
+                    suspects.extend(in_flight)
+                else:
+                    for path in in_flight:
+                        submit(path)
+    finally:
+        _shutdown(executor)
@@ -0,0 +1,113 @@
+#core/section_segmenter.py
+import os
+import re
+import unicodedata
+from api_integration.token_budget import PAGE_BREAK, collapse_whitespace
+from core.contact_extractor import is_contact_line
+
+# Headings of each section as they appear in Spanish and English resumes (lowercase, without accents)
+SECTION_HEADINGS = {
+    "contact": [
+        "contacto", "datos de contacto", "informacion de contacto", "datos personales", "informacion personal",
+        "contact", "contact information", "contact info", "personal information", "personal details",
+    ],
+    "summary": [
+        "perfil", "perfil profesional", "resumen", "resumen profesional", "acerca de mi", "sobre mi",
+        "sintesis profesional", "objetivo", "objetivo profesional", "extracto",
+        "summary", "professional summary", "profile", "professional profile", "about", "about me", "objective",
+    ],
+    "skills": [
+        "habilidades", "habilidades tecnicas", "habilidades blandas", "habilidades interpersonales", "destrezas",
+        "aptitudes", "aptitudes principales", "conocimientos", "conocimientos tecnicos", "competencias",
+        "competencias tecnicas", "competencias clave", "herramientas", "tecnologias",
+        "skills", "technical skills", "soft skills", "hard skills", "top skills", "key skills", "tools", "tech stack",
+    ],
+    "work_experience": [
+        "experiencia", "experiencia laboral", "experiencia profesional", "trayectoria profesional", "trayectoria laboral",
+        "historial laboral", "empleos",
+        "experience", "work experience", "professional experience", "employment", "employment history", "work history",
+    ],
+    "education": [
+        "educacion", "formacion", "formacion academica", "estudios", "estudios academicos", "datos academicos",
+        "cursos", "certificaciones", "certificados", "cursos y certificaciones",
+        "education", "academic background", "certifications", "licenses & certifications", "courses", "training",
+    ],
+    "languages": ["idiomas", "idioma", "lenguas", "languages", "language"],
+    # Recognized so they close the previous section, their content is kept as is
+    "other": [
+        "proyectos", "logros", "intereses", "referencias", "voluntariado", "publicaciones", "premios", "reconocimientos",
+        "projects", "achievements", "interests", "references", "volunteering", "publications", "awards", "honors",
+    ],
+}
+# Order of the sections in the compacted text
+SECTION_ORDER = ["contact", "summary", "skills", "work_experience", "education", "languages", "other"]
+# Sections that must be found (besides the contact block) to trust the segmentation
+MIN_SECTIONS = 2
+
+_heading_lookup = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+_max_heading_words = max(len(heading.split()) for heading in _heading_lookup)
+_bullet_pattern = re.compile(r"^[\s•·\-–—*#>|]+|[\s:|]+$")
+# "Idiomas: Inglés avanzado", a heading followed by its content on the same line
+_inline_pattern = re.compile(r"^(?P<heading>[^:]{3,40}):\s*(?P<content>.+)$")
+
+def segmentation_enabled():
+    """Opt-in: CV_AGENT_PRESEGMENT=1 sends the pre-sectioned text with the compact extraction prompt"""
+    return os.environ.get("CV_AGENT_PRESEGMENT", "0") == "1"
+
+def _normalize_heading(line):
+    text = unicodedata.normalize("NFKD", _bullet_pattern.sub("", line)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+def match_heading(line):
+    """Returns (section, content on the same line) if the line is a section heading, else None"""
+    stripped = line.strip()
+    if not stripped:
+        return None
+    if len(stripped.split()) <= _max_heading_words + 1:
+        section = _heading_lookup.get(_normalize_heading(stripped))
+        if section:
+            return section, ""
+    inline = _inline_pattern.match(stripped)
+    if inline:
+        section = _heading_lookup.get(_normalize_heading(inline.group("heading")))
+        if section:
+            return section, inline.group("content").strip()
+    return None
+
+def segment_resume(resume_text):
+    """Splits a resume text by its headings.
+    Returns: {section: text} in SECTION_ORDER with the sections found, the lines before the first heading
+    (name, email, phone...) go to "contact". Repeated headings (e.g. two experience blocks) are merged."""
+    sections = {}
+    current = "contact"
+    for line in (resume_text or "").replace(PAGE_BREAK, "\n").splitlines():
+        heading = match_heading(line)
+        if heading:
+            current, content = heading
+            sections.setdefault(current, [])
+            if current == "other":
+                sections[current].append(line.strip())  # Keeps "Proyectos", "Intereses"... as context
+            elif content:
+                sections[current].append(content)
+            continue
+        # Contact details printed in a side column end up in the middle of other sections,
+        # the ones under "Referencias" and the like belong to other people and stay there
+        if current not in ("contact", "other") and is_contact_line(line) and len(line.split()) <= 6:
+            sections.setdefault("contact", []).append(line)
+            continue
+        sections.setdefault(current, []).append(line)
+
+    segmented = {}
+    for section in SECTION_ORDER:
+        text = collapse_whitespace("\n".join(sections.get(section, [])))
+        if text:
+            segmented[section] = text
+    return segmented
+
+def is_well_segmented(sections):
+    """True when enough known sections were found for the pre-sectioned prompt to be reliable"""
+    return len([s for s in sections if s not in ("contact", "other")]) >= MIN_SECTIONS
+
+def format_sections(sections):
+    """Compact pre-sectioned text sent to the extraction prompt, e.g. "[SUMMARY]\n..." """
+    return "\n\n".join(f"[{section.upper()}]\n{text}" for section, text in sections.items())
@@ -0,0 +1,74 @@
+#core/single_pass.py
+import os
+import json
+from datetime import datetime
+from api_integration.token_budget import estimate_tokens, fit_text_to_budget
+from api_integration.structured_output import object_schema, json_generation_config, parse_json_response
+from core.information_extractor import retry_generate_content, RateLimitException
+from core.general_feedback import FEEDBACK_DF_SCHEMA, FEEDBACK_SCHEMA
+from data.data_handler import load_prompt
+
+SINGLE_PASS_PROMPT = "resume_extract_and_review@v1"
+
+def single_pass_enabled():
+    """The combined extract + review call is opt-in, enable it with CV_AGENT_SINGLE_PASS=1"""
+    return os.environ.get("CV_AGENT_SINGLE_PASS", "0") == "1"
+
+def single_pass_generation_config():
+    """JSON mode config of the combined prompt: the extraction schema plus the feedback schema of entire_resume_analyzer@v7"""
+    # Imported here because temporal imports the core modules
+    from temporal.temporal import RESUME_EXTRACTION_SCHEMA
+    return json_generation_config(object_schema({
+        "extracted_sections": RESUME_EXTRACTION_SCHEMA,
+        "general_feedback": FEEDBACK_DF_SCHEMA,
+    }))
+
+def to_general_analyzer_sections(sections):
+    """Maps the feedback sections of the combined prompt (entire_resume_analyzer@v7: hard_skills and soft_skills)
+    onto the ones general_analyzer stores (entire_resume_analyzer@v6: a single skills section)"""
+    mapped = {}
+    for name in FEEDBACK_SCHEMA["properties"]["sections"]["properties"]:
+        if name == "skills" and "skills" not in sections:
+            parts = [sections[part] for part in ("hard_skills", "soft_skills") if isinstance(sections.get(part), dict)]
+            if parts:
+                mapped["skills"] = {key: "\n\n".join(str(part.get(key) or "") for part in parts).strip() for key in ("feedback", "example")}
+        elif name in sections:
+            mapped[name] = sections[name]
+    return mapped
+
+def extract_and_review(resume_txt, layout="dataframe"):
+    """Extracts the sections of a resume and reviews them in a single LLM call.
+    Args: resume_txt: The text of the resume.
+        layout: "dataframe" keeps the feedback sections of general_analyzer_df, "json" maps them onto the ones of general_analyzer.
+    Returns: (extracted_sections, feedback_result) where feedback_result has the same structure as the result of
+        general_analyzer / general_analyzer_df, or None if the call or its parsing failed (callers fall back to the two calls)."""
+    prompt_template = load_prompt(SINGLE_PASS_PROMPT)
+    if prompt_template is None:
+        return None
+    resume_txt, _ = fit_text_to_budget(resume_txt, "extraction", estimate_tokens(prompt_template))
+    prompt = prompt_template.format(resume_data=resume_txt)
+
+    try:
+        response = retry_generate_content(prompt, stage="extract_review", generation_config=single_pass_generation_config(),
+                                          prompt_ref=SINGLE_PASS_PROMPT)
+        parsed_response = parse_json_response(response, "extract_review")
+    except RateLimitException as e:
+        print(f"Failed to generate content after retries: {e}")
+        return None
+    except json.JSONDecodeError as json_err:
+        print(f"\nJSON parsing error in the single-pass response: {str(json_err)}")
+        return None
+
+    extracted_sections = parsed_response.get("extracted_sections") if isinstance(parsed_response, dict) else None
+    general_feedback = parsed_response.get("general_feedback") if isinstance(parsed_response, dict) else None
+    if not isinstance(extracted_sections, dict) or not isinstance(general_feedback, dict):
+        print("The single-pass response is missing extracted_sections or general_feedback")
+        return None
+    if layout == "json" and isinstance(general_feedback.get("sections"), dict):
+        general_feedback = dict(general_feedback, sections=to_general_analyzer_sections(general_feedback["sections"]))
+
+    feedback_result = {
+        'general_feedback': general_feedback,
+        'feedback_made_timestamp': datetime.now().isoformat()
+    }
+    return extracted_sections, feedback_result
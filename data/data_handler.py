@@ -4,21 +4,24 @@ import re
 import os
 import ast
 
-import pandas as pd
-import fitz  # PyMuPDF
 import uuid
 import hashlib
+import threading
 from typing import Dict, Tuple, List, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
 
-from api_integration.gemini_api import GeminiAPI
+from api_integration.gemini_api import get_gemini_api
+from data.prompt_registry import get_prompt_registry
 
 DATA_DIR = "data/resumes"
 DATA_FILE = "data/resume_data.json"
 PROMPTS_DIR = "prompts"
-gemini_api = GeminiAPI()
+EMAIL_FORMAT_PROMPT = "email_format_generator@v1"
+
+# Serializes reads/writes of the shared CSV files when several resumes are processed concurrently
+CSV_LOCK = threading.RLock()
 
 def ensure_data_directory():
     """Ensures the data directory exists"""
@@ -85,13 +88,13 @@ def save_data(data, original_filename=None):
         print(f"Error saving resume data: {str(e)}")
         return None, None    
     
-def load_prompt(filename):
-    """Loads a prompt from a file in the prompts directory"""
+def load_prompt(prompt_ref):
+    """Returns a prompt template from the prompts directory, by file name or versioned name (e.g. "entire_resume_analyzer@v7").
+    Templates are cached by the prompt registry and only re-read when the file changes."""
     try:
-        with open(os.path.join(PROMPTS_DIR, filename), "r", encoding='utf-8') as f:
-            return f.read().strip() # Added strip() to remove any trailing whitespace
+        return get_prompt_registry().get(prompt_ref)
     except Exception as e:
-        print(f"Error loading prompt file {filename}: {str(e)}")
+        print(f"Error loading prompt {prompt_ref}: {str(e)}")
         return None
 
 def format_feedback_content(feedback_dict):
@@ -171,10 +174,10 @@ def format_feedback_content_API_call(feedback):
     """Helper function to extract the feedback from the json or dictionary and set it into a easy to read email with an API call"""
     try:
         feedback_email_format = ""
-        prompt_content = load_prompt("email_format_generator_v1.txt")
+        prompt_content = load_prompt(EMAIL_FORMAT_PROMPT)
         formatted_prompt = prompt_content.format(json_api_response = feedback)
 
-        feedback_email_format = gemini_api.generate_content(formatted_prompt)
+        feedback_email_format = get_gemini_api().generate_content(formatted_prompt, stage="email_format", prompt_ref=EMAIL_FORMAT_PROMPT)
         return feedback_email_format
     except Exception as e:
         print(f"An error ocurred when formating the responso into an email body: {e}")
@@ -260,6 +263,7 @@ def get_candidate_feedback(candidate_id):
     Returns:
         dict: The flattened feedback or None if not found
     """
+    import pandas as pd
     try:
         feedback_df = pd.read_csv("data/processed_resumes/feedback.csv")
         candidate_feedback = feedback_df[feedback_df['candidate_id'] == candidate_id]
@@ -0,0 +1,100 @@
+#data/drive_sync.py
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_SYNC_PATH = "data/drive_sync.sqlite"
+
+def incremental_sync_enabled():
+    """Opt-in: CV_AGENT_DRIVE_INCREMENTAL=1 only processes the Drive files that are new or modified since the last run"""
+    return os.environ.get("CV_AGENT_DRIVE_INCREMENTAL", "0") == "1"
+
+class DriveSyncState:
+    """Last processed version (md5Checksum and modifiedTime) of every Drive file, per folder and pipeline.
+    A file is only recorded after it was processed successfully, so the files that fail are retried on the next run."""
+
+    def __init__(self, path=DEFAULT_SYNC_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        sync_dir = os.path.dirname(path)
+        if sync_dir and not os.path.exists(sync_dir):
+            os.makedirs(sync_dir)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS synced_files ("
+                "folder_id TEXT, pipeline TEXT, file_id TEXT, file_name TEXT, md5 TEXT, modified_time TEXT, "
+                "synced_at TEXT, PRIMARY KEY (folder_id, pipeline, file_id))"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def synced(self, folder_id, pipeline):
+        """{file_id: (md5, modified_time)} of the files already processed from the folder"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT file_id, md5, modified_time FROM synced_files WHERE folder_id = ? AND pipeline = ?",
+                    (folder_id, pipeline),
+                ).fetchall()
+            finally:
+                conn.close()
+        return {file_id: (md5, modified_time) for file_id, md5, modified_time in rows}
+
+    def changed_files(self, folder_id, pipeline, files):
+        """The files (Drive file objects) that are new or whose content changed since they were processed.
+        The content is compared by md5Checksum; modifiedTime is only used for files without a checksum."""
+        synced = self.synced(folder_id, pipeline)
+        changed = []
+        for file in files:
+            previous = synced.get(file["id"])
+            if previous is None:
+                changed.append(file)
+                continue
+            md5, modified_time = previous
+            if file.get("md5Checksum") or md5:
+                if file.get("md5Checksum") != md5:
+                    changed.append(file)
+            elif file.get("modifiedTime") != modified_time:
+                changed.append(file)
+        return changed
+
+    def mark_synced(self, folder_id, pipeline, files):
+        """Records the current version of the processed files"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO synced_files "
+                    "(folder_id, pipeline, file_id, file_name, md5, modified_time, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(folder_id, pipeline, file["id"], file.get("name"), file.get("md5Checksum"), file.get("modifiedTime"), now)
+                     for file in files],
+                )
+            finally:
+                conn.close()
+
+    def reset(self, folder_id, pipeline):
+        """Forgets the folder, the next incremental run processes every file again"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM synced_files WHERE folder_id = ? AND pipeline = ?", (folder_id, pipeline))
+            finally:
+                conn.close()
+
+_drive_sync_state = None
+_drive_sync_state_lock = threading.Lock()
+
+def get_drive_sync_state():
+    """Returns the process-wide sync state, stored at CV_AGENT_DRIVE_SYNC_STATE (default data/drive_sync.sqlite)"""
+    global _drive_sync_state
+    with _drive_sync_state_lock:
+        if _drive_sync_state is None:
+            _drive_sync_state = DriveSyncState(os.environ.get("CV_AGENT_DRIVE_SYNC_STATE", DEFAULT_SYNC_PATH))
+        return _drive_sync_state
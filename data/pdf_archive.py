@@ -0,0 +1,24 @@
+#data/pdf_archive.py
+import os
+from data.pdf_index import md5_of_bytes
+
+def archive_enabled():
+    """Downloaded resumes are processed in memory, CV_AGENT_ARCHIVE_PDFS=1 also keeps the original PDFs on disk"""
+    return os.environ.get("CV_AGENT_ARCHIVE_PDFS", "0") == "1"
+
+def archive_name(file_name, pdf_md5):
+    """Name of an archived PDF, prefixed with its content hash so two candidates sending CV.pdf don't overwrite each other"""
+    return f"{pdf_md5[:12]}_{os.path.basename(file_name) or 'resume.pdf'}"
+
+def archive_pdf(pdf_bytes, file_name, archive_dir, pdf_md5=None):
+    """Saves the original PDF to archive_dir when archiving is enabled.
+    Returns: The path of the archived file, or None when archiving is disabled."""
+    if not archive_enabled():
+        return None
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, archive_name(file_name, pdf_md5 or md5_of_bytes(pdf_bytes)))
+    if not os.path.exists(path):  # Same hash, same content: an existing copy is kept
+        with open(path + ".part", "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(path + ".part", path)
+    return path
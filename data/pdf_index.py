@@ -0,0 +1,104 @@
+#data/pdf_index.py
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+DEFAULT_INDEX_PATH = "data/processed_pdfs.sqlite"
+
+def md5_of_bytes(data):
+    """MD5 of the PDF content, the same value Google Drive reports as md5Checksum"""
+    return hashlib.md5(data).hexdigest()
+
+def md5_of_file(path, chunk_size=1024 * 1024):
+    """MD5 of a file on disk, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ProcessedPdfIndex:
+    """Persistent index of already processed PDFs: content hash -> candidate_id and extraction result.
+    Entries are kept per pipeline ("json" for resume_array/save_data, "dataframe" for ResumeProcessor)
+    because each pipeline has its own candidate ids."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        index_dir = os.path.dirname(path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed_pdfs ("
+                "md5 TEXT, pipeline TEXT, candidate_id TEXT, file_name TEXT, file_path TEXT, "
+                "extracted_sections TEXT, processed_at TEXT, PRIMARY KEY (md5, pipeline))"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def lookup(self, md5, pipeline):
+        """Returns the stored entry for a content hash (or None if the PDF was never processed)"""
+        if not md5:
+            return None
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT candidate_id, file_name, file_path, extracted_sections, processed_at "
+                    "FROM processed_pdfs WHERE md5 = ? AND pipeline = ?",
+                    (md5, pipeline),
+                ).fetchone()
+            finally:
+                conn.close()
+        if row is None:
+            return None
+        return {
+            'md5': md5,
+            'candidate_id': row[0],
+            'file_name': row[1],
+            'file_path': row[2],
+            'extracted_sections': json.loads(row[3]) if row[3] else None,
+            'processed_at': row[4],
+        }
+
+    def record(self, md5, pipeline, candidate_id, file_name, file_path, extracted_sections):
+        """Stores (or replaces) the result of processing a PDF"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO processed_pdfs "
+                    "(md5, pipeline, candidate_id, file_name, file_path, extracted_sections, processed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (md5, pipeline, candidate_id, file_name, file_path,
+                     json.dumps(extracted_sections, ensure_ascii=False), datetime.now().isoformat()),
+                )
+            finally:
+                conn.close()
+
+_pdf_index = None
+_pdf_index_lock = threading.Lock()
+
+def get_pdf_index():
+    """Returns the process-wide index, stored at CV_AGENT_PDF_INDEX (default data/processed_pdfs.sqlite)"""
+    global _pdf_index
+    with _pdf_index_lock:
+        if _pdf_index is None:
+            _pdf_index = ProcessedPdfIndex(os.environ.get("CV_AGENT_PDF_INDEX", DEFAULT_INDEX_PATH))
+        return _pdf_index
+
+def lookup_processed(md5, pipeline, label):
+    """Returns the index entry of a PDF the pipeline already processed, printing that label is skipped, or None.
+    Args: md5: The content hash of the PDF (None never matches), pipeline: "json" or "dataframe", label: Name of the file in the message."""
+    entry = get_pdf_index().lookup(md5, pipeline)
+    if entry:
+        print(f"{label} was already processed on {entry['processed_at']} (candidate {entry['candidate_id']}), skipping extraction")
+    return entry
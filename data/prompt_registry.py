@@ -0,0 +1,131 @@
+#data/prompt_registry.py
+import os
+import re
+import time
+import threading
+from collections.abc import Mapping
+
+DEFAULT_PROMPTS_DIR = "prompts"
+# Seconds between mtime checks of a loaded prompt, override it with CV_AGENT_PROMPT_RELOAD_INTERVAL (0 checks on every lookup)
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+# entire_resume_analyzer_prompt_v7.txt -> ("entire_resume_analyzer", 7), q_for_users_v1.txt -> ("q_for_users", 1)
+_versioned_file = re.compile(r"^(?P<name>.+?)(?:_prompt)?_v(?P<version>\d+)\.txt$")
+
+class PromptRegistry:
+    """Process-wide cache of the prompt templates in prompts/.
+    Templates are read the first time they are requested and only read again when the file's
+    mtime changes (checked at most every reload_interval seconds), so resumes don't hit the disk.
+    A prompt is requested by file name ("q_for_users_v1.txt") or by versioned name
+    ("entire_resume_analyzer@v7"); a name without version resolves to its latest version."""
+
+    def __init__(self, prompts_dir=DEFAULT_PROMPTS_DIR, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.prompts_dir = prompts_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._templates = {}  # file name -> (mtime, template, last check)
+        self._versions = None  # name -> {version: file name}
+        self._versions_checked = 0.0
+        self._dir_mtime = None
+
+    def _scan(self):
+        """(Re)builds the name -> versions index when the directory changes"""
+        now = time.monotonic()
+        if self._versions is not None and now - self._versions_checked < self.reload_interval:
+            return
+        self._versions_checked = now
+        dir_mtime = os.stat(self.prompts_dir).st_mtime
+        if self._versions is not None and dir_mtime == self._dir_mtime:
+            return
+        versions = {}
+        for filename in os.listdir(self.prompts_dir):
+            match = _versioned_file.match(filename)
+            if match:
+                versions.setdefault(match.group("name"), {})[int(match.group("version"))] = filename
+        self._versions = versions
+        self._dir_mtime = dir_mtime
+
+    def resolve(self, ref):
+        """Returns the file name of a prompt reference"""
+        if ref.endswith(".txt"):
+            return ref
+        name, _, version = ref.partition("@")
+        self._scan()
+        versions = self._versions.get(name)
+        if not versions:
+            if os.path.exists(os.path.join(self.prompts_dir, f"{name}.txt")):
+                return f"{name}.txt"  # Unversioned prompt, e.g. resume_generator
+            raise KeyError(f"Unknown prompt {ref}")
+        if not version:
+            return versions[max(versions)]
+        number = int(version.lstrip("vV"))
+        if number not in versions:
+            raise KeyError(f"Unknown prompt version {ref}, available: {sorted(versions)}")
+        return versions[number]
+
+    def get(self, ref):
+        """Returns the template of a prompt reference, reloading it only if the file changed"""
+        with self._lock:
+            filename = self.resolve(ref)
+            now = time.monotonic()
+            cached = self._templates.get(filename)
+            if cached is not None and now - cached[2] < self.reload_interval:
+                return cached[1]
+            path = os.path.join(self.prompts_dir, filename)
+            mtime = os.stat(path).st_mtime
+            if cached is not None and cached[0] == mtime:
+                self._templates[filename] = (mtime, cached[1], now)
+                return cached[1]
+            with open(path, "r", encoding='utf-8') as f:
+                template = f.read().strip()  # strip() removes any trailing whitespace
+            self._templates[filename] = (mtime, template, now)
+            return template
+
+    def bind(self, refs):
+        """Returns a read-only {key: template} mapping over this registry for the given {key: reference}"""
+        return PromptSet(self, refs)
+
+class PromptSet(Mapping):
+    """Lazy {key: template} view used by the modules that address prompts by a task key (e.g. PROMPTS["user_extract_all_sections"]).
+    A key whose prompt file is missing behaves as absent."""
+
+    def __init__(self, registry, refs):
+        self.registry = registry
+        self.refs = dict(refs)
+
+    def __getitem__(self, key):
+        try:
+            return self.registry.get(self.refs[key])
+        except OSError as e:
+            raise KeyError(key) from e
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def ref(self, key):
+        """Registry reference behind a key (e.g. "user_all_sections_extraction@v2"), used in the call metrics"""
+        return self.refs[key]
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_prompt_registry():
+    """Returns the process-wide registry over CV_AGENT_PROMPTS_DIR (default prompts/)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry(
+                os.environ.get("CV_AGENT_PROMPTS_DIR", DEFAULT_PROMPTS_DIR),
+                float(os.environ.get("CV_AGENT_PROMPT_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL)),
+            )
+        return _registry
@@ -0,0 +1,54 @@
+#data/text_cache.py
+import os
+import zlib
+import threading
+from api_integration.response_cache import DiskLRUCache
+
+DEFAULT_TEXT_CACHE_PATH = "data/cache/pdf_texts.sqlite"
+DEFAULT_TEXT_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50 MB, compressed resume texts are a few KB each
+# Bump it when the extraction changes, the texts extracted by the previous version are then ignored
+TEXT_CACHE_VERSION = 1
+
+def text_cache_key(pdf_md5, max_pages, max_chars):
+    """The caps are part of the key, the same PDF read with other caps has another text"""
+    return f"v{TEXT_CACHE_VERSION}:{pdf_md5}:{max_pages or 0}:{max_chars or 0}"
+
+class PdfTextCache:
+    """Extracted text of each PDF by content hash, zlib-compressed in a DiskLRUCache,
+    so reprocessing, re-versioning or backfilling a PDF does not parse it again"""
+
+    def __init__(self, path=DEFAULT_TEXT_CACHE_PATH, max_bytes=DEFAULT_TEXT_CACHE_MAX_BYTES):
+        self.store = DiskLRUCache(path, max_bytes)
+
+    def get(self, pdf_md5, max_pages=None, max_chars=None):
+        value = self.store.get(text_cache_key(pdf_md5, max_pages, max_chars))
+        if value is None:
+            return None
+        try:
+            return zlib.decompress(value).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError) as e:
+            print(f"Ignoring corrupted cached text of {pdf_md5}: {e}")
+            return None
+
+    def set(self, pdf_md5, text, max_pages=None, max_chars=None):
+        self.store.set(text_cache_key(pdf_md5, max_pages, max_chars), zlib.compress(text.encode("utf-8"), 6))
+
+    def stats(self):
+        return self.store.stats()
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+def get_text_cache():
+    """Returns the process-wide extracted text cache, or None when CV_AGENT_TEXT_CACHE_ENABLED=0.
+    Configured with CV_AGENT_TEXT_CACHE_PATH and CV_AGENT_TEXT_CACHE_MAX_BYTES."""
+    global _text_cache
+    if os.environ.get("CV_AGENT_TEXT_CACHE_ENABLED", "1") == "0":
+        return None
+    with _text_cache_lock:
+        if _text_cache is None:
+            _text_cache = PdfTextCache(
+                path=os.environ.get("CV_AGENT_TEXT_CACHE_PATH", DEFAULT_TEXT_CACHE_PATH),
+                max_bytes=int(os.environ.get("CV_AGENT_TEXT_CACHE_MAX_BYTES", DEFAULT_TEXT_CACHE_MAX_BYTES)),
+            )
+        return _text_cache
@@ -3,11 +3,13 @@ import os
 import json
 from core.information_extractor import extract_information, get_resume_text_from_pdf
 from core.general_feedback import general_analyzer
-from core.handle_resume_from_email import send_feedback_email,  search_emails, get_message, get_label_id, questions_email_draft
-from core.handle_resume_from_drive import get_folder_id, number_files_in_drive, process_resume_from_drive, analyze_resume, email_body_creation, delay, email_body_creation_asking_questions, analyze_resume_with_df, process_resume_from_drive_with_df, email_body_creation_with_df
-from core.asking_questions import complementary_questions
+from core.handle_resume_from_email import send_feedback_email,  search_emails, get_message, get_label_id
+from core.handle_resume_from_drive import get_folder_id, number_files_in_drive, process_resumes_from_drive_batch, process_resumes_from_drive_with_df_batch
+from core.drive_pipeline import run_drive_pipeline, review_drive_file_with_df, review_resume_with_df, questions_drive_file, questions_resume
+from core.batch_runner import get_max_concurrency
 from data.data_handler import load_data, save_data
-from tenacity import retry, stop_after_attempt, wait_exponential
+from data.pdf_archive import archive_pdf
+from api_integration.call_metrics import call_metrics
 
 from temporal.temporal import ResumeProcessor, VersionedResumeProcessor
 
@@ -36,9 +38,8 @@ def email_processing(label_name):
             
             print(f"Processing email from: {sender_email}, Subject: {subject}")
             
-            #Download attachments
+            #Read attachments in memory, they are only saved to 'user_resumes' when CV_AGENT_ARCHIVE_PDFS=1
             attachments = []
-            attachments_part = None
 
             for part in email_message.walk():
                 if part.get_content_maintype() == 'multipart':
@@ -47,29 +48,21 @@ def email_processing(label_name):
                     continue
                 file_name = part.get_filename()
                 if bool(file_name):
-                    attachments_part = part
-                    attachments.append(file_name)
-
-                    # Create an 'user_resumes' directory if it doesn't exist
-                    if not os.path.exists('user_resumes'):
-                        os.makedirs('user_resumes')
-
-                    file_path = os.path.join('user_resumes', file_name)
-                    with open(file_path, 'wb') as f:
-                        f.write(part.get_payload(decode=True))
-                    print(f"Attachment '{file_name}' saved to '{file_path}'")
+                    attachments.append((file_name, part.get_payload(decode=True)))
 
             #Check if there's at least one attachment
             if not attachments:
                 print("No attachments found in the email.")
+                continue
                 
             #Assume the first attachment is the resume
-            resume_path = os.path.join('user_resumes', attachments[0])            
+            file_name, pdf_bytes = attachments[0]
+            resume_path = archive_pdf(pdf_bytes, file_name, 'user_resumes') or f"email:{msg_id}/{file_name}"
 
-            if not os.path.exists(resume_path):
+            if not pdf_bytes:
                 print("Error: File not found")
             else:
-                resume_text = get_resume_text_from_pdf (resume_path)
+                resume_text = get_resume_text_from_pdf (resume_path, pdf_bytes)
 
                 if resume_text:
     
@@ -92,65 +85,45 @@ def email_processing(label_name):
 
 if __name__ == "__main__":
 
-    while True:
-        source = input("Hey there, would you like to retrieve resumes from your email(e) or from Drive(d)?; type (e/d): ")
-        if source.lower() not in ['e', 'd']:
-            print("Invalid input. Please type 'e' for email or 'd' for Drive.")
-            continue
-        if source.lower() == "e":
-            label = input("Perfect, what is the name of the label under which you have the resumes: ")
-            print("Thanks! give a few minutes to process your emails")
-            email_processing(label)
-            break
-        elif source.lower() == "d":
-            drive_folder_path = input("Perfect, what is the path of the folder where the resumes are stored: ")
-            print("Thanks! give a few minutes to process your resumes")
-            drive_folder_id = get_folder_id(drive_folder_path)
-
-            if drive_folder_id:
-                print("Processing resumes from Google Drive...")
-                files, total_files = number_files_in_drive(drive_folder_id)
-                while True:
-                    service = input(f"you have {total_files} files in your drive. Do you need a review (r) or craft a new version (v)?")
-                    if service.lower() not in ['r', 'v']:
-                        print("Invalid input. Please type 'r' for a review or 'v' to craft a new version.")
-                        continue
-                    if service.lower() == "r":
-                        for index, file in enumerate(files):
-                            print(f"\nProcessing file {index + 1} of {total_files}: {file['name']}")
-                            
-                            # Use the new function instead of the old one
-                            result = process_resume_from_drive_with_df(file["name"], file["id"])
-                            
-                            if result is None:
-                                print(f"Skipping file {file['name']} (not a PDF or processing error)")
-                                continue
-                                
-                            candidate_id, file_id, file_name = result
-                            
-                            # Use the new analyze function
-                            feedback_result = analyze_resume_with_df(candidate_id, file_name)
-                            
-                            # Create email body (would need to be updated for the new data structure)
-                            email_body = email_body_creation_with_df(candidate_id)
-                            
-                            delay(index, total_files)
-                        break
-                    if service.lower() == "v":
-                        for index, file in enumerate(files): 
-                            print(f"\nProcessing file {index + 1} of {total_files}: {file['name']}")
-                            results = process_resume_from_drive(file["name"], file["id"])
-                            if results is None:
-                                print(f"Skipping file {file['name']} (not a PDF or processing error)")
-                                continue
-                            resume_array, file_id, file_name = results
-                            questions = complementary_questions(resume_array, file_name)
-                            email_body, user_name, recipient_email = email_body_creation_asking_questions(resume_array, questions)
-
-                            questions_email_draft(recipient_email, user_name, email_body)
-                            
-                            delay(index,total_files)
+    try:
+        while True:
+            source = input("Hey there, would you like to retrieve resumes from your email(e) or from Drive(d)?; type (e/d): ")
+            if source.lower() not in ['e', 'd']:
+                print("Invalid input. Please type 'e' for email or 'd' for Drive.")
+                continue
+            if source.lower() == "e":
+                label = input("Perfect, what is the name of the label under which you have the resumes: ")
+                print("Thanks! give a few minutes to process your emails")
+                email_processing(label)
+                break
+            elif source.lower() == "d":
+                drive_folder_path = input("Perfect, what is the path of the folder where the resumes are stored: ")
+                print("Thanks! give a few minutes to process your resumes")
+                drive_folder_id = get_folder_id(drive_folder_path)
+
+                if drive_folder_id:
+                    print("Processing resumes from Google Drive...")
+                    listing = number_files_in_drive(drive_folder_id)
+                    if listing is None:
+                        # A partial listing would process (and, with incremental sync, record) only part of the folder
+                        print("Error: the Drive folder could not be listed, nothing was processed")
                         break
-            else:
-                print(f"Error: Google Drive folder not found at path: {drive_folder_path}")
-            break
\ No newline at end of file
+                    files, total_files = listing
+                    while True:
+                        service = input(f"you have {total_files} files in your drive. Do you need a review (r) or craft a new version (v)?")
+                        if service.lower() not in ['r', 'v']:
+                            print("Invalid input. Please type 'r' for a review or 'v' to craft a new version.")
+                            continue
+                        print(f"Processing up to {get_max_concurrency()} files at a time")
+                        if service.lower() == "r":
+                            run_drive_pipeline(drive_folder_id, "review_df", files, review_drive_file_with_df, process_resumes_from_drive_with_df_batch, review_resume_with_df)
+                            break
+                        if service.lower() == "v":
+                            run_drive_pipeline(drive_folder_id, "questions", files, questions_drive_file, process_resumes_from_drive_batch, questions_resume)
+                            break
+                else:
+                    print(f"Error: Google Drive folder not found at path: {drive_folder_path}")
+                break
+    finally:
+        # Every run writes its LLM call metrics, whichever source it processed
+        call_metrics.finish_run()
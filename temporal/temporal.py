@@ -1,55 +1,35 @@
-import pandas as pd
-import fitz  # PyMuPDF
 import uuid
 import hashlib
 import ast
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import Dict, Tuple, List, Optional
+from typing import Dict, Iterable, Tuple, List, Optional, TYPE_CHECKING
 from dataclasses import dataclass
 from datetime import datetime
 import re
-from data.data_handler import load_prompt
-from api_integration.gemini_api import GeminiAPI
+import threading
+from data.data_handler import CSV_LOCK
+from data.prompt_registry import get_prompt_registry
+from api_integration.token_budget import estimate_tokens, fit_text_to_budget
+from api_integration.structured_output import (schema_from_dataclass, object_schema, array_schema, string_schema,
+                                               json_generation_config, parse_json_response)
+from data.pdf_index import get_pdf_index, lookup_processed, md5_of_file, md5_of_bytes
+from core.information_extractor import extract_information_batch, retry_generate_content, RateLimitException, get_extraction_batch_size, presegment
+from core.single_pass import extract_and_review
+from core.pdf_extraction import extract_pdf_text, iter_pdf_texts
+from core.batch_runner import run_batch, iter_chunks
+from core.contact_extractor import extract_contacts, merge_contacts, contact_keys, skip_known_candidates, same_person_name
 
 import os
 import json
 
-gemini_api = GeminiAPI()
-
-class RateLimitException(Exception):
-    pass
-
-PROMPTS = {}
-
-prompt_files = {
-    "user_extract_all_sections": "user_all_sections_extraction_v2.txt"
-}
-
-# Load each prompt with error checking
-for key, filename in prompt_files.items():
-    prompt_content = load_prompt(filename)
-    if prompt_content is not None:
-        PROMPTS[key] = prompt_content
-    else:
-        print(f"Warning: Failed to load prompt for {key}")
-
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type(RateLimitException)
-)
-
-def retry_generate_content(prompt):
-    try:
-        response = gemini_api.generate_content(prompt)
-        if not response:
-            raise RateLimitException("Empty response from Gemini API")
-        return response
-    except Exception as e:
-        if "429" in str(e) or "Resource has been exhausted" in str(e):
-            print("Rate limit hit, waiting before retry...")
-            raise RateLimitException(str(e))
-        raise
+# pandas and fitz are imported where they are used, they dominate the import time of the CLI
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Prompts by task, loaded lazily from the prompt registry
+PROMPTS = get_prompt_registry().bind({
+    "user_extract_all_sections": "user_all_sections_extraction@v2",
+    "user_extract_sectioned": "user_sectioned_extraction@v1"
+})
 
 @dataclass
 class UserInfo:
@@ -90,6 +70,24 @@ class Language:
     level: str
     notes: Optional[str] = None
 
+# Gemini response schema of the extraction prompts, derived from the dataclasses above
+RESUME_EXTRACTION_SCHEMA = object_schema({
+    "user_info": schema_from_dataclass(UserInfo),
+    "summary": string_schema(nullable=True),
+    "skills": object_schema({
+        "soft_skills": array_schema(string_schema()),
+        "hard_skills": array_schema(string_schema()),
+    }),
+    "relevant_work_experience": array_schema(schema_from_dataclass(WorkExperience)),
+    "education": array_schema(schema_from_dataclass(Education)),
+    "languages": array_schema(schema_from_dataclass(Language)),
+}, required=["user_info", "skills", "relevant_work_experience", "education", "languages"])
+
+RESUME_EXTRACTION_BATCH_SCHEMA = array_schema(object_schema({
+    "resume_id": string_schema(),
+    "extracted_sections": RESUME_EXTRACTION_SCHEMA,
+}))
+
 @dataclass
 class ResumeVersion:
     version_id: str
@@ -103,25 +101,23 @@ class ResumeVersion:
     changes_summary: Optional[str]
     content_hash: str
 
-class RateLimitException(Exception):
-    """Exception raised when API rate limit is exceeded."""
-    pass
-
 class ResumeProcessor:
     def __init__(self):
+        import pandas as pd
         # Initialize all dataframes with version_id column
         self.candidates_df = pd.DataFrame()
         self.skills_df = pd.DataFrame()
         self.experience_df = pd.DataFrame()
         self.education_df = pd.DataFrame()
         self.languages_df = pd.DataFrame()
+        self._contact_index = None  # contact key -> candidate_id, built on first use
+        self._candidate_names = {}  # candidate_id -> (first_name, last_name) of the indexed candidates
+        self._store_lock = threading.Lock()  # Guards the dataframes and the contact index while process_resumes extracts concurrently
 
-    def extract_text(self, pdf_path: str) -> Optional[str]:
-        #Extract text from PDF.
+    def extract_text(self, pdf_path: str, pdf_bytes: Optional[bytes] = None, pdf_md5: Optional[str] = None) -> Optional[str]:
+        #Extract text from PDF, from pdf_bytes when the PDF is already in memory (a PDF read before comes from the text cache).
         try:
-            with fitz.open(pdf_path) as doc:
-                text = " ".join(page.get_text() for page in doc)
-            return text
+            return extract_pdf_text(pdf_bytes if pdf_bytes is not None else pdf_path, pdf_md5=pdf_md5)
         except Exception as e:
             print(f"Error extracting text from PDF {pdf_path}: {e}")
             return None
@@ -224,16 +220,37 @@ class ResumeProcessor:
                         # Return the original if we can't parse it
                         return date_str
 
-    def process_resume(self, pdf_path: str) -> str:
-        """Main method to process a resume PDF. Returns:str: candidate_id for the processed resume"""
+    def _prepare(self, pdf_path: str, pdf_bytes: Optional[bytes] = None):
+        """Everything process_resume does before the LLM call: hashes the PDF, skips it when it was already processed,
+        extracts its text and identifies a known candidate by their contact details.
+        Returns: (candidate_id, None) when no LLM call is needed (already processed or known candidate, candidate_id is None
+        when the PDF can't be read), or (None, (pdf_md5, resume_text, contacts)) for a resume to extract."""
+        # A byte-identical PDF that was already processed keeps its candidate, no text extraction or LLM call
+        try:
+            pdf_md5 = md5_of_bytes(pdf_bytes) if pdf_bytes is not None else md5_of_file(pdf_path)
+        except OSError as e:
+            print(f"Could not read {pdf_path}: {e}")
+            return None, None
+        entry = lookup_processed(pdf_md5, "dataframe", pdf_path)
+        if entry:
+            return entry['candidate_id'], None
+
         # Extract text from the PDF
-        resume_text = self.extract_text(pdf_path)
+        resume_text = self.extract_text(pdf_path, pdf_bytes, pdf_md5)
         
         if not resume_text:
             print(f"Could not extract text from {pdf_path}")
-            return None
+            return None, None
 
-        
+        # Known candidates are identified by their contact details before the LLM call
+        contacts = extract_contacts(resume_text)
+        known_candidate_id = self.identify_candidate(pdf_path, contacts)
+        if known_candidate_id and skip_known_candidates():
+            return known_candidate_id, None
+        return None, (pdf_md5, resume_text, contacts)
+
+    def _extract_and_store(self, pdf_path, pdf_md5, resume_text, contacts):
+        """The LLM extraction of a prepared resume, returns its candidate_id (None if the extraction failed)"""
         # Extract all sections using LLM pero no estoy usando esta variable, podría no guardar esta info en una variable. Dentro de extract_information_with_df actualizo resume_data que es lo que uso en el siguiente paso.
         extracted_sections, resume_data = self.extract_information_with_df(pdf_path, resume_text, "extracted_sections", "user_extract_all_sections")
 
@@ -241,6 +258,122 @@ class ResumeProcessor:
             print(f"Failed to extract sections from {pdf_path}")
             return None
 
+        return self._store_extraction(pdf_path, pdf_md5, extracted_sections, resume_data, contacts)
+
+    def process_resume(self, pdf_path: str, pdf_bytes: Optional[bytes] = None) -> str:
+        """Main method to process a resume PDF. pdf_bytes is the content of a PDF that is only in memory,
+        pdf_path is then just the reference stored with the candidate. Returns:str: candidate_id for the processed resume"""
+        candidate_id, prepared = self._prepare(pdf_path, pdf_bytes)
+        if prepared is None:
+            return candidate_id
+        return self._extract_and_store(pdf_path, *prepared)
+
+    def process_resume_and_review(self, pdf_path: str, pdf_bytes: Optional[bytes] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """Single-pass version of process_resume: the extraction and the feedback come from one LLM call.
+        Returns: (candidate_id, feedback_result). feedback_result is None when the PDF was already processed or
+        the combined call failed (the extraction then falls back to process_resume), callers then run analyze_resume_with_df"""
+        candidate_id, prepared = self._prepare(pdf_path, pdf_bytes)
+        if prepared is None:
+            return candidate_id, None
+        pdf_md5, resume_text, contacts = prepared
+
+        combined = extract_and_review(resume_text)
+        if combined is None:
+            print(f"Single-pass call failed for {pdf_path}, falling back to the separate extraction")
+            return self._extract_and_store(pdf_path, *prepared), None
+
+        extracted_sections, feedback_result = combined
+        resume_data = {
+            "file_path": pdf_path,
+            "resume_text": resume_text,
+            "extracted_sections": extracted_sections
+        }
+        return self._store_extraction(pdf_path, pdf_md5, extracted_sections, resume_data, contacts), feedback_result
+
+    def process_resumes(self, pdf_paths: Iterable[Optional[str]], batch_size: Optional[int] = None, pdf_workers: Optional[int] = None) -> List[Optional[str]]:
+        """Batched version of process_resume, several resumes are packed in each extraction request.
+        pdf_paths is consumed lazily, so the paths can be yielded while the files are still being downloaded (None entries are skipped).
+        The PDFs are read in a process pool (pdf_workers, default CV_AGENT_PDF_WORKERS) and the extraction requests are
+        sent through run_batch as soon as batch_size texts are ready, while the rest are still being read.
+        Returns: list of candidate_id (or None for the resumes that failed) in the same order as pdf_paths"""
+        candidate_ids = []
+        # pdf_md5 -> positions in pdf_paths: the same path or content listed twice is read and extracted once
+        positions_of_md5 = {}
+        md5_of_path = {}
+        stored = {}  # pdf_md5 -> candidate_id of the resumes already stored in this run
+
+        def assign(pdf_md5, candidate_id):
+            stored[pdf_md5] = candidate_id
+            for position in positions_of_md5[pdf_md5]:
+                candidate_ids[position] = candidate_id
+
+        def paths_to_read():
+            for pdf_path in pdf_paths:
+                position = len(candidate_ids)
+                candidate_ids.append(None)
+                if pdf_path is None:
+                    continue
+                try:
+                    pdf_md5 = md5_of_file(pdf_path)
+                except OSError as e:
+                    print(f"Could not read {pdf_path}: {e}")
+                    continue
+                entry = lookup_processed(pdf_md5, "dataframe", pdf_path)
+                if entry:
+                    candidate_ids[position] = entry['candidate_id']
+                    continue
+                with self._store_lock:
+                    if pdf_md5 in positions_of_md5:
+                        positions_of_md5[pdf_md5].append(position)
+                        candidate_ids[position] = stored.get(pdf_md5)
+                        continue
+                    positions_of_md5[pdf_md5] = [position]
+                md5_of_path[pdf_path] = pdf_md5
+                yield pdf_path
+
+        def texts_to_extract():
+            for pdf in iter_pdf_texts(paths_to_read(), max_workers=pdf_workers):
+                if not pdf.text:
+                    print(f"Could not extract text from {pdf.path}" + (f": {pdf.error}" if pdf.error else ""))
+                    continue
+                if pdf.cached:
+                    print(f"Read {pdf.path} from the extracted text cache")
+                elif pdf.page_seconds:
+                    print(f"Read {pdf.path}: {len(pdf.page_seconds)}/{pdf.pages} pages ({pdf.skipped_pages} without text) in {pdf.seconds:.2f}s, "
+                          f"slowest page {max(pdf.page_seconds):.2f}s")
+                pdf_md5 = md5_of_path[pdf.path]
+                contacts = extract_contacts(pdf.text)
+                with self._store_lock:
+                    known_candidate_id = self.identify_candidate(pdf.path, contacts)
+                    if known_candidate_id and skip_known_candidates():
+                        assign(pdf_md5, known_candidate_id)
+                        continue
+                yield pdf.path, pdf_md5, pdf.text, contacts
+
+        def extract(pending):
+            extracted = self.extract_information_with_df_batch(
+                [(pdf_path, resume_text) for pdf_path, _, resume_text, _ in pending], "extracted_sections", batch_size
+            )
+            for (pdf_path, pdf_md5, _, contacts), result in zip(pending, extracted):
+                if not result:
+                    print(f"Failed to extract sections from {pdf_path}")
+                    continue
+                extracted_sections, resume_data = result
+                # The chunks are extracted concurrently, the dataframes are updated one resume at a time
+                with self._store_lock:
+                    assign(pdf_md5, self._store_extraction(pdf_path, pdf_md5, extracted_sections, resume_data, contacts))
+            return len(pending)
+
+        batch_size = batch_size or get_extraction_batch_size()
+        run_batch(iter_chunks(texts_to_extract(), batch_size), extract,
+                  label=lambda pending: ", ".join(os.path.basename(pdf_path) for pdf_path, _, _, _ in pending))
+        return candidate_ids
+
+    def _store_extraction(self, pdf_path, pdf_md5, extracted_sections, resume_data, contacts=None):
+        """Assigns the candidate id of an extracted resume, adds it to the dataframes and to the processed PDF index.
+        contacts (the locally extracted ContactInfo) fills the contact fields the LLM missed and identifies known candidates."""
+        if contacts is not None and isinstance(extracted_sections.get('user_info'), dict):
+            merge_contacts(extracted_sections['user_info'], contacts)
         # Get user info to identify if it is a new user or is already in our data base
         user_info_data = extracted_sections.get('user_info', {}).copy()
         first_name=user_info_data.get('first_name', '')
@@ -248,7 +381,14 @@ class ResumeProcessor:
         email=user_info_data.get('email', '')
         phone_number=user_info_data.get('phone_number')
 
-        already_user, id = self.new_user_verification(first_name, last_name, email, phone_number)
+        known_candidate_id = self.find_candidate_by_contact(contacts) if contacts is not None else None
+        if known_candidate_id and not same_person_name(first_name, last_name, *self._candidate_names.get(known_candidate_id, (None, None))):
+            print(f"{pdf_path} shares contact details with candidate {known_candidate_id} but not the name, storing it as another candidate")
+            known_candidate_id = None
+        if known_candidate_id:
+            already_user, id = True, known_candidate_id
+        else:
+            already_user, id = self.new_user_verification(first_name, last_name, email, phone_number)
         if already_user:
             candidate_id = id
             resume_data["CandidateID"] = candidate_id
@@ -260,6 +400,9 @@ class ResumeProcessor:
 
         # Process the extracted sections into the dataframes
         self.process_llm_output(candidate_id, resume_data, pdf_path, None)
+        self._remember_contacts(candidate_id, contact_keys(email, phone_number, user_info_data.get('linkedin_profile'))
+                                | (contacts.keys() if contacts is not None else set()), first_name, last_name)
+        get_pdf_index().record(pdf_md5, "dataframe", candidate_id, os.path.basename(pdf_path), pdf_path, extracted_sections)
         
         return candidate_id
     
@@ -275,12 +418,14 @@ class ResumeProcessor:
                 return None
 
             # Get the prompt template and format it with the resume text
+            prompt_key, resume_txt, _ = presegment(resume_txt, prompt_key)
             prompt_template = PROMPTS[prompt_key]
+            resume_txt, _ = fit_text_to_budget(resume_txt, "extraction", estimate_tokens(prompt_template))
             prompt = prompt_template.format(resume_data=resume_txt)
 
             # Use retry mechanism for API call
             try:
-                response = retry_generate_content(prompt)
+                response = retry_generate_content(prompt, generation_config=json_generation_config(RESUME_EXTRACTION_SCHEMA), prompt_ref=PROMPTS.ref(prompt_key))
             except RateLimitException as e:
                 print(f"Failed to generate content after retries: {e}")
                 return None
@@ -288,20 +433,9 @@ class ResumeProcessor:
                 print(f"Unexpected error during content generation: {e}")
                 return None
                 
-            # Convert response to string and clean it
-            response_text = str(response).strip()
             try:
-                # Remove any leading/trailing whitespace and newlines
-                response_text = response_text.strip()
-            
-                # If the response is wrapped in markdown code blocks, extract the JSON
-                if '```json' in response_text:
-                    response_text = response_text.split('```json')[1].split('```')[0].strip()
-                elif '```' in response_text:
-                    response_text = response_text.split('```')[1].split('```')[0].strip()
-
                 # Parse the JSON
-                parsed_response = json.loads(response_text)
+                parsed_response = parse_json_response(response, "extraction")
 
                 # Create a resume data object
                 resume_data = {
@@ -315,7 +449,7 @@ class ResumeProcessor:
             except json.JSONDecodeError as json_err:
                 print(f"\nJSON parsing error: {str(json_err)}")
                 print("Response text that failed to parse:")
-                print(response_text)
+                print(response)
                 return None
             
         except Exception as e:
@@ -325,9 +459,21 @@ class ResumeProcessor:
             print(traceback.format_exc())
             return None
 
+    def extract_information_with_df_batch(self, items, section_key, batch_size=None):
+        """Batched version of extract_information_with_df.
+        Args: items: list of (pdf_path, resume_txt), section_key: key for the extraction in resume_data, batch_size: resumes per request
+        Returns: list of (parsed_response, resume_data) tuples, or None for the items that failed, in the same order as items"""
+        resume_items = [({"file_path": pdf_path, "resume_text": resume_txt}, resume_txt) for pdf_path, resume_txt in items]
+        extracted = extract_information_batch(resume_items, section_key, "user_extract_all_sections_batch", batch_size)
+        return [
+            (parsed_response, resume_data) if parsed_response else None
+            for parsed_response, (resume_data, _) in zip(extracted, resume_items)
+        ]
+
     def process_llm_output(self, candidate_id, llm_output: Dict, pdf_path: str, version_id: Optional[str] = None):
         """ Process LLM output and update all dataframes automatically."""
         # Use provided version_id or generate a new candidate_id
+        import pandas as pd
         timestamp = datetime.now()
 
         # Add version_id to all records if provided
@@ -579,7 +725,7 @@ class ResumeProcessor:
                     pd.DataFrame(language_records)
                 ], ignore_index=True)
 
-    def get_dataframes(self) -> Dict[str, pd.DataFrame]:
+    def get_dataframes(self) -> Dict[str, "pd.DataFrame"]:
         #Return all dataframes for analysis or export.
 
         dataframes = {
@@ -608,6 +754,11 @@ class ResumeProcessor:
         """Save all dataframes to CSV files with append functionality."""
         os.makedirs(output_dir, exist_ok=True)
         
+        with CSV_LOCK:
+            self._save_to_csv_unlocked(output_dir)
+
+    def _save_to_csv_unlocked(self, output_dir: str):
+        import pandas as pd
         for name, df in self.get_dataframes().items():
             if not df.empty:
                 file_path = f"{output_dir}/{name}.csv"
@@ -639,7 +790,47 @@ class ResumeProcessor:
                     # Create new file if it doesn't exist
                     df.to_csv(file_path, index=False)
 
+    def _get_contact_index(self):
+        """{contact key: candidate_id} of the candidates in candidates.csv, read once per processor"""
+        import pandas as pd
+        if self._contact_index is None:
+            index = {}
+            file_path = "data/processed_resumes/candidates.csv"
+            if os.path.exists(file_path):
+                with CSV_LOCK:
+                    candidates_df = pd.read_csv(file_path)
+                for row in candidates_df.to_dict('records'):
+                    for key in contact_keys(row.get('email'), row.get('phone_number'), row.get('linkedin_profile')):
+                        index.setdefault(key, row['candidate_id'])
+                    self._candidate_names.setdefault(row['candidate_id'], (row.get('first_name'), row.get('last_name')))
+            self._contact_index = index
+        return self._contact_index
+
+    def _remember_contacts(self, candidate_id, keys, first_name=None, last_name=None):
+        """Adds the contact keys of a stored candidate, the next resumes of this run can match it before saving"""
+        index = self._get_contact_index()
+        for key in keys:
+            index.setdefault(key, candidate_id)
+        self._candidate_names.setdefault(candidate_id, (first_name, last_name))
+
+    def find_candidate_by_contact(self, contacts) -> Optional[str]:
+        """candidate_id of a stored candidate with the same email (canonical), phone (normalized) or LinkedIn profile, else None"""
+        index = self._get_contact_index()
+        for key in sorted(contacts.keys()):  # email, then linkedin, then phone
+            if key in index:
+                return index[key]
+        return None
+
+    def identify_candidate(self, pdf_path, contacts) -> Optional[str]:
+        """find_candidate_by_contact with a log line, run on the PDF text before the extraction call"""
+        candidate_id = self.find_candidate_by_contact(contacts)
+        if candidate_id:
+            action = "keeping the stored extraction" if skip_known_candidates() else "extracting it under the same candidate"
+            print(f"{pdf_path} belongs to the known candidate {candidate_id} (same contact details), {action}")
+        return candidate_id
+
     def new_user_verification(self, first_name, last_name, email, phone_number):
+        import pandas as pd
         file_path = "data/processed_resumes/candidates.csv"
     
         # Check if the file exists
@@ -648,7 +839,8 @@ class ResumeProcessor:
 
 
         # File exists, proceed with verification
-        candidates_df = pd.read_csv(file_path)
+        with CSV_LOCK:
+            candidates_df = pd.read_csv(file_path)
 
         # Check if any row matches all conditions
         mask = ((candidates_df["first_name"] == first_name) & 
@@ -672,6 +864,7 @@ class ResumeProcessor:
 
 class VersionedResumeProcessor(ResumeProcessor):
     def __init__(self, llm_client):
+        import pandas as pd
         super().__init__()
         self.versions_df = pd.DataFrame()
         self.llm_client = llm_client  # Store LLM client for processing
@@ -708,9 +901,14 @@ class VersionedResumeProcessor(ResumeProcessor):
     ):
         """Process a new version of a resume with version tracking."""
         # Extract and process resume content
+        import pandas as pd
         resume_text = self.extract_text(pdf_path)
         if not resume_text:
             raise ValueError(f"Could not extract text from {pdf_path}")
+
+        # A resume of a known candidate continues its version history
+        if not candidate_id:
+            candidate_id = self.identify_candidate(pdf_path, extract_contacts(resume_text))
         
         # Create a resume data object for the LLM
         resume_data = {
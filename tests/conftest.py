@@ -0,0 +1,107 @@
+#tests/conftest.py
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# Set before the modules are imported, their PROMPTS mappings keep the registry built at import time
+os.environ.setdefault("CV_AGENT_PROMPTS_DIR", os.path.join(ROOT, "prompts"))
+
+# Process-wide singletons, reset so every test builds them from its own environment
+SINGLETONS = [
+    ("api_integration.gemini_api", "_gemini_api"),
+    ("api_integration.rate_limiter", "_rate_limiter"),
+    ("api_integration.response_cache", "_response_cache"),
+    ("api_integration.call_policy", "_call_policy"),
+    ("api_integration.adaptive_concurrency", "_limiter"),
+    ("data.pdf_index", "_pdf_index"),
+    ("data.text_cache", "_text_cache"),
+    ("data.drive_sync", "_drive_sync_state"),
+]
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    """Runs every test in a temporary directory, with the SQLite stores there and the LLM calls on the replay backend"""
+    monkeypatch.chdir(tmp_path)
+    for name, value in {
+        "CV_AGENT_LLM_BACKEND": "replay",
+        "GEMINI_CACHE_PATH": str(tmp_path / "llm_responses.sqlite"),
+        "GEMINI_RATE_LIMIT_DB": str(tmp_path / "rate_limiter.sqlite"),
+        "GEMINI_RPM": "1000000",
+        "GEMINI_TPM": "1000000000",
+        "CV_AGENT_PDF_INDEX": str(tmp_path / "processed_pdfs.sqlite"),
+        "CV_AGENT_TEXT_CACHE_PATH": str(tmp_path / "pdf_texts.sqlite"),
+        "CV_AGENT_DRIVE_SYNC_STATE": str(tmp_path / "drive_sync.sqlite"),
+    }.items():
+        monkeypatch.setenv(name, value)
+    for name in ("CV_AGENT_LLM_RECORD", "CV_AGENT_REPLAY_FILE", "CV_AGENT_DRIVE_INCREMENTAL", "CV_AGENT_PRESEGMENT",
+                 "CV_AGENT_EXTRACTION_BATCH_SIZE", "CV_AGENT_KNOWN_CANDIDATES", "CV_AGENT_DEFAULT_COUNTRY_CODE"):
+        monkeypatch.delenv(name, raising=False)
+    for module_name, attribute in SINGLETONS:
+        module = pytest.importorskip(module_name)
+        monkeypatch.setattr(module, attribute, None)
+    return tmp_path
+
+RESUME = """Ana López
+ana.lopez@example.com | +52 55 1234 5678
+Perfil
+Analista de datos con 5 años de experiencia.
+Experiencia laboral
+Analista de datos, Empresa, CDMX, 2020 - actual
+Educación
+Licenciatura en Economía, UNAM, 2014 - 2018
+Idiomas
+Inglés avanzado
+"""
+
+@pytest.fixture
+def resume_text():
+    """A short resume with the usual Spanish headings"""
+    return RESUME
+
+class FlakyResponder:
+    """Replay responder that fails the first calls with a 429 or an unparseable response, then answers like synthetic_response"""
+
+    def __init__(self, failures, failure="429"):
+        self.failures = failures
+        self.failure = failure
+        self.calls = 0
+
+    def __call__(self, prompt):
+        from api_integration.llm_backend import ReplayRateLimitError, synthetic_response
+
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.failure == "429":
+                raise ReplayRateLimitError("429 Resource has been exhausted")
+            return "not json"
+        return synthetic_response(prompt)
+
+@pytest.fixture
+def flaky_responder():
+    return FlakyResponder
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """The process-wide GeminiAPI (replay backend) with the retries not waiting between attempts"""
+    pytest.importorskip("dotenv")
+    from api_integration.gemini_api import get_gemini_api
+
+    api = get_gemini_api()
+    monkeypatch.setattr(api.concurrency, "backoff", lambda attempt: 0)
+    return api
+
+def make_pdf(path, text, pages=1):
+    """Writes a PDF with text on each page and returns its path"""
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f"{text}\nPage {number + 1}")
+    doc.save(str(path))
+    return str(path)
+
+@pytest.fixture
+def pdf_factory():
+    return make_pdf
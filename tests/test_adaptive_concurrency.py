@@ -0,0 +1,102 @@
+#tests/test_adaptive_concurrency.py
+import time
+import pytest
+from api_integration import adaptive_concurrency
+from api_integration.adaptive_concurrency import (AdaptiveConcurrencyLimiter, CircuitBreaker, is_rate_limit_error,
+                                                  is_overload_error)
+
+RATE_LIMIT = Exception("429 Resource has been exhausted (e.g. check quota)")
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(adaptive_concurrency.time, "monotonic", clock.monotonic)
+    return clock
+
+def test_error_classification():
+    assert is_rate_limit_error(RATE_LIMIT)
+    assert is_overload_error(TimeoutError()) and is_overload_error(Exception("503 Service Unavailable"))
+    assert not is_overload_error(ValueError("bad request"))
+
+def test_quota_errors_halve_the_limit_once_per_cooldown(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=8, min_limit=1, cooldown=2.0)
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(error=RATE_LIMIT)  # A burst of 429s counts as one signal
+    assert limiter.limit == 4 and limiter.decreases == 1
+    clock.now += 2
+    limiter.acquire()
+    limiter.release(error=RATE_LIMIT)
+    assert limiter.limit == 2
+
+def test_healthy_calls_raise_the_limit_additively(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=3, latency_target=1.0)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(latency=0.1)
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)  # About +1 per limit calls
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(latency=0.1)
+    assert limiter.limit == 3  # Capped at max_limit
+
+def test_slow_calls_and_other_errors_keep_the_limit(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=2, latency_target=1.0)
+    limiter.acquire()
+    limiter.release(latency=5.0)
+    limiter.acquire()
+    limiter.release(error=ValueError("bad request"))
+    assert limiter.limit == 2
+
+def test_the_limit_bounds_the_calls_in_flight(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=2)
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter._try_acquire() is None
+    limiter.release(latency=0.1)
+    assert limiter._try_acquire() == 0.0
+
+def test_circuit_opens_lets_one_probe_through_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record(overloaded=True)
+    assert breaker.state == "closed" and breaker.wait_time() == 0
+    breaker.record(overloaded=True)
+    assert breaker.state == "open" and breaker.wait_time() == pytest.approx(30)
+
+    clock.now += 30
+    assert breaker.wait_time() == 0  # The probe
+    assert breaker.state == "half_open"
+    assert breaker.wait_time() > 0  # Everyone else waits for the probe
+    breaker.record(overloaded=False)
+    assert breaker.state == "closed" and breaker.wait_time() == 0
+
+def test_a_failed_probe_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(overloaded=True)
+    clock.now += 30
+    assert breaker.wait_time() == 0
+    breaker.record(overloaded=True)
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+def test_rate_limiter_waits_do_not_count_as_call_latency(no_backoff, monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=4, latency_target=0.1)
+    monkeypatch.setattr(no_backoff, "concurrency", limiter)
+    monkeypatch.setattr(no_backoff, "cache", None)
+    in_flight_while_waiting = []
+
+    def acquire(tokens):
+        in_flight_while_waiting.append(limiter.in_flight)
+        time.sleep(0.2)  # Waiting for quota, longer than the latency target
+
+    monkeypatch.setattr(no_backoff.rate_limiter, "acquire", acquire)
+    assert no_backoff.generate_content("prompt")
+    assert in_flight_while_waiting == [0]  # No slot is held while waiting for quota
+    assert limiter.limit == pytest.approx(2.0)  # The fast call raised the limit
@@ -0,0 +1,23 @@
+#tests/test_batch_extraction.py
+"""Batched extraction (CV_AGENT_EXTRACTION_BATCH_SIZE) against the offline ReplayBackend"""
+import pytest
+
+def test_batched_extraction_keeps_the_order(no_backoff, resume_text):
+    from core.information_extractor import extract_information_batch
+
+    items = [({}, f"{resume_text}\nID {index}") for index in range(5)]
+    results = extract_information_batch(items, "extracted_sections", "user_extract_all_sections_batch", batch_size=2)
+    assert len(results) == 5 and all(results)
+    assert all(resume_data["extracted_sections"] is result for (resume_data, _), result in zip(items, results))
+
+def test_process_resumes_from_pdfs(tmp_path, no_backoff, resume_text, pdf_factory):
+    pytest.importorskip("pandas")
+    from temporal.temporal import ResumeProcessor
+
+    paths = [pdf_factory(tmp_path / name, f"Resume number {index}\n{resume_text}")
+             for index, name in enumerate(["CV.pdf", "other.pdf"])]
+    # The same PDF listed twice is read and extracted once, the failed download (None) keeps its position
+    candidate_ids = ResumeProcessor().process_resumes(iter([paths[0], None, paths[1], paths[0]]), batch_size=2, pdf_workers=1)
+    assert candidate_ids[0] and candidate_ids[2]
+    assert candidate_ids[1] is None
+    assert candidate_ids[3] == candidate_ids[0]
@@ -0,0 +1,59 @@
+#tests/test_batch_runner.py
+import time
+import asyncio
+import threading
+from core.batch_runner import run_batch, iter_chunks
+
+def test_results_keep_the_input_order():
+    def worker(item):
+        time.sleep(0.01 * (5 - item))  # The first items finish last
+        return item * 2
+
+    results = run_batch(list(range(5)), worker, max_concurrency=5)
+    assert [r.index for r in results] == list(range(5))
+    assert [r.result for r in results] == [0, 2, 4, 6, 8]
+
+def test_a_failing_item_does_not_stop_the_batch():
+    def worker(item):
+        if item == 1:
+            raise ValueError("broken resume")
+        return item
+
+    results = run_batch([0, 1, 2], worker, max_concurrency=2)
+    assert [r.result for r in results] == [0, None, 2]
+    assert "ValueError: broken resume" in results[1].error
+    assert results[0].error is None and results[2].error is None
+
+def test_at_most_max_concurrency_items_are_in_flight():
+    lock, in_flight, peak = threading.Lock(), [0], [0]
+
+    def worker(item):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+
+    run_batch(range(10), worker, max_concurrency=3)
+    assert peak[0] == 3
+
+def test_coroutine_workers_and_generators():
+    produced = []
+
+    def items():
+        for item in range(4):
+            produced.append(item)
+            yield item
+
+    async def worker(item):
+        await asyncio.sleep(0)
+        return item + 1
+
+    results = run_batch(items(), worker, max_concurrency=2)
+    assert [r.result for r in results] == [1, 2, 3, 4]
+    assert produced == [0, 1, 2, 3]
+
+def test_iter_chunks():
+    assert list(iter_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_chunks([], 2)) == []
@@ -0,0 +1,54 @@
+#tests/test_call_metrics.py
+import csv
+import json
+import pytest
+from api_integration import call_metrics as call_metrics_module
+from api_integration.call_metrics import CallMetrics, CALL_METRICS_CSV, CALL_METRICS_JSON
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """A fresh CallMetrics in place of the process-wide one"""
+    metrics = CallMetrics()
+    monkeypatch.setattr(call_metrics_module, "call_metrics", metrics)
+    return metrics
+
+def test_summary_by_stage(metrics):
+    metrics.record("feedback", "analyzer@v7", 1.0, 9000, 300, resume="a.pdf")
+    metrics.record("feedback", "analyzer@v7", 0.0, 9000, 300, outcome="cached", resume="a.pdf")
+    metrics.record("extraction", "extraction@v2", 2.0, 100, 50, retries=2, resume="b.pdf")
+    by_stage = {s['stage']: s for s in metrics.summary()}
+    assert by_stage["feedback"]['calls'] == 2 and by_stage["feedback"]['prompt_tokens'] == 9000
+    assert by_stage["feedback"]['over_budget'] == 2  # The default feedback budget is 8000 tokens
+    assert by_stage["extraction"]['retries'] == 2
+    assert metrics.spend_by_resume()["a.pdf"] == {'prompt_tokens': 9000, 'response_tokens': 300, 'calls': 1}
+
+def test_finish_run_reports_and_dumps_once(metrics, capsys):
+    metrics.record("extraction", "extraction@v2", 2.0, 100, 50)
+    metrics.finish_run()
+    assert "LLM calls by stage" in capsys.readouterr().out
+    with open(CALL_METRICS_CSV, newline="", encoding="utf-8") as f:
+        assert [row['stage'] for row in csv.DictReader(f)] == ["extraction"]
+    with open(CALL_METRICS_JSON, encoding="utf-8") as f:
+        assert json.load(f)['stages'][0]['stage'] == "extraction"
+    assert metrics.records == []
+    metrics.finish_run()  # Nothing new to write, the files are kept
+    with open(CALL_METRICS_CSV, newline="", encoding="utf-8") as f:
+        assert len(list(csv.DictReader(f))) == 1
+
+def test_a_csv_with_other_columns_is_kept_aside(metrics, tmp_path):
+    (tmp_path / "data" / "logs").mkdir(parents=True)
+    (tmp_path / CALL_METRICS_CSV).write_text("timestamp,stage\n2024-01-01,feedback\n", encoding="utf-8")
+    metrics.record("extraction", None, 1.0, 10, 5)
+    metrics.dump()
+    assert len(list((tmp_path / "data" / "logs").glob("llm_calls.csv.*"))) == 1
+    with open(CALL_METRICS_CSV, newline="", encoding="utf-8") as f:
+        assert next(csv.reader(f))[:3] == ["timestamp", "resume", "stage"]
+
+def test_the_batch_report_does_not_dump(metrics, tmp_path, monkeypatch):
+    from core import batch_runner
+    from core.batch_runner import BatchResult, report_batch
+
+    monkeypatch.setattr(batch_runner, "call_metrics", metrics)
+    metrics.record("extraction", None, 1.0, 10, 5, resume="a.pdf")
+    report_batch([BatchResult(index=0, item="a.pdf", result="ok")])
+    assert metrics.records and not (tmp_path / CALL_METRICS_CSV).exists()
@@ -0,0 +1,115 @@
+#tests/test_call_policy.py
+import time
+import threading
+import pytest
+from api_integration.call_policy import CallPolicy, AttemptPool, LLMTimeoutError
+from api_integration.adaptive_concurrency import AdaptiveConcurrencyLimiter
+
+def slow(seconds, value="ok"):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+def test_a_call_past_its_deadline_times_out():
+    policy = CallPolicy(timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        policy.call(slow(1))
+    assert time.monotonic() - start < 0.5
+    assert policy.tracker.stats()['timeouts'] == 1
+
+def test_errors_of_the_call_are_raised():
+    def fail():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError, match="bad request"):
+        CallPolicy(timeout=1).call(fail)
+
+def test_a_call_slower_than_the_p95_is_hedged():
+    policy = CallPolicy(timeout=5, hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        policy.tracker.record(0.05)
+    calls, hedges = [], []
+
+    def call():
+        calls.append(None)
+        time.sleep(1 if len(calls) == 1 else 0)  # The first attempt is stuck, the duplicate answers at once
+        return len(calls)
+
+    start = time.monotonic()
+    assert policy.call(call, before_hedge=lambda: hedges.append(None)) == 2
+    assert time.monotonic() - start < 0.5
+    assert len(hedges) == 1
+    assert policy.tracker.stats()['hedge_wins'] == 1
+
+def test_no_hedge_without_enough_samples():
+    policy = CallPolicy(timeout=5, hedge=True, hedge_min_samples=3)
+    policy.tracker.record(0.01)
+    assert policy.hedge_delay() is None
+
+def test_abandoned_attempts_stay_counted_until_they_finish():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=2)
+    policy = CallPolicy(timeout=0.1)
+    release = threading.Event()
+    with limiter.slot():
+        with pytest.raises(LLMTimeoutError):
+            policy.call(release.wait, on_abandon=limiter.hold)
+    assert limiter.stats()['in_flight'] == 1 and limiter.stats()['abandoned'] == 1
+    release.set()
+    deadline = time.monotonic() + 2
+    while limiter.stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert limiter.stats()['in_flight'] == 0 and limiter.stats()['abandoned'] == 0
+
+def test_the_attempt_pool_is_bounded():
+    pool = AttemptPool(max_workers=2)
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return True
+
+    futures = [pool.submit(call) for _ in range(6)]
+    assert all(future.result(timeout=5) for future in futures)
+    assert peak[0] == 2
+
+def test_a_stream_is_read_by_one_thread():
+    threads = set()
+
+    def chunks():
+        for chunk in ("a", "b", "c"):
+            threads.add(threading.get_ident())
+            yield chunk
+
+    assert list(CallPolicy(timeout=1).stream(chunks)) == ["a", "b", "c"]
+    assert len(threads) == 1
+
+def test_a_stalled_stream_times_out_and_its_reader_is_abandoned():
+    release, abandoned = threading.Event(), []
+
+    def chunks():
+        yield "a"
+        release.wait()
+        yield "b"
+
+    stream = CallPolicy(timeout=0.2).stream(chunks, on_abandon=abandoned.append)
+    assert next(stream) == "a"
+    with pytest.raises(LLMTimeoutError):
+        next(stream)
+    assert len(abandoned) == 1 and not abandoned[0].done()
+    release.set()
+    abandoned[0].result(timeout=2)
+
+def test_stream_errors_are_raised():
+    def chunks():
+        yield "a"
+        raise ConnectionError("stream reset")
+
+    with pytest.raises(ConnectionError):
+        list(CallPolicy(timeout=1).stream(chunks))
@@ -0,0 +1,58 @@
+#tests/test_contact_extractor.py
+from core.contact_extractor import (extract_contacts, normalize_phone, canonical_email, normalize_linkedin,
+                                    contact_keys, same_person_name)
+
+RESUME = """Ana López
+ana.lopez+cv@gmail.com | 55 1234 5678 | linkedin.com/in/Ana-Lopez/
+Perfil
+Analista de datos con 5 años de experiencia.
+Experiencia laboral
+Analista de datos, Empresa, 2018 - 2020
+Educación
+Licenciatura en Economía, UNAM, 2014 2015 2016 2017
+Referencias
+Juan Pérez, juan.perez@empresa.com, 55 3333 4444
+"""
+
+def test_only_the_candidates_own_contacts_are_extracted():
+    contacts = extract_contacts(RESUME)
+    assert contacts.email == "ana.lopez+cv@gmail.com"
+    assert contacts.phone_number == "+525512345678"
+    assert contacts.linkedin_profile == "https://www.linkedin.com/in/ana-lopez"
+    assert contacts.keys() == {"email:analopez@gmail.com", "phone:+525512345678", "linkedin:https://www.linkedin.com/in/ana-lopez"}
+
+def test_references_never_become_identity_keys():
+    keys = extract_contacts(RESUME).keys()
+    assert not any("juan" in key or "3333" in key for key in keys)
+
+def test_resume_without_contact_header_has_no_keys():
+    resume = "Perfil\nAnalista.\nExperiencia\nEmpresa 2018 - 2020\nReferencias\nJuan Pérez, juan@empresa.com, 55 3333 4444\n"
+    assert extract_contacts(resume).keys() == set()
+
+def test_date_ranges_are_not_phone_numbers():
+    assert normalize_phone("2018 - 2020") is None
+    assert normalize_phone("2014 2015 2016") is None
+    assert normalize_phone("01/2019 - 12/2020") is None
+    assert extract_contacts("Ana López\n2018 - 2020\n").phone_number is None
+
+def test_phone_normalization():
+    assert normalize_phone("55 1234 5678") == "+525512345678"
+    assert normalize_phone("+52 1 55 1234 5678") == "+525512345678"
+    assert normalize_phone("044 55 1234 5678") == "+525512345678"
+    assert normalize_phone("+34 612 345 678") == "+34612345678"
+    assert normalize_phone(5512345678.0) == "+525512345678"  # Read back from a CSV column
+    assert normalize_phone(float("nan")) is None
+    assert normalize_phone("12345") is None
+
+def test_email_and_linkedin_normalization():
+    assert canonical_email("Ana.Lopez+cv@GoogleMail.com") == "analopez@gmail.com"
+    assert canonical_email("ana.lopez+cv@empresa.com") == "ana.lopez+cv@empresa.com"
+    assert canonical_email("no es un correo") is None
+    assert normalize_linkedin("https://mx.linkedin.com/in/ana-lopez/") == "https://www.linkedin.com/in/ana-lopez"
+    assert contact_keys(None, "", "") == set()
+
+def test_same_person_name():
+    assert same_person_name("Ana", "López", "ana", "lopez garcia")
+    assert same_person_name("Ana", None, "Ana", "López")
+    assert not same_person_name("Ana", "López", "Juan", "López")
+    assert not same_person_name("Ana", "López", "Ana", "Pérez")
@@ -0,0 +1,66 @@
+#tests/test_drive_listing.py
+import pytest
+from core import handle_resume_from_drive
+from core.handle_resume_from_drive import iter_files_in_folder, list_files_in_folder, number_files_in_drive
+
+errors = pytest.importorskip("googleapiclient.errors")
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+class FakeDrive:
+    """files().list answers with the given pages in order, a page can be an exception"""
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.requests = []
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeRequest(self.pages.pop(0))
+
+def http_error(status=500):
+    class Response(dict):
+        reason = "Internal error"
+    response = Response(status=str(status))
+    response.status = status
+    return errors.HttpError(response, b"{}")
+
+def use_drive(monkeypatch, pages):
+    drive = FakeDrive(pages)
+    monkeypatch.setattr(handle_resume_from_drive, "get_drive_service", lambda: drive)
+    return drive
+
+PAGE_1 = {"files": [{"id": "1", "name": "a.pdf"}, {"id": "2", "name": "b.pdf"}], "nextPageToken": "p2"}
+PAGE_2 = {"files": [{"id": "3", "name": "c.pdf"}], "nextPageToken": "p3"}
+
+def test_every_page_is_listed(monkeypatch):
+    drive = use_drive(monkeypatch, [PAGE_1, {"files": [{"id": "3", "name": "c.pdf"}]}])
+    assert [file["id"] for file in list_files_in_folder("folder")] == ["1", "2", "3"]
+    assert [request["pageToken"] for request in drive.requests] == [None, "p2"]
+    assert "mimeType = 'application/pdf'" in drive.requests[0]["q"]
+
+def test_an_error_after_the_first_pages_is_raised(monkeypatch):
+    use_drive(monkeypatch, [PAGE_1, PAGE_2, http_error()])
+    files = iter_files_in_folder("folder")
+    assert [next(files)["id"] for _ in range(3)] == ["1", "2", "3"]
+    with pytest.raises(errors.HttpError):
+        next(files)
+
+def test_a_partial_listing_fails_the_run(monkeypatch):
+    use_drive(monkeypatch, [PAGE_1, PAGE_2, http_error()])
+    assert list_files_in_folder("folder") is None
+    use_drive(monkeypatch, [PAGE_1, PAGE_2, http_error()])
+    assert number_files_in_drive("folder") is None
+
+def test_an_empty_folder_is_not_a_failure(monkeypatch):
+    use_drive(monkeypatch, [{"files": []}])
+    assert number_files_in_drive("folder") == ([], 0)
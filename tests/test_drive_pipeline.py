@@ -0,0 +1,32 @@
+#tests/test_drive_pipeline.py
+from core.drive_pipeline import run_drive_pipeline, extracted_label
+from core.handle_resume_from_drive import select_files_to_sync
+
+FILES = [{"id": str(i), "name": f"resume{i}.pdf", "md5Checksum": f"md5-{i}"} for i in range(3)]
+
+def per_file(file):
+    return None if file["name"] == "resume1.pdf" else f"reviewed {file['name']}"
+
+def batch_extract(files):
+    for file in files:
+        yield None if file["name"] == "resume1.pdf" else ({}, file["id"], file["name"])
+
+def per_extracted_resume(result):
+    return None if result is None else f"reviewed {result[2]}"
+
+def test_each_file_runs_through_the_callback():
+    results = run_drive_pipeline("folder", "review", FILES, per_file, batch_extract, per_extracted_resume)
+    assert [r.result for r in results] == ["reviewed resume0.pdf", None, "reviewed resume2.pdf"]
+
+def test_the_batched_extraction_feeds_the_per_resume_callback(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_EXTRACTION_BATCH_SIZE", "2")
+    results = run_drive_pipeline("folder", "review", FILES, per_file, batch_extract, per_extracted_resume)
+    assert [r.result for r in results] == ["reviewed resume0.pdf", None, "reviewed resume2.pdf"]
+    assert extracted_label(results[1].item) == "skipped file"
+
+def test_only_processed_files_are_recorded_for_the_next_run(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_DRIVE_INCREMENTAL", "1")
+    run_drive_pipeline("folder", "review", FILES, per_file, batch_extract, per_extracted_resume)
+    assert [file["name"] for file in select_files_to_sync("folder", "review", FILES)] == ["resume1.pdf"]
+    # Another pipeline keeps its own sync state
+    assert select_files_to_sync("folder", "questions", FILES) == FILES
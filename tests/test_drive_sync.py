@@ -0,0 +1,48 @@
+#tests/test_drive_sync.py
+import pytest
+from core.batch_runner import BatchResult
+from core.handle_resume_from_drive import select_files_to_sync, record_synced_files
+
+FILES = [
+    {"id": "1", "name": "a.pdf", "md5Checksum": "aaa", "modifiedTime": "2024-01-01T00:00:00Z"},
+    {"id": "2", "name": "b.pdf", "md5Checksum": "bbb", "modifiedTime": "2024-01-01T00:00:00Z"},
+    {"id": "3", "name": "c.pdf", "modifiedTime": "2024-01-01T00:00:00Z"},  # Without a checksum
+]
+
+@pytest.fixture
+def incremental(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_DRIVE_INCREMENTAL", "1")
+
+def processed(files):
+    return [BatchResult(index=i, item=file, result=file["id"]) for i, file in enumerate(files)]
+
+def test_every_file_is_selected_when_incremental_sync_is_off():
+    assert select_files_to_sync("folder", "review", FILES) == FILES
+
+def test_first_run_selects_every_file(incremental):
+    assert select_files_to_sync("folder", "review", FILES) == FILES
+
+def test_only_new_or_modified_files_are_selected(incremental):
+    record_synced_files("folder", "review", FILES, processed(FILES))
+    assert select_files_to_sync("folder", "review", FILES) == []
+
+    changed = [dict(FILES[0], md5Checksum="new"), FILES[1], dict(FILES[2], modifiedTime="2024-02-01T00:00:00Z"),
+               {"id": "4", "name": "d.pdf", "md5Checksum": "ddd"}]
+    assert [file["id"] for file in select_files_to_sync("folder", "review", changed)] == ["1", "3", "4"]
+
+def test_a_new_modified_time_with_the_same_content_is_not_reprocessed(incremental):
+    record_synced_files("folder", "review", FILES, processed(FILES))
+    touched = [dict(FILES[0], modifiedTime="2024-03-01T00:00:00Z")]
+    assert select_files_to_sync("folder", "review", touched) == []
+
+def test_failed_and_skipped_files_are_retried(incremental):
+    results = [BatchResult(index=0, item=FILES[0], result="1"),
+               BatchResult(index=1, item=FILES[1], error="Traceback"),
+               BatchResult(index=2, item=FILES[2], result=None)]
+    record_synced_files("folder", "review", FILES, results)
+    assert [file["id"] for file in select_files_to_sync("folder", "review", FILES)] == ["2", "3"]
+
+def test_pipelines_and_folders_are_tracked_separately(incremental):
+    record_synced_files("folder", "review", FILES, processed(FILES))
+    assert select_files_to_sync("folder", "questions", FILES) == FILES
+    assert select_files_to_sync("other", "review", FILES) == FILES
@@ -0,0 +1,73 @@
+#tests/test_feedback_fanout.py
+"""Per-section feedback fan-out (CV_AGENT_FEEDBACK_FANOUT) against the offline ReplayBackend"""
+import asyncio
+import pytest
+
+@pytest.fixture
+def candidate():
+    pd = pytest.importorskip("pandas")
+    return dict(
+        first_name="ana",
+        candidate_data=pd.DataFrame([{"candidate_id": "1", "first_name": "ana", "summary": "Analista de datos"}]),
+        skills=pd.DataFrame([{"hard_skills": "SQL", "soft_skills": "Liderazgo"}]),
+        experience=pd.DataFrame([{"title": "Analista", "company": "Empresa", "start_date": "2020-01-01", "end_date": None,
+                                  "description": "Reportes", "location": "CDMX"}]),
+        education=pd.DataFrame([{"title": "Economía", "institution": "UNAM", "type": "Licenciatura", "start_date": "2014-01-01",
+                                 "end_date": "2018-01-01", "notes": None}]),
+        languages=pd.DataFrame([{"language": "Inglés"}]),
+    )
+
+def test_every_section_gets_its_own_prompt(no_backoff, candidate, monkeypatch):
+    from core import general_feedback
+
+    prompts = []
+    generate = no_backoff.agenerate_content_with_retry
+
+    async def record(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return await generate(prompt, *args, **kwargs)
+
+    monkeypatch.setattr(no_backoff, "agenerate_content_with_retry", record)
+    result = general_feedback.general_analyzer_df_sections(**candidate, sections=["summary", "work_experience"])
+    assert set(result["general_feedback"]["sections"]) == {"summary", "work_experience"}
+    assert len(prompts) == 2 and "Analista de datos" in prompts[0]
+
+def test_sections_are_requested_concurrently(no_backoff, candidate, monkeypatch):
+    from core import general_feedback
+
+    in_flight, peak = [0], [0]
+
+    async def slow(prompt, *args, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+        return '{"feedback": "ok", "example": "ok"}'
+
+    monkeypatch.setattr(no_backoff, "agenerate_content_with_retry", slow)
+    result = general_feedback.general_analyzer_df_sections(**candidate)
+    assert len(result["general_feedback"]["sections"]) == len(general_feedback.FEEDBACK_SECTION_GUIDES)
+    assert peak[0] == len(general_feedback.FEEDBACK_SECTION_GUIDES)
+
+def test_unknown_sections_are_an_error(candidate):
+    from core.general_feedback import general_analyzer_df_sections
+
+    assert "Unknown feedback sections" in general_analyzer_df_sections(**candidate, sections=["hobbies"])["error"]
+
+def test_sections_come_from_the_environment(monkeypatch):
+    from core.general_feedback import get_feedback_sections
+
+    assert get_feedback_sections() is None
+    monkeypatch.setenv("CV_AGENT_FEEDBACK_SECTIONS", "summary, skills,")
+    assert get_feedback_sections() == ["summary", "skills"]
+
+def test_rate_limited_sections_are_retried(no_backoff, flaky_responder, monkeypatch):
+    from api_integration.llm_backend import ReplayBackend
+    from core import general_feedback
+
+    responder = flaky_responder(failures=2)
+    monkeypatch.setattr(no_backoff, "backend", ReplayBackend(responder=responder))
+    monkeypatch.setattr(no_backoff, "cache", None)
+    results = dict(asyncio.run(general_feedback._fan_out({"summary": 'Review it as {"feedback": "", "example": ""}'})))
+    assert results["summary"]["feedback"]
+    assert responder.calls == 3
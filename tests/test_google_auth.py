@@ -0,0 +1,64 @@
+#tests/test_google_auth.py
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from api_integration import google_auth
+from api_integration.google_auth import CredentialProvider, get_credential_provider
+
+class FakeCreds:
+    def __init__(self, seconds_left, valid=True):
+        self.valid = valid
+        self.expiry = datetime.utcnow() + timedelta(seconds=seconds_left)
+
+    def to_json(self):
+        return json.dumps({"expiry": self.expiry.isoformat()})
+
+@pytest.fixture
+def provider(tmp_path):
+    return CredentialProvider(token_file=str(tmp_path / "token.json"), credentials_file=str(tmp_path / "credentials.json"),
+                              refresh_margin=300)
+
+def test_credentials_about_to_expire_are_not_fresh(provider):
+    assert provider._fresh(FakeCreds(3600))
+    assert not provider._fresh(FakeCreds(60))
+    assert not provider._fresh(FakeCreds(3600, valid=False))
+    assert not provider._fresh(None)
+
+def test_concurrent_callers_authorize_once(provider, monkeypatch):
+    calls = []
+
+    def authorize():
+        calls.append(threading.get_ident())
+        time.sleep(0.1)  # A slow refresh, the other threads wait for it instead of refreshing too
+        return FakeCreds(3600)
+
+    monkeypatch.setattr(provider, "_authorize", authorize)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.credentials())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(creds) for creds in results}) == 1
+
+def test_credentials_are_refreshed_before_they_expire(provider, monkeypatch):
+    tokens = iter([FakeCreds(3600), FakeCreds(3600)])
+    monkeypatch.setattr(provider, "_authorize", lambda: next(tokens))
+    first = provider.credentials()
+    assert provider.credentials() is first
+    first.expiry = datetime.utcnow() + timedelta(seconds=60)  # Inside the refresh margin
+    assert provider.credentials() is not first
+
+def test_the_token_is_replaced_atomically(provider, tmp_path):
+    provider._save(FakeCreds(3600))
+    assert "expiry" in json.loads((tmp_path / "token.json").read_text())
+    # The temporary file was renamed, only the token is left
+    assert [path.name for path in tmp_path.iterdir()] == ["token.json"]
+
+def test_the_refresh_margin_comes_from_the_environment(monkeypatch):
+    monkeypatch.setattr(google_auth, "_provider", None)
+    monkeypatch.setenv("CV_AGENT_OAUTH_REFRESH_MARGIN", "60")
+    assert get_credential_provider().refresh_margin == timedelta(seconds=60)
+    assert get_credential_provider() is get_credential_provider()
@@ -0,0 +1,58 @@
+#tests/test_pdf_extraction.py
+import os
+import time
+from core.pdf_extraction import PdfExtraction, iter_pdf_texts
+
+def fake_read_pdf(path):
+    """Stands in for read_pdf in the worker processes, the file name says how it behaves"""
+    name = os.path.basename(path)
+    if name.startswith("crash"):
+        os._exit(1)  # Like a segfault in MuPDF, the worker dies without raising
+    if name.startswith("slow"):
+        time.sleep(60)
+    if name.startswith("broken"):
+        raise ValueError("cannot open broken document")
+    return PdfExtraction(path, text=f"text of {name}")
+
+def quick_read_pdf(path):
+    """A reader that takes a fraction of the timeout for every file"""
+    time.sleep(0.2)
+    return PdfExtraction(path, text=f"text of {os.path.basename(path)}")
+
+def by_name(extractions):
+    return {os.path.basename(extraction.path): extraction for extraction in extractions}
+
+def test_every_file_is_read():
+    paths = [f"resume{i}.pdf" for i in range(5)]
+    results = by_name(iter_pdf_texts(paths, max_workers=2, timeout=0, reader=fake_read_pdf))
+    assert sorted(results) == sorted(paths)
+    assert all(result.text == f"text of {name}" and result.error is None for name, result in results.items())
+
+def test_a_failing_file_only_reports_its_error():
+    results = by_name(iter_pdf_texts(["ok1.pdf", "broken.pdf", "ok2.pdf"], max_workers=2, timeout=0, reader=fake_read_pdf))
+    assert "ValueError" in results["broken.pdf"].error
+    assert results["ok1.pdf"].text and results["ok2.pdf"].text
+
+def test_a_crashing_file_is_isolated():
+    paths = ["ok1.pdf", "crash.pdf", "ok2.pdf", "ok3.pdf"]
+    results = by_name(iter_pdf_texts(paths, max_workers=2, timeout=0, reader=fake_read_pdf))
+    assert sorted(results) == sorted(paths)
+    assert "crashed" in results["crash.pdf"].error
+    # The files that were in flight with the crashing one are run again
+    assert all(results[name].text == f"text of {name}" for name in ("ok1.pdf", "ok2.pdf", "ok3.pdf"))
+
+def test_a_stuck_file_times_out_and_the_rest_finish():
+    start = time.monotonic()
+    results = by_name(iter_pdf_texts(["slow.pdf", "ok1.pdf", "ok2.pdf"], max_workers=2, timeout=2, reader=fake_read_pdf))
+    assert time.monotonic() - start < 30
+    assert "timed out" in results["slow.pdf"].error
+    assert results["ok1.pdf"].text and results["ok2.pdf"].text
+
+def test_a_slow_consumer_does_not_time_out_finished_files():
+    paths = [f"resume{i}.pdf" for i in range(4)]
+    results = []
+    for extraction in iter_pdf_texts(paths, max_workers=2, timeout=1, reader=quick_read_pdf):
+        results.append(extraction)
+        time.sleep(1.5)  # The LLM calls of this file, longer than the PDF timeout
+    assert sorted(by_name(results)) == paths
+    assert all(extraction.error is None for extraction in results)
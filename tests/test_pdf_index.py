@@ -0,0 +1,36 @@
+#tests/test_pdf_index.py
+import pytest
+from data.pdf_index import ProcessedPdfIndex, lookup_processed, get_pdf_index, md5_of_bytes, md5_of_file
+
+def test_entries_are_kept_per_pipeline(tmp_path):
+    index = ProcessedPdfIndex(str(tmp_path / "index" / "processed.sqlite"))
+    index.record("abc", "json", "candidate-1", "CV.pdf", "drive:1", {"user_info": {"first_name": "Ana"}})
+    entry = index.lookup("abc", "json")
+    assert entry["candidate_id"] == "candidate-1"
+    assert entry["extracted_sections"] == {"user_info": {"first_name": "Ana"}}
+    assert index.lookup("abc", "dataframe") is None
+    assert index.lookup(None, "json") is None
+
+def test_lookup_processed_reports_the_skipped_file(capsys):
+    get_pdf_index().record("abc", "dataframe", "candidate-1", "CV.pdf", "CV.pdf", None)
+    assert lookup_processed("abc", "dataframe", "CV.pdf")["candidate_id"] == "candidate-1"
+    assert "CV.pdf was already processed on" in capsys.readouterr().out
+    assert lookup_processed("other", "dataframe", "CV.pdf") is None
+    assert capsys.readouterr().out == ""
+
+def test_file_and_bytes_hashes_match(tmp_path):
+    path = tmp_path / "CV.pdf"
+    path.write_bytes(b"%PDF-1.4 resume")
+    assert md5_of_file(str(path), chunk_size=4) == md5_of_bytes(b"%PDF-1.4 resume")
+
+def test_an_identical_pdf_is_not_extracted_again(tmp_path, no_backoff, resume_text, pdf_factory, monkeypatch):
+    pytest.importorskip("pandas")
+    from temporal.temporal import ResumeProcessor
+
+    path = pdf_factory(tmp_path / "CV.pdf", resume_text)
+    candidate_id = ResumeProcessor().process_resume(path)
+    assert candidate_id
+
+    processor = ResumeProcessor()
+    monkeypatch.setattr(processor, "extract_text", lambda *args: pytest.fail("the PDF was read again"))
+    assert processor.process_resume(path) == candidate_id
@@ -0,0 +1,64 @@
+#tests/test_prompt_registry.py
+import os
+import pytest
+from data.prompt_registry import PromptRegistry
+
+@pytest.fixture
+def prompts_dir(tmp_path):
+    directory = tmp_path / "prompts"
+    directory.mkdir()
+    for name, text in {
+        "analyzer_prompt_v1.txt": "analyzer one",
+        "analyzer_prompt_v2.txt": "analyzer two  \n",
+        "q_for_users_v1.txt": "questions",
+        "resume_generator.txt": "generator",
+    }.items():
+        (directory / name).write_text(text, encoding="utf-8")
+    return directory
+
+def rewrite(path, text, mtime):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (mtime, mtime))  # An explicit mtime, the file system clock may not tick between two writes
+
+def test_versioned_references(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir))
+    assert registry.get("analyzer@v1") == "analyzer one"
+    assert registry.get("analyzer@V2") == "analyzer two"
+    assert registry.get("analyzer") == "analyzer two"  # The latest version
+    assert registry.get("q_for_users_v1.txt") == "questions"
+    assert registry.get("resume_generator") == "generator"
+
+def test_unknown_references(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir))
+    with pytest.raises(KeyError, match="available: \\[1, 2\\]"):
+        registry.resolve("analyzer@v3")
+    with pytest.raises(KeyError):
+        registry.resolve("missing")
+
+def test_changed_files_are_reloaded(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir), reload_interval=0)
+    path = prompts_dir / "analyzer_prompt_v1.txt"
+    assert registry.get("analyzer@v1") == "analyzer one"
+    rewrite(path, "analyzer one, edited", 1_000_000)
+    assert registry.get("analyzer@v1") == "analyzer one, edited"
+
+def test_files_are_not_checked_within_the_reload_interval(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir), reload_interval=3600)
+    path = prompts_dir / "analyzer_prompt_v1.txt"
+    assert registry.get("analyzer@v1") == "analyzer one"
+    rewrite(path, "analyzer one, edited", 1_000_000)
+    assert registry.get("analyzer@v1") == "analyzer one"
+
+def test_a_new_version_becomes_the_latest(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir), reload_interval=0)
+    assert registry.get("analyzer") == "analyzer two"
+    (prompts_dir / "analyzer_prompt_v3.txt").write_text("analyzer three", encoding="utf-8")
+    os.utime(prompts_dir, (1_000_000, 1_000_000))
+    assert registry.get("analyzer") == "analyzer three"
+
+def test_prompt_set_maps_keys_to_references(prompts_dir):
+    prompts = PromptRegistry(str(prompts_dir)).bind({"review": "analyzer@v1", "gone": "removed@v1"})
+    assert prompts["review"] == "analyzer one"
+    assert prompts.ref("review") == "analyzer@v1"
+    assert "review" in prompts and "gone" not in prompts
+    assert sorted(prompts) == ["gone", "review"]
@@ -0,0 +1,53 @@
+#tests/test_rate_limiter.py
+import pytest
+from api_integration import rate_limiter
+from api_integration.rate_limiter import TokenBucketRateLimiter
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "time", clock.time)
+    return clock
+
+def test_requests_bucket_empties_and_refills(tmp_path, clock):
+    limiter = TokenBucketRateLimiter(rpm=2, tpm=1000, db_path=str(tmp_path / "limiter.sqlite"))
+    assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) == 0
+    # The bucket refills 2 requests per minute, the next one is 30 seconds away
+    assert limiter._try_acquire(10) == pytest.approx(30.0)
+    clock.now += 30
+    assert limiter._try_acquire(10) == 0
+
+def test_tokens_bucket_limits_big_prompts(tmp_path, clock):
+    limiter = TokenBucketRateLimiter(rpm=100, tpm=1000, db_path=str(tmp_path / "limiter.sqlite"))
+    assert limiter._try_acquire(800) == 0
+    # 600 more tokens are needed than the 200 left, at 1000 tokens per minute
+    assert limiter._try_acquire(800) == pytest.approx(36.0)
+
+def test_prompt_bigger_than_the_quota_is_capped(tmp_path, clock):
+    limiter = TokenBucketRateLimiter(rpm=100, tpm=1000, db_path=str(tmp_path / "limiter.sqlite"))
+    assert limiter._try_acquire(5000) == 0
+
+def test_limiters_on_the_same_file_share_the_quota(tmp_path, clock):
+    path = str(tmp_path / "limiter.sqlite")
+    first = TokenBucketRateLimiter(rpm=1, tpm=1000, db_path=path)
+    second = TokenBucketRateLimiter(rpm=1, tpm=1000, db_path=path)
+    assert first._try_acquire(1) == 0
+    assert second._try_acquire(1) > 0
+
+def test_acquire_waits_until_there_is_quota(tmp_path, clock, monkeypatch):
+    limiter = TokenBucketRateLimiter(rpm=1, tpm=1000, db_path=str(tmp_path / "limiter.sqlite"))
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    assert limiter.acquire(1) == 0
+    assert limiter.acquire(1) == pytest.approx(60.0)
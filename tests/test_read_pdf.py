@@ -0,0 +1,21 @@
+#tests/test_read_pdf.py
+from core.pdf_extraction import read_pdf
+
+def test_read_pdf_stops_at_the_page_cap(pdf_factory, tmp_path, monkeypatch):
+    monkeypatch.setenv("CV_AGENT_TEXT_CACHE_ENABLED", "0")
+    path = pdf_factory(tmp_path / "resume.pdf", "Ana López", pages=3)
+    result = read_pdf(path, max_pages=2, max_chars=0)
+    assert "Page 1" in result.text and "Page 2" in result.text and "Page 3" not in result.text
+    assert result.pages == 3 and len(result.page_seconds) == 2 and result.truncated
+
+def test_read_pdf_stops_at_the_character_cap(pdf_factory, tmp_path, monkeypatch):
+    monkeypatch.setenv("CV_AGENT_TEXT_CACHE_ENABLED", "0")
+    path = pdf_factory(tmp_path / "resume.pdf", "Ana López", pages=3)
+    result = read_pdf(path, max_pages=0, max_chars=10)
+    assert len(result.text) == 10 and result.truncated
+
+def test_read_pdf_reads_bytes_without_caps(pdf_factory, tmp_path, monkeypatch):
+    monkeypatch.setenv("CV_AGENT_TEXT_CACHE_ENABLED", "0")
+    with open(pdf_factory(tmp_path / "resume.pdf", "Ana López", pages=2), "rb") as f:
+        result = read_pdf(f.read(), max_pages=0, max_chars=0)
+    assert result.path == "<bytes>" and "Page 2" in result.text and not result.truncated
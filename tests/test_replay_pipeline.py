@@ -0,0 +1,50 @@
+#tests/test_replay_pipeline.py
+"""The extraction and review pipeline end to end against the offline ReplayBackend (CV_AGENT_LLM_BACKEND=replay, see conftest)"""
+import pytest
+
+pytest.importorskip("dotenv")
+
+from api_integration.gemini_api import GeminiAPI
+from api_integration.llm_backend import ReplayBackend, ReplayRateLimitError, get_llm_backend
+
+def test_extraction_and_review(no_backoff, resume_text):
+    from core.information_extractor import extract_information
+    from core.general_feedback import general_analyzer
+
+    assert isinstance(no_backoff.backend, ReplayBackend)
+    resume_array = {}
+    extracted = extract_information(resume_array, resume_text, "extracted_sections", "user_extract_all_sections")
+    assert extracted["user_info"]["email"] == "ana.lopez@example.com"
+    feedback = general_analyzer(resume_array["extracted_sections"])
+    assert feedback["general_feedback"]["sections"]["summary"]["feedback"]
+
+def test_recorded_responses_are_replayed(tmp_path, monkeypatch):
+    record_path = tmp_path / "recording.jsonl"
+    monkeypatch.setenv("CV_AGENT_LLM_RECORD", str(record_path))
+    recorder = GeminiAPI(backend=ReplayBackend(responder=lambda prompt: '{"answer": "recorded"}'))
+    assert recorder.generate_content("prompt") == '{"answer": "recorded"}'
+
+    replay = ReplayBackend(recordings_path=str(record_path), responder=None)
+    assert replay.generate("prompt") == '{"answer": "recorded"}'
+    with pytest.raises(KeyError):
+        replay.generate("another prompt")
+
+def test_injected_errors_are_deterministic_with_a_seed():
+    def outcomes(seed):
+        backend = ReplayBackend(error_rate=0.5, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                backend.generate("prompt")
+                results.append("ok")
+            except ReplayRateLimitError:
+                results.append("429")
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert {"ok", "429"} == set(outcomes(7))
+
+def test_backend_is_selected_from_the_environment(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_REPLAY_ERROR_RATE", "0.25")
+    backend = get_llm_backend()
+    assert isinstance(backend, ReplayBackend) and backend.error_rate == 0.25
@@ -0,0 +1,62 @@
+#tests/test_response_cache.py
+import json
+import pytest
+from api_integration import response_cache
+from api_integration.response_cache import DiskLRUCache, make_cache_key
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # A clock that always moves forward, so the access order is never a tie
+    ticks = iter(range(1, 10000))
+    monkeypatch.setattr(response_cache.time, "time", lambda: float(next(ticks)))
+    return DiskLRUCache(str(tmp_path / "cache.sqlite"), max_bytes=10)
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "b" is now the least recently used
+    cache.set("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.evictions == 1
+    assert cache.total_bytes() <= 10
+
+def test_value_bigger_than_the_budget_is_not_stored(cache):
+    cache.set("a", b"aaaa")
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert cache.get("a") == b"aaaa"
+
+def test_delete_and_stats(cache):
+    cache.set_text("a", "texto")
+    assert cache.get_text("a") == "texto"
+    cache.delete("a")
+    assert cache.get_text("a") is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['bytes']) == (1, 1, 0)
+
+def test_cache_key_depends_on_model_prompt_and_config():
+    key = make_cache_key("model", "prompt", {"response_mime_type": "application/json"})
+    assert key == make_cache_key("model", "prompt", {"response_mime_type": "application/json"})
+    assert key != make_cache_key("other", "prompt", {"response_mime_type": "application/json"})
+    assert key != make_cache_key("model", "prompt", None)
+
+def test_unparseable_responses_are_retried_and_never_cached(flaky_responder):
+    pytest.importorskip("dotenv")
+    from api_integration.gemini_api import GeminiAPI
+    from api_integration.llm_backend import ReplayBackend
+    from api_integration.structured_output import is_json_response
+
+    responder = flaky_responder(failures=1, failure="invalid")
+    api = GeminiAPI(backend=ReplayBackend(responder=responder))
+    api.concurrency.backoff = lambda attempt: 0
+    prompt = 'Return {"feedback": "", "example": ""}'
+    config = {"response_mime_type": "application/json"}
+
+    assert api.generate_content(prompt, config, validate=is_json_response) == "not json"
+    # The invalid response was not cached, the retrying call reaches the backend again and caches the valid one
+    text = api.generate_content_with_retry(prompt, config, validate=is_json_response)
+    assert json.loads(text)["feedback"] and responder.calls == 2
+    assert api.generate_content(prompt, config, validate=is_json_response) == text
+    assert responder.calls == 2
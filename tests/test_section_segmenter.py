@@ -0,0 +1,47 @@
+#tests/test_section_segmenter.py
+from api_integration.token_budget import PAGE_BREAK
+from core.section_segmenter import segment_resume, match_heading, is_well_segmented, format_sections, SECTION_ORDER
+
+def test_headings_in_spanish_and_english_are_matched():
+    assert match_heading("Experiencia laboral") == ("work_experience", "")
+    assert match_heading("  EDUCACIÓN ") == ("education", "")
+    assert match_heading("Work Experience") == ("work_experience", "")
+    assert match_heading("Idiomas: Inglés avanzado") == ("languages", "Inglés avanzado")
+    assert match_heading("Analista de datos con experiencia en educación") is None
+
+def test_the_resume_is_split_in_section_order(resume_text):
+    sections = segment_resume(resume_text)
+    assert list(sections) == [s for s in SECTION_ORDER if s in sections]
+    assert sections["contact"].startswith("Ana López") and "ana.lopez@example.com" in sections["contact"]
+    assert sections["summary"] == "Analista de datos con 5 años de experiencia."
+    assert "UNAM" in sections["education"] and sections["languages"] == "Inglés avanzado"
+    assert is_well_segmented(sections)
+
+def test_repeated_headings_and_pages_are_merged():
+    text = f"Ana López\nExperiencia\nEmpresa A, 2018 - 2020{PAGE_BREAK}Experiencia\nEmpresa B, 2020 - 2022\n"
+    sections = segment_resume(text)
+    assert "Empresa A" in sections["work_experience"] and "Empresa B" in sections["work_experience"]
+
+def test_a_side_column_contact_line_goes_to_contact():
+    sections = segment_resume("Ana López\nExperiencia\nanalopez@example.com\nEmpresa A, 2018 - 2020\n")
+    assert "analopez@example.com" in sections["contact"]
+    assert "analopez@example.com" not in sections["work_experience"]
+
+def test_a_text_without_headings_is_not_well_segmented():
+    sections = segment_resume("Ana López\nAnalista de datos en Empresa A desde 2018.\n")
+    assert list(sections) == ["contact"] and not is_well_segmented(sections)
+    assert segment_resume("") == {} and segment_resume(None) == {}
+
+def test_format_sections():
+    assert format_sections({"summary": "Analista.", "skills": "SQL"}) == "[SUMMARY]\nAnalista.\n\n[SKILLS]\nSQL"
+
+def test_presegment_is_opt_in(resume_text, monkeypatch):
+    from core.information_extractor import presegment
+
+    assert presegment(resume_text, "user_extract_all_sections") == ("user_extract_all_sections", resume_text, None)
+    monkeypatch.setenv("CV_AGENT_PRESEGMENT", "1")
+    prompt_key, text, sections = presegment(resume_text, "user_extract_all_sections")
+    assert prompt_key == "user_extract_sectioned" and text == format_sections(sections)
+    # Other prompts and badly segmented texts keep the full prompt
+    assert presegment(resume_text, "user_extract_languages")[2] is None
+    assert presegment("Ana López\nAnalista.", "user_extract_all_sections")[0] == "user_extract_all_sections"
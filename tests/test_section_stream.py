@@ -0,0 +1,58 @@
+#tests/test_section_stream.py
+import json
+from core.general_feedback import SectionStreamParser
+
+FEEDBACK = {
+    "sections": {
+        "summary": {"feedback": "Clear, with a {brace} and \"quotes\"", "example": "Data analyst"},
+        "work_experience": {"feedback": "Add results", "example": "Cut costs 10%"},
+        "skills": {"feedback": "Group them", "example": "SQL, Python"},
+    }
+}
+
+def feed_in_chunks(text, size):
+    parser, completed = SectionStreamParser(), []
+    for start in range(0, len(text), size):
+        completed.append(parser.feed(text[start:start + size]))
+    return parser, completed
+
+def test_sections_are_returned_as_soon_as_they_are_complete():
+    text = json.dumps(FEEDBACK, indent=2)
+    parser, completed = feed_in_chunks(text, 1)
+    sections = [pair for pairs in completed for pair in pairs]
+    assert sections == list(FEEDBACK["sections"].items())
+    assert parser.finished
+    # Each section came out on the chunk that closed it, not at the end of the stream
+    closing = [index for index, pairs in enumerate(completed) if pairs]
+    assert len(closing) == 3 and closing[-1] < len(text) - 2
+
+def test_chunk_size_does_not_change_the_result():
+    text = json.dumps(FEEDBACK)
+    for size in (2, 7, 50, len(text)):
+        _, completed = feed_in_chunks(text, size)
+        assert dict(pair for pairs in completed for pair in pairs) == FEEDBACK["sections"]
+
+def test_text_before_the_sections_and_after_the_end_is_ignored():
+    parser = SectionStreamParser()
+    assert parser.feed('```json\n{"general": "ok", "sect') == []
+    assert parser.feed('ions": {"summary": {"feedback": "a"') == []
+    assert parser.feed(', "example": "b"}}, "other": {"x": 1}}') == [("summary", {"feedback": "a", "example": "b"})]
+    assert parser.finished
+    assert parser.feed('{"sections": {"late": {}}}') == []
+
+def test_streamed_feedback_is_added_to_the_resume(no_backoff, monkeypatch):
+    from api_integration.llm_backend import ReplayBackend
+    from core.general_feedback import general_analyzer_stream
+
+    class ChunkedBackend(ReplayBackend):
+        def stream(self, prompt, generation_config=None):
+            text = self.generate(prompt, generation_config)
+            for start in range(0, len(text), 5):
+                yield text[start:start + 5]
+
+    monkeypatch.setattr(no_backoff, "backend", ChunkedBackend())
+    received = []
+    resume = {"user_info": {"first_name": "Ana"}, "summary": "Analista de datos"}
+    sections = dict(general_analyzer_stream(resume, on_section=lambda name, section: received.append(name)))
+    assert sections and received == list(sections)
+    assert resume["general_feedback"]["sections"] == sections
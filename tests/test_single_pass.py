@@ -0,0 +1,39 @@
+#tests/test_single_pass.py
+"""Single-pass extract + review (CV_AGENT_SINGLE_PASS) against the offline ReplayBackend"""
+import pytest
+
+def test_json_layout_matches_general_analyzer(no_backoff, resume_text):
+    from core.single_pass import extract_and_review
+    from core.general_feedback import FEEDBACK_SCHEMA
+
+    extracted_sections, feedback_result = extract_and_review(resume_text, layout="json")
+    assert extracted_sections["user_info"]["first_name"]
+    sections = feedback_result["general_feedback"]["sections"]
+    assert set(sections) == set(FEEDBACK_SCHEMA["properties"]["sections"]["properties"])
+
+    _, feedback_result = extract_and_review(resume_text)
+    assert {"hard_skills", "soft_skills"} <= set(feedback_result["general_feedback"]["sections"])
+
+def test_process_resume_and_review(tmp_path, no_backoff, resume_text, pdf_factory):
+    pytest.importorskip("pandas")
+    from temporal.temporal import ResumeProcessor
+
+    path = pdf_factory(tmp_path / "CV.pdf", resume_text)
+    candidate_id, feedback_result = ResumeProcessor().process_resume_and_review(path)
+    assert candidate_id and feedback_result["general_feedback"]["sections"]
+    # Already processed: same candidate, the caller runs the separate review
+    assert ResumeProcessor().process_resume_and_review(path) == (candidate_id, None)
+
+def test_a_failed_single_pass_call_falls_back_to_the_extraction(tmp_path, no_backoff, resume_text, pdf_factory, monkeypatch):
+    pytest.importorskip("pandas")
+    from temporal import temporal
+
+    monkeypatch.setattr(temporal, "extract_and_review", lambda resume_txt: None)
+    processor = temporal.ResumeProcessor()
+    reads = []
+    extract_text = processor.extract_text
+    monkeypatch.setattr(processor, "extract_text", lambda *args: reads.append(args) or extract_text(*args))
+
+    candidate_id, feedback_result = processor.process_resume_and_review(pdf_factory(tmp_path / "CV.pdf", resume_text))
+    assert candidate_id and feedback_result is None
+    assert len(reads) == 1  # The fallback reuses the text already extracted
@@ -0,0 +1,23 @@
+#tests/test_text_cache.py
+from core.pdf_extraction import read_pdf
+from data.text_cache import PdfTextCache, get_text_cache
+
+def test_the_caps_are_part_of_the_key(pdf_factory, tmp_path):
+    cache = PdfTextCache(str(tmp_path / "texts.sqlite"))
+    cache.set("abc", "two pages", max_pages=2)
+    assert cache.get("abc", max_pages=2) == "two pages"
+    assert cache.get("abc", max_pages=3) is None
+
+def test_a_pdf_is_parsed_once(pdf_factory, tmp_path):
+    with open(pdf_factory(tmp_path / "resume.pdf", "Ana López", pages=3), "rb") as f:
+        pdf_bytes = f.read()
+    first = read_pdf(pdf_bytes, max_pages=2)
+    assert not first.cached and "Page 3" not in first.text
+    second = read_pdf(pdf_bytes, max_pages=2)
+    assert second.cached and second.text == first.text
+    # Read with other caps, the PDF is parsed again
+    assert not read_pdf(pdf_bytes, max_pages=3).cached
+
+def test_the_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_TEXT_CACHE_ENABLED", "0")
+    assert get_text_cache() is None
@@ -0,0 +1,48 @@
+#tests/test_token_budget.py
+from api_integration.token_budget import (estimate_tokens, get_budget, fit_text_to_budget, cap_sections,
+                                          collapse_whitespace, PAGE_BREAK)
+
+def test_estimate_counts_words_punctuation_and_long_words():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("hola, sol") == 3
+    assert estimate_tokens("internacionalización") == 1 + len("internacionalización") // 5
+
+def test_budget_comes_from_the_environment(monkeypatch):
+    assert get_budget("extraction") == 12000
+    assert get_budget("unknown") is None
+    monkeypatch.setenv("CV_AGENT_TOKEN_BUDGET_FEEDBACK", "500")
+    assert get_budget("feedback") == 500
+    monkeypatch.setenv("CV_AGENT_TOKEN_BUDGET_FEEDBACK", "0")
+    assert get_budget("feedback") is None
+
+def test_invalid_budget_falls_back_to_the_default(monkeypatch, capsys):
+    monkeypatch.setenv("CV_AGENT_TOKEN_BUDGET_EXTRACTION", "12k")
+    assert get_budget("extraction") == 12000
+    assert "Invalid CV_AGENT_TOKEN_BUDGET_EXTRACTION" in capsys.readouterr().out
+
+def test_whitespace_is_collapsed_including_non_breaking_spaces():
+    assert collapse_whitespace("a \u00a0\t b\n\n\n\nc") == "a b\n\nc"
+    assert collapse_whitespace(f"a  b{PAGE_BREAK}c") == f"a b{PAGE_BREAK}c"
+
+def test_text_that_fits_is_untouched():
+    text = "Analista   de datos"
+    assert fit_text_to_budget(text, "extraction") == (text, [])
+
+def test_strategies_apply_in_order_until_the_text_fits():
+    pages = PAGE_BREAK.join(f"page {number} " + "word " * 20 for number in range(5))
+    text, applied = fit_text_to_budget(pages, "extraction", budget=50)
+    assert applied == ["collapse_whitespace", "drop_trailing_pages"]
+    assert text.startswith("page 0") and estimate_tokens(text) <= 50
+
+    text, applied = fit_text_to_budget("word " * 100, "extraction", budget=10)
+    assert applied == ["collapse_whitespace", "drop_trailing_pages", "truncate"]
+    assert estimate_tokens(text) == 10
+
+def test_sections_share_the_budget(monkeypatch):
+    monkeypatch.setenv("CV_AGENT_TOKEN_BUDGET_FEEDBACK", "30")
+    fields = {"summary": "short", "experience": "job " * 100}
+    capped = cap_sections(fields, "feedback")
+    assert capped["summary"] == "short"
+    assert estimate_tokens(capped["experience"]) <= 15
+    assert cap_sections({"summary": "short"}, "feedback") == {"summary": "short"}